@@ -0,0 +1,13 @@
+"""
+Holiday Moo - Export benchmarks
+
+Synthetic calendar/trip payloads with controllable size and shape, and a
+runner that times both export services stage by stage:
+
+    cd src/services
+    python -m benchmark --days 14 --events-per-day 10 --output bench.jsonl
+"""
+
+from benchmark.syntheticTrip import make_payload
+
+__all__ = ['make_payload']
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Export benchmark runner
+
+Times HolidayMooExcelGenerator.generate_excel and
+TravelCalendarExporter.create_excel_export on synthetic payloads, stage by
+stage, and records wall time, peak memory and output size. --engine picks
+the local service's workbook writer and --calendar-pages its calendar
+sheets; each --compression level (all four by default) is measured
+separately, so save time and output size can be compared level by level.
+Each run appends one JSON line per service and level to --output so
+results can be compared over time.
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# The services import their sibling modules by name
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICES_DIR not in sys.path:
+    sys.path.insert(0, SERVICES_DIR)
+
+import openpyxl
+
+from benchmark.syntheticTrip import make_payload
+from workbookCompression import COMPRESSION_LEVELS
+
+# Methods timed on each service; nested stages are subtracted from their
+# parents below to get save/encode times
+LOCAL_STAGES = [
+    'generate_excel', 'render_excel', 'normalize_trip_events', 'build_workbook',
+    'create_workbook', 'create_streaming_workbook', 'create_calendar_page', 'create_overview_sheet',
+    'create_events_sheet', 'stream_events_sheet', 'create_summary_sheet',
+]
+EXCEL_STAGES = [
+    'create_excel_export', 'render_excel_export', '_get_trip_events', '_create_workbook',
+    '_create_streaming_workbook', '_create_calendar_sheet', '_create_event_list_sheet',
+    '_stream_event_list_sheet', '_create_trip_summary_sheet',
+]
+
+
+class StageClock:
+    """Wrap an object's methods so every call adds to a per-stage total"""
+
+    def __init__(self, target, names):
+        self.totals = {}
+        for name in names:
+            method = getattr(target, name, None)
+            if method is not None:
+                setattr(target, name, self._timed(name, method))
+
+    def _timed(self, name, method):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - started
+        return timed
+
+
+def run_local(calendar_data, trip_data, streaming, engine=None, compression=None, calendar_pages=None):
+    from localExportService import HolidayMooExcelGenerator
+
+    generator = HolidayMooExcelGenerator()
+    clock = StageClock(generator, LOCAL_STAGES)
+    result = generator.generate_excel(calendar_data, trip_data, streaming=streaming, engine=engine,
+                                      compression=compression, calendar_pages=calendar_pages)
+
+    t = clock.totals
+    built = t.get('create_workbook', 0.0) + t.get('create_streaming_workbook', 0.0)
+    stages = {
+        'filter_events': t.get('normalize_trip_events', 0.0),
+        'calendar_sheet': t.get('create_calendar_page', 0.0),
+        'overview_sheet': t.get('create_overview_sheet', 0.0),
+        'events_sheet': t.get('create_events_sheet', 0.0) + t.get('stream_events_sheet', 0.0),
+        'summary_sheet': t.get('create_summary_sheet', 0.0),
+        'save': t.get('build_workbook', 0.0) - built,
+        'base64_encode': t.get('generate_excel', 0.0) - t.get('render_excel', 0.0),
+    }
+    return stages, result['size']
+
+
+def run_excel(calendar_data, trip_data, streaming, compression=None):
+    from excelExportService import TravelCalendarExporter
+
+    exporter = TravelCalendarExporter()
+    clock = StageClock(exporter, EXCEL_STAGES)
+    data = exporter.create_excel_export(calendar_data, trip_data, streaming=streaming, compression=compression)
+
+    t = clock.totals
+    built = t.get('_create_workbook', 0.0) + t.get('_create_streaming_workbook', 0.0)
+    stages = {
+        'filter_events': t.get('_get_trip_events', 0.0),
+        'calendar_sheet': t.get('_create_calendar_sheet', 0.0),
+        'events_sheet': t.get('_create_event_list_sheet', 0.0) + t.get('_stream_event_list_sheet', 0.0),
+        'summary_sheet': t.get('_create_trip_summary_sheet', 0.0),
+        'save': t.get('render_excel_export', 0.0) - t.get('_get_trip_events', 0.0) - built,
+        'copy_bytes': t.get('create_excel_export', 0.0) - t.get('render_excel_export', 0.0),
+    }
+    return stages, len(data)
+
+
+SERVICES = {
+    'localExportService': run_local,
+    'excelExportService': run_excel,
+}
+
+
+def benchmark_service(run, calendar_data, trip_data, streaming, repeat):
+    """Time `repeat` runs, then one more under tracemalloc for peak memory"""
+    walls = []
+    stage_runs = []
+    output_bytes = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stages, output_bytes = run(calendar_data, trip_data, streaming)
+        walls.append(time.perf_counter() - started)
+        stage_runs.append(stages)
+
+    # Tracing slows everything down, so memory gets its own run
+    tracemalloc.start()
+    try:
+        run(calendar_data, trip_data, streaming)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_seconds': {
+            'min': round(min(walls), 4),
+            'median': round(statistics.median(walls), 4),
+            'max': round(max(walls), 4),
+        },
+        'stages_seconds': {
+            name: round(statistics.median(run_stages[name] for run_stages in stage_runs), 4)
+            for name in stage_runs[0]
+        },
+        'peak_traced_bytes': peak,
+        'output_bytes': output_bytes,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICES_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def max_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='Benchmark the Holiday Moo export services')
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--events-per-day', type=int, default=6)
+    parser.add_argument('--overlap-ratio', type=float, default=0.0)
+    parser.add_argument('--locations', choices=['dict', 'string', 'none', 'mixed'], default='mixed')
+    parser.add_argument('--costs', choices=['number', 'string', 'currency', 'free', 'mixed'], default='mixed')
+    parser.add_argument('--custom-headers', type=float, default=0.3, help='share of days with a custom header')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--streaming', choices=['auto', 'on', 'off'], default='auto')
+    parser.add_argument('--engine', choices=['openpyxl', 'direct'],
+                        help='localExportService workbook writer (default: the service default)')
+    parser.add_argument('--calendar-pages', choices=['single', 'week', 'month'],
+                        help='localExportService calendar sheets (default: the service default)')
+    parser.add_argument('--compression', choices=list(COMPRESSION_LEVELS), action='append',
+                        help='xlsx zip compression level to measure (default: every level)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--service', choices=sorted(SERVICES), action='append',
+                        help='service to benchmark (default: both)')
+    parser.add_argument('--output', help='append results as JSON lines to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {
+        'days': args.days,
+        'events_per_day': args.events_per_day,
+        'overlap_ratio': args.overlap_ratio,
+        'location_style': args.locations,
+        'cost_style': args.costs,
+        'custom_header_ratio': args.custom_headers,
+        'seed': args.seed,
+    }
+    streaming = {'auto': None, 'on': True, 'off': False}[args.streaming]
+
+    calendar_data, trip_data = make_payload(**params)
+    payload_bytes = len(json.dumps({'calendarData': calendar_data, 'tripData': trip_data}).encode('utf-8'))
+
+    environment = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'openpyxl': openpyxl.__version__,
+    }
+
+    results = []
+    for service in args.service or sorted(SERVICES):
+        for compression in args.compression or COMPRESSION_LEVELS:
+            run = functools.partial(SERVICES[service], compression=compression)
+            if service == 'localExportService':
+                run = functools.partial(run, engine=args.engine, calendar_pages=args.calendar_pages)
+            try:
+                measured = benchmark_service(run, calendar_data, trip_data, streaming, max(1, args.repeat))
+            except Exception as e:
+                measured = {'error': f"{type(e).__name__}: {e}"}
+            results.append({
+                **environment,
+                'service': service,
+                'params': params,
+                'streaming': args.streaming,
+                'engine': args.engine if service == 'localExportService' else None,
+                'calendar_pages': args.calendar_pages if service == 'localExportService' else None,
+                'compression': compression,
+                'events': len(calendar_data['events']),
+                'payload_bytes': payload_bytes,
+                **measured,
+                'max_rss_kb': max_rss_kb(),
+            })
+
+    for result in results:
+        label = f"{result['service']} [{result['compression']}]"
+        if 'error' in result:
+            print(f"{label:<30} failed: {result['error']}")
+            continue
+        stages = '  '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in result['stages_seconds'].items())
+        print(f"{label:<30} {result['wall_seconds']['median'] * 1000:8.1f}ms  "
+              f"peak {result['peak_traced_bytes'] / 1048576:6.1f} MiB  "
+              f"output {result['output_bytes'] / 1024:8.1f} KiB")
+        print(f"{'':<30} {stages}")
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    return 1 if any('error' in result for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
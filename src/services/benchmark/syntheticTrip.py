@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Synthetic calendar payloads
+
+Builds `calendarData`/`tripData` in the same shape the React client posts to
+the export services, so benchmarks exercise the real parsing paths.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+EVENT_TYPES = ['dining', 'sightseeing', 'transport', 'accommodation', 'activity', 'shopping',
+               'meeting', 'travel', 'event']
+
+PAID_VALUES = [True, False, 'paid', 'pending', 'unpaid', None]
+
+# Calendar day the grids show, in minutes from midnight
+DAY_START = 6 * 60
+DAY_END = 23 * 60 + 30
+
+
+def make_payload(days=7, events_per_day=6, overlap_ratio=0.0, location_style='mixed',
+                 cost_style='mixed', custom_header_ratio=0.3, start_date='2025-09-13', seed=0):
+    """Generate (calendar_data, trip_data) for one trip.
+
+    - overlap_ratio: share of events that start while the previous one is running
+    - location_style: 'dict', 'string', 'none' or 'mixed'
+    - cost_style: 'number', 'string', 'currency', 'free' or 'mixed'
+    - custom_header_ratio: share of days with a customDayHeaders entry
+    """
+    rng = random.Random(seed)
+    first_day = datetime.strptime(start_date, '%Y-%m-%d')
+    trip_id = f"trip-{seed}"
+
+    # Spread each day's events over the visible grid; a full day of 30-minute
+    # slots is the most that fits without overlaps
+    spacing = max(30, (DAY_END - DAY_START) // max(1, events_per_day) // 30 * 30)
+
+    events = []
+    custom_day_headers = {}
+    for day in range(days):
+        date = first_day + timedelta(days=day)
+
+        if rng.random() < custom_header_ratio:
+            # Same key format as Date.toDateString() in the client
+            custom_day_headers[date.strftime('%a %b %d %Y')] = {
+                'title': f"Day {day + 1} highlights",
+                'description': rng.choice(['Early start', 'Free afternoon for shopping and a long dinner', '']),
+            }
+
+        cursor = DAY_START
+        previous = None
+        for index in range(events_per_day):
+            if previous and rng.random() < overlap_ratio:
+                start = previous[0] + 30
+                duration = max(60, previous[1] - previous[0])
+            else:
+                start = cursor
+                duration = rng.choice([30, 60, 90, 120])
+            start = min(start, DAY_END)
+            end = min(start + duration, DAY_END + 30)
+            cursor = max(cursor + spacing, end)
+            previous = (start, end)
+
+            events.append(_make_event(rng, trip_id, date, day, index, start, end, location_style, cost_style))
+
+    trip_data = {
+        'id': trip_id,
+        'name': f"Benchmark Trip {seed}",
+        'startDate': _iso(first_day),
+        'endDate': _iso(first_day + timedelta(days=days - 1)),
+        'destination': 'Tokyo, Japan',
+        'description': 'Synthetic trip generated for export benchmarks',
+        'budget': '5000',
+    }
+
+    calendar_data = {
+        'title': 'Benchmark Calendar',
+        'events': events,
+        'trips': [trip_data],
+        'customDayHeaders': custom_day_headers,
+        'bucketList': [{'id': f"bucket-{i}", 'name': f"Bucket item {i}"} for i in range(5)],
+        'checklistItems': [{'id': f"check-{i}", 'text': f"Checklist item {i}", 'completed': i % 2 == 0} for i in range(5)],
+    }
+    return calendar_data, trip_data
+
+
+def _make_event(rng, trip_id, date, day, index, start, end, location_style, cost_style):
+    name = f"{rng.choice(['Visit', 'Lunch at', 'Train to', 'Check in at', 'Tour of'])} Place {day}-{index}"
+    event = {
+        'id': f"event-{day}-{index}",
+        'tripId': trip_id,
+        'title': name,
+        'name': name,
+        'startTime': _iso(date + timedelta(minutes=start)),
+        'endTime': _iso(date + timedelta(minutes=end)),
+        'type': rng.choice(EVENT_TYPES),
+        'location': _make_location(rng, day, index, location_style),
+        'cost': _make_cost(rng, cost_style),
+        'paid': rng.choice(PAID_VALUES),
+        'remark': rng.choice(['', 'Bring passport', 'Booked online, confirmation in email ' * 3]),
+        'contact': rng.choice(['', '+81 3-1234-5678']),
+        'tags': rng.choice(['', 'food', 'museum,indoor']),
+        'link': rng.choice(['', 'https://example.com/booking']),
+    }
+    return event
+
+
+def _make_location(rng, day, index, style):
+    if style == 'mixed':
+        style = rng.choice(['dict', 'string', 'none'])
+    if style == 'none':
+        return ''
+    if style == 'string':
+        return f"{index} Sample Street, District {day}"
+    return {
+        'name': f"Place {day}-{index}",
+        'address': f"{index} Sample Street, District {day}",
+        'coordinates': {'lat': 35.6 + rng.random() / 10, 'lng': 139.7 + rng.random() / 10},
+        'rating': round(rng.uniform(3, 5), 1),
+    }
+
+
+def _make_cost(rng, style):
+    if style == 'mixed':
+        style = rng.choice(['number', 'string', 'currency', 'free'])
+    amount = round(rng.uniform(5, 300), 2)
+    if style == 'number':
+        return amount
+    if style == 'string':
+        return f"{amount}"
+    if style == 'currency':
+        return rng.choice([f"${amount:,.2f}", f"¥{int(amount * 150):,}", f"{amount} EUR"])
+    return rng.choice(['Free', 'N/A', None, 0])
+
+
+def _iso(value):
+    # Matches Date.toISOString() from the client
+    return value.strftime('%Y-%m-%dT%H:%M:%S.000Z')
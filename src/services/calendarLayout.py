@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Lane layout for the calendar grid
+
+Events that overlap on the same day are placed side by side in sub-columns
+("lanes") of that day's column instead of being written over each other.
+Each day is laid out with one sweep over its events sorted by start slot,
+O(n log n), and every merge range is known before a cell is written.
+
+Slots are half-open: an event occupying slots [2, 4) ends where one starting
+at slot 4 begins, so the two do not overlap.
+"""
+
+import heapq
+
+
+class Placement:
+    """Where one event goes inside its day column"""
+    __slots__ = ('item', 'start', 'end', 'lane', 'last_lane')
+
+    def __init__(self, item, start, end, lane, last_lane):
+        self.item = item
+        self.start = start          # First slot
+        self.end = end              # Slot after the last one
+        self.lane = lane            # First lane, 0-based
+        self.last_lane = last_lane  # Last lane, inclusive
+
+
+class Conflict:
+    """A run of events on one day that overlap each other"""
+    __slots__ = ('start', 'end', 'lanes', 'items')
+
+    def __init__(self, start, end, lanes, items):
+        self.start = start
+        self.end = end
+        self.lanes = lanes
+        self.items = items
+
+
+class DayLayout:
+    __slots__ = ('lanes', 'placements', 'conflicts')
+
+    def __init__(self, lanes, placements, conflicts):
+        self.lanes = lanes            # Sub-columns the day needs, 1 without overlaps
+        self.placements = placements  # In start order
+        self.conflicts = conflicts
+
+
+def layout_day(intervals):
+    """Assign lanes to (start, end, item) slot intervals of one day.
+
+    Events keep the lowest free lane. Once a run of overlapping events is
+    over, its last lane is widened to the day's full width, so events that
+    overlap nothing still fill the whole day column.
+    """
+    ordered = sorted((iv for iv in intervals if iv[1] > iv[0]), key=lambda iv: iv[0])
+
+    groups = []      # [placements, end, lanes] per run of overlapping events
+    active = []      # (end, lane) of events still running in the current run
+    free = []        # Lanes released by events that have ended
+    for start, end, item in ordered:
+        if not groups or start >= groups[-1][1]:
+            groups.append([[], end, 0])
+            active.clear()
+            free.clear()
+        group = groups[-1]
+
+        while active and active[0][0] <= start:
+            heapq.heappush(free, heapq.heappop(active)[1])
+        lane = heapq.heappop(free) if free else len(active)
+        heapq.heappush(active, (end, lane))
+
+        group[0].append(Placement(item, start, end, lane, lane))
+        group[1] = max(group[1], end)
+        group[2] = max(group[2], lane + 1)
+
+    lanes = max((group[2] for group in groups), default=1)
+    placements = []
+    conflicts = []
+    for group_placements, end, group_lanes in groups:
+        for placement in group_placements:
+            if placement.lane == group_lanes - 1:
+                placement.last_lane = lanes - 1
+        placements.extend(group_placements)
+        if group_lanes > 1:
+            conflicts.append(Conflict(
+                group_placements[0].start, end, group_lanes,
+                [placement.item for placement in group_placements],
+            ))
+
+    return DayLayout(lanes, placements, conflicts)
+
+
+def layout_days(days, intervals):
+    """Lay out (day, start, end, item) intervals for each of `days`.
+
+    Returns {day: DayLayout}; intervals on other days are ignored.
+    """
+    by_day = {day: [] for day in days}
+    for day, start, end, item in intervals:
+        bucket = by_day.get(day)
+        if bucket is not None:
+            bucket.append((start, end, item))
+    return {day: layout_day(bucket) for day, bucket in by_day.items()}
+
+
+def day_columns(days, layouts, first_column=2):
+    """Map each day to (first column, lanes) with days laid out left to right"""
+    columns = {}
+    column = first_column
+    for day in days:
+        lanes = layouts[day].lanes
+        columns[day] = (column, lanes)
+        column += lanes
+    return columns
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Server-held calendar snapshots
+
+Clients upload a calendar once and then send only the events that were
+added, changed or removed since a base version. Each change produces a new
+immutable version, so exports already running on the previous one are not
+affected.
+
+Environment:
+- HOLIDAYMOO_SNAPSHOT_MAX: calendars kept in memory (default 256)
+- HOLIDAYMOO_SNAPSHOT_TTL: seconds an unused calendar is kept (default 3600)
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from exportLogging import fields, get_logger, trace_enabled
+
+log = get_logger('calendar_snapshots')
+
+# Top-level calendarData keys a delta may replace wholesale
+REPLACEABLE_FIELDS = ('title', 'trips', 'customDayHeaders', 'bucketList', 'checklistItems')
+
+
+class SnapshotError(Exception):
+    """A delta could not be applied; `status` is the HTTP status to report"""
+
+    def __init__(self, message, status=400, current_version=None):
+        super().__init__(message)
+        self.status = status
+        self.current_version = current_version
+
+
+def _event_id(event):
+    if not isinstance(event, dict) or event.get('id') is None:
+        raise SnapshotError("Every event needs an id to be kept in a snapshot")
+    return event['id']
+
+
+class CalendarSnapshot:
+    """One immutable version of a calendar"""
+    __slots__ = ('calendar_id', 'version', 'fields', 'events', '_calendar_data')
+
+    def __init__(self, calendar_id, version, fields, events):
+        self.calendar_id = calendar_id
+        self.version = version
+        self.fields = fields    # Everything except events
+        self.events = events    # Event id -> event, in upload order
+        self._calendar_data = None
+
+    @property
+    def calendar_data(self):
+        """The snapshot as a calendarData payload"""
+        if self._calendar_data is None:
+            self._calendar_data = dict(self.fields, events=list(self.events.values()))
+        return self._calendar_data
+
+    def summary(self):
+        return {'calendarId': self.calendar_id, 'version': self.version, 'events': len(self.events)}
+
+
+class SnapshotStore:
+    def __init__(self, max_calendars=256, ttl=3600):
+        self.max_calendars = max_calendars
+        self.ttl = ttl
+
+        self._snapshots = OrderedDict()  # calendar id -> (latest snapshot, last used)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a store from HOLIDAYMOO_SNAPSHOT_* environment variables"""
+        return cls(
+            max_calendars=int(os.environ.get('HOLIDAYMOO_SNAPSHOT_MAX', '256')),
+            ttl=int(os.environ.get('HOLIDAYMOO_SNAPSHOT_TTL', '3600')),
+        )
+
+    def create(self, calendar_data):
+        """Store a full calendar upload as version 1 of a new calendar"""
+        events = calendar_data.get('events') or []
+        by_id = OrderedDict()
+        for event in events:
+            by_id[_event_id(event)] = event
+
+        snapshot = CalendarSnapshot(
+            uuid.uuid4().hex,
+            1,
+            {key: value for key, value in calendar_data.items() if key != 'events'},
+            by_id,
+        )
+        with self._lock:
+            self._store(snapshot)
+        log.info("Calendar snapshot created", extra=fields(calendar_id=snapshot.calendar_id, events=len(by_id)))
+        return snapshot
+
+    def get(self, calendar_id, version=None):
+        """Latest snapshot of a calendar, checked against `version` if given"""
+        with self._lock:
+            snapshot = self._latest(calendar_id)
+            self._store(snapshot)
+
+        if version is not None and version != snapshot.version:
+            raise SnapshotError("Calendar snapshot version mismatch", status=409, current_version=snapshot.version)
+        return snapshot
+
+    def apply_delta(self, calendar_id, delta):
+        """Apply a delta against its base version and return the new snapshot.
+
+        delta = {
+            'baseVersion': 3,
+            'added': [event, ...],      # new events
+            'changed': [event, ...],    # full replacements, matched by id
+            'removed': [event_id, ...],
+            'fields': {'trips': [...], ...},  # top-level keys to replace
+        }
+        """
+        base_version = delta.get('baseVersion')
+        if base_version is None:
+            raise SnapshotError("Missing baseVersion")
+
+        with self._lock:
+            base = self._latest(calendar_id)
+            if base.version != base_version:
+                raise SnapshotError("Calendar snapshot version mismatch", status=409, current_version=base.version)
+
+            # Copy-on-write: the dict copy only moves references, the
+            # per-event work is proportional to the size of the change
+            events = OrderedDict(base.events)
+            for event_id in delta.get('removed') or []:
+                events.pop(event_id, None)
+            for event in (delta.get('added') or []) + (delta.get('changed') or []):
+                events[_event_id(event)] = event
+
+            snapshot_fields = dict(base.fields)
+            for key, value in (delta.get('fields') or {}).items():
+                if key not in REPLACEABLE_FIELDS:
+                    raise SnapshotError(f"Field '{key}' cannot be replaced by a delta")
+                snapshot_fields[key] = value
+
+            snapshot = CalendarSnapshot(calendar_id, base.version + 1, snapshot_fields, events)
+            self._store(snapshot)
+
+        if trace_enabled():
+            log.debug("Calendar delta applied", extra=fields(
+                calendar_id=calendar_id,
+                version=snapshot.version,
+                added=len(delta.get('added') or []),
+                changed=len(delta.get('changed') or []),
+                removed=len(delta.get('removed') or []),
+            ))
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calendars': len(self._snapshots),
+                'events': sum(len(snapshot.events) for snapshot, _ in self._snapshots.values()),
+                'max_calendars': self.max_calendars,
+                'ttl_seconds': self.ttl,
+            }
+
+    def _store(self, snapshot):
+        # Caller must hold the lock
+        self._snapshots[snapshot.calendar_id] = (snapshot, time.time())
+        self._snapshots.move_to_end(snapshot.calendar_id)
+        while len(self._snapshots) > self.max_calendars:
+            self._snapshots.popitem(last=False)
+
+    def _latest(self, calendar_id):
+        # Caller must hold the lock
+        self._expire()
+        entry = self._snapshots.get(calendar_id)
+        if entry is None:
+            raise SnapshotError("Unknown or expired calendar snapshot", status=404)
+        return entry[0]
+
+    def _expire(self):
+        # Caller must hold the lock; least recently used entries come first
+        cutoff = time.time() - self.ttl
+        while self._snapshots:
+            calendar_id, (_, last_used) = next(iter(self._snapshots.items()))
+            if last_used >= cutoff:
+                break
+            del self._snapshots[calendar_id]
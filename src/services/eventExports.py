@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Streaming event list exports
+
+Integrations that only need the event rows get them as CSV, iCalendar or
+NDJSON instead of a styled workbook. Every writer here is a generator that
+yields the document one line (or one event) at a time, so a response can be
+streamed out as it is produced without buffering the whole file.
+"""
+
+import csv
+import io
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+# format -> (mimetype, file extension)
+EVENT_EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ics': ('text/calendar; charset=utf-8', 'ics'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# RFC 5545 content lines are folded at 75 octets
+ICS_LINE_OCTETS = 75
+ICS_PRODID = '-//Holiday Moo//Trip Export//EN'
+# Not allowed in property values (RFC 5545 CONTROL); HTAB is allowed
+ICS_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0a-\x1f\x7f]')
+
+
+def csv_lines(headers, rows):
+    """Yield a header line, then one CSV line per row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return text
+
+    yield line(headers)
+    for values in rows:
+        yield line(values)
+
+
+def ndjson_lines(records):
+    """Yield one JSON document per line for each record dict"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+
+def ics_lines(calendar_name, events):
+    """Yield a VCALENDAR with one VEVENT per event dict
+
+    Events carry `uid`, `start` and `end` (naive local datetimes, written as
+    floating times; `end` may be None), `summary`, and optional `location`,
+    `description`, `url` and `categories`.
+    """
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    yield from _ics_folded('BEGIN:VCALENDAR')
+    yield from _ics_folded('VERSION:2.0')
+    yield from _ics_folded(f'PRODID:{ICS_PRODID}')
+    yield from _ics_folded('CALSCALE:GREGORIAN')
+    yield from _ics_folded(f'X-WR-CALNAME:{ics_text(calendar_name)}')
+
+    for event in events:
+        yield from _ics_folded('BEGIN:VEVENT')
+        yield from _ics_folded(f"UID:{ics_text(event['uid'])}")
+        yield from _ics_folded(f'DTSTAMP:{stamp}')
+        yield from _ics_folded(f"DTSTART:{event['start'].strftime('%Y%m%dT%H%M%S')}")
+        if event.get('end') is not None:
+            yield from _ics_folded(f"DTEND:{event['end'].strftime('%Y%m%dT%H%M%S')}")
+        yield from _ics_folded(f"SUMMARY:{ics_text(event['summary'])}")
+        for name, key in (('LOCATION', 'location'), ('DESCRIPTION', 'description'), ('CATEGORIES', 'categories')):
+            if event.get(key):
+                yield from _ics_folded(f'{name}:{ics_text(event[key])}')
+        if event.get('url'):
+            yield from _ics_folded(f"URL:{ics_uri(event['url'])}")
+        yield from _ics_folded('END:VEVENT')
+
+    yield from _ics_folded('END:VCALENDAR')
+
+
+def ics_event_times(date, start_time, end_time):
+    """Floating start and end datetimes from a date and 'HH:MM' times
+
+    An end before the start is taken to fall on the next day; an end equal
+    to the start is dropped, leaving an instant event.
+    """
+    midnight = datetime(date.year, date.month, date.day)
+    start = midnight + _clock_offset(start_time)
+    end = midnight + _clock_offset(end_time)
+    if end < start:
+        end += timedelta(days=1)
+    return start, (end if end > start else None)
+
+
+def _clock_offset(clock):
+    hours, minutes = clock.split(':')
+    return timedelta(hours=int(hours), minutes=int(minutes))
+
+
+def ics_text(value):
+    """Escape a TEXT property value"""
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace(';', '\\;')
+            .replace(',', '\\,')
+            .replace('\r\n', '\\n')
+            .replace('\n', '\\n')
+            .replace('\r', '\\n'))
+
+
+def ics_uri(value):
+    """A URI property value with control characters removed
+
+    URIs are not TEXT, so they are not backslash-escaped, but a CR or LF
+    would still end the content line and let the value inject properties.
+    """
+    return ICS_CONTROL_CHARS.sub('', str(value))
+
+
+def _ics_folded(line):
+    """Yield one content line, folded so no physical line exceeds 75 octets"""
+    if len(line.encode('utf-8')) <= ICS_LINE_OCTETS:
+        yield line + '\r\n'
+        return
+
+    parts = []
+    size = 0
+    for char in line:
+        octets = len(char.encode('utf-8'))
+        if size + octets > ICS_LINE_OCTETS:
+            yield ''.join(parts) + '\r\n'
+            # Continuation lines start with a space, which counts toward the limit
+            parts = [' ']
+            size = 1
+        parts.append(char)
+        size += octets
+    yield ''.join(parts) + '\r\n'
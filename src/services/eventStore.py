@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Optional SQLite event store
+
+Calendars can be kept on the server so exports name a trip instead of
+uploading the whole calendar. Each event is one row, with its trip id and
+start date copied into indexed columns. Pulling a trip's events is then an
+index range scan whose cost follows the size of the trip, not the calendar.
+
+Events keep their upload order (`position`), so exports see them in the
+same order as an uploaded calendarData. Updating an event keeps its place;
+new events go to the end.
+
+Environment:
+- HOLIDAYMOO_EVENT_DB: path of the SQLite database; the store is off when unset
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from exportLogging import fields, get_logger
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used without it
+    orjson = None
+
+log = get_logger('event_store')
+
+# The YYYY-MM-DD a startTime starts on, as the services read it
+START_DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendars (
+    calendar_id TEXT PRIMARY KEY,
+    fields TEXT NOT NULL,
+    next_position INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    trip_id TEXT,
+    start_date TEXT,
+    position INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_by_trip ON events (calendar_id, trip_id, position);
+CREATE INDEX IF NOT EXISTS events_by_start_date ON events (calendar_id, start_date);
+"""
+
+
+class StoreError(Exception):
+    """A store request that cannot be served; `status` is the HTTP status to report"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _dumps(value):
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode('utf-8')
+        except TypeError:
+            # Non-string keys or integers orjson cannot hold
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _event_row(calendar_id, event):
+    if not isinstance(event, dict) or event.get('id') is None:
+        raise StoreError("Every event needs an id to be stored")
+    match = START_DATE_PATTERN.search(str(event.get('startTime') or ''))
+    return (
+        calendar_id,
+        str(event['id']),
+        None if event.get('tripId') is None else str(event['tripId']),
+        match.group(0) if match else None,
+        _dumps(event),
+    )
+
+
+class EventStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """Open the store at HOLIDAYMOO_EVENT_DB, or return None when it is not set"""
+        path = os.environ.get('HOLIDAYMOO_EVENT_DB')
+        return cls(path) if path else None
+
+    def put_calendar(self, calendar_id, calendar_data):
+        """Store a whole calendar, replacing any previous copy. Returns (summary, created)"""
+        rows = [_event_row(calendar_id, event) for event in calendar_data.get('events') or []]
+        calendar_fields = {key: value for key, value in calendar_data.items() if key != 'events'}
+
+        with self._connect() as conn:
+            created = conn.execute("DELETE FROM calendars WHERE calendar_id = ?", (calendar_id,)).rowcount == 0
+            conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+            conn.execute(
+                "INSERT INTO calendars (calendar_id, fields, next_position, updated_at) VALUES (?, ?, 0, ?)",
+                (calendar_id, _dumps(calendar_fields), time.time()),
+            )
+            self._upsert_rows(conn, calendar_id, rows)
+            summary = self._summary(conn, calendar_id)
+
+        log.info("Calendar stored", extra=fields(calendar_id=calendar_id, events=len(rows), created=created))
+        return summary, created
+
+    def upsert_events(self, calendar_id, events=(), removed=(), calendar_fields=None):
+        """Add or replace events by id, delete `removed` ids and update top-level fields"""
+        rows = [_event_row(calendar_id, event) for event in events]
+
+        with self._connect() as conn:
+            stored_fields = self._fields(conn, calendar_id)
+            if calendar_fields:
+                stored_fields.update((key, value) for key, value in calendar_fields.items() if key != 'events')
+            conn.execute(
+                "UPDATE calendars SET fields = ?, updated_at = ? WHERE calendar_id = ?",
+                (_dumps(stored_fields), time.time(), calendar_id),
+            )
+            conn.executemany(
+                "DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+                [(calendar_id, str(event_id)) for event_id in removed],
+            )
+            self._upsert_rows(conn, calendar_id, rows)
+            summary = self._summary(conn, calendar_id)
+
+        log.info("Calendar events upserted", extra=fields(calendar_id=calendar_id, upserted=len(rows), removed=len(removed)))
+        return summary
+
+    def delete_calendar(self, calendar_id):
+        with self._connect() as conn:
+            if conn.execute("DELETE FROM calendars WHERE calendar_id = ?", (calendar_id,)).rowcount == 0:
+                raise StoreError("Unknown calendar", status=404)
+            conn.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+
+    def summary(self, calendar_id):
+        with self._connect() as conn:
+            return self._summary(conn, calendar_id)
+
+    def calendar_fields(self, calendar_id):
+        """Everything stored for the calendar except its events"""
+        with self._connect() as conn:
+            return self._fields(conn, calendar_id)
+
+    def trip_events(self, calendar_id, trip_id):
+        """Events whose tripId is `trip_id`, in upload order"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT body FROM events WHERE calendar_id = ? AND trip_id = ? ORDER BY position",
+                (calendar_id, str(trip_id)),
+            ).fetchall()
+        return [_loads(body) for body, in rows]
+
+    def events_between(self, calendar_id, first_day, last_day):
+        """Events starting on `first_day`..`last_day` (ISO dates), in upload order
+
+        Events without a readable start date are included as well, for the
+        caller's own date parsing to accept or drop.
+        """
+        # Two index range scans; an OR in one WHERE would scan the calendar
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT position, body FROM events WHERE calendar_id = ? AND start_date BETWEEN ? AND ? "
+                "UNION ALL "
+                "SELECT position, body FROM events WHERE calendar_id = ? AND start_date IS NULL "
+                "ORDER BY position",
+                (calendar_id, first_day, last_day, calendar_id),
+            ).fetchall()
+        return [_loads(body) for _, body in rows]
+
+    def _connect(self):
+        # One connection per thread; `with conn:` wraps each call in a transaction
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _fields(self, conn, calendar_id):
+        row = conn.execute("SELECT fields FROM calendars WHERE calendar_id = ?", (calendar_id,)).fetchone()
+        if row is None:
+            raise StoreError("Unknown calendar", status=404)
+        return _loads(row[0])
+
+    def _summary(self, conn, calendar_id):
+        calendar_fields = self._fields(conn, calendar_id)
+        events, = conn.execute("SELECT COUNT(*) FROM events WHERE calendar_id = ?", (calendar_id,)).fetchone()
+        return {
+            'calendarId': calendar_id,
+            'events': events,
+            'trips': [trip.get('id') for trip in calendar_fields.get('trips') or [] if isinstance(trip, dict)],
+        }
+
+    def _upsert_rows(self, conn, calendar_id, rows):
+        # New events are numbered from the calendar's next position; replaced
+        # events keep the position they already have
+        if not rows:
+            return
+        next_position, = conn.execute(
+            "SELECT next_position FROM calendars WHERE calendar_id = ?", (calendar_id,)).fetchone()
+        conn.executemany(
+            "INSERT INTO events (calendar_id, event_id, trip_id, start_date, position, body) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (calendar_id, event_id) DO UPDATE SET "
+            "trip_id = excluded.trip_id, start_date = excluded.start_date, body = excluded.body",
+            [(cid, eid, trip_id, start_date, next_position + i, body)
+             for i, (cid, eid, trip_id, start_date, body) in enumerate(rows)],
+        )
+        conn.execute(
+            "UPDATE calendars SET next_position = ? WHERE calendar_id = ?",
+            (next_position + len(rows), calendar_id),
+        )
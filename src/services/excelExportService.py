@@ -18,7 +18,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Tuple
 import openpyxl
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.hyperlink import Hyperlink
 import io
@@ -28,11 +28,40 @@ import urllib.parse
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 
+from calendarLayout import day_columns, layout_days
+from eventStore import EventStore, StoreError
+from exportHttp import (
+    RequestBodyError, decode_request_body, decode_trip_request, request_body_error_response, request_content_types,
+    request_encodings, send_xlsx, wants_binary_xlsx,
+)
+from exportLogging import fields, flask_request_logging, get_logger
+from exportMetrics import ServiceMetrics, metrics_response
+from renderPool import RenderPool
+from timeSlots import floor_slot_table, parse_day_key, parse_iso_local
+from tripAnalytics import EventColumns
+from workbookCompression import COMPRESSION_LEVELS, save_workbook
+from workbookStreaming import copy_worksheet_streamed, styled_cell
+from workbookStyles import StyleRegistry, box_border, solid_fill
+
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['Content-Disposition'])
+app.before_request(flask_request_logging)
+
+log = get_logger('excel_export')
+export_metrics = ServiceMetrics('excelExportService')
+
+# Calendar grid styles, built once per process
+calendar_styles = StyleRegistry('Travel Calendar')
+
+# Calendars kept in SQLite (HOLIDAYMOO_EVENT_DB), written through the local
+# export service's /stored-calendars endpoints
+event_store = EventStore.from_env()
 
 class TravelCalendarExporter:
-    def __init__(self):
+    def __init__(self, pool: RenderPool = None):
+        # Optional RenderPool that builds workbooks in worker processes
+        self.pool = pool
+        
         self.event_colors = {
             'meeting': 'FFE6F2FF',      # Blue
             'appointment': 'FFE6F7E6',  # Green  
@@ -45,15 +74,87 @@ class TravelCalendarExporter:
             'default': 'FFF0F8FF'       # Alice Blue
         }
         
-    def create_excel_export(self, calendar_data: Dict[str, Any], trip_data: Dict[str, Any]) -> bytes:
-        """Create Excel file with calendar and event list sheets"""
-        wb = Workbook()
+        # Enhanced headers with more information
+        self.event_list_headers = [
+            "Event Name", "Date", "Day of Week", "Start Time", "End Time", "Duration", 
+            "Type", "Location", "Description", "Cost", "Contact", "Tags", "Website", "Rating", "Prepaid"
+        ]
         
-        # Remove default sheet
-        wb.remove(wb.active)
+        calendar_styles.define_once(self._build_calendar_styles)
+    
+    def _build_calendar_styles(self) -> Dict[str, Dict]:
+        """Style definitions for the calendar grid, applied by name"""
+        grid_border = box_border('thin', 'FFE5E7EB')
+        header_fill = solid_fill('FF3B82F6')
+        
+        styles = {
+            'time_header': dict(font=Font(bold=True, size=10, color='FFFFFFFF'), fill=header_fill,
+                                alignment=Alignment(horizontal='center', vertical='center'), border=grid_border),
+            'date_header': dict(font=Font(bold=True, size=9, color='FFFFFFFF'), fill=header_fill,
+                                alignment=Alignment(horizontal='center', vertical='center', wrap_text=True), border=grid_border),
+            'time_slot': dict(font=Font(size=9), fill=solid_fill('FFF9FAFB'), border=grid_border),
+            'grid': dict(border=grid_border),
+        }
         
+        event_font = Font(size=9, bold=True, color='FF1F2937')
+        event_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        event_border = box_border('thin')
+        for event_type, color in self.event_colors.items():
+            styles[f'event_{event_type}'] = dict(font=event_font, fill=solid_fill(color),
+                                                 alignment=event_alignment, border=event_border)
+        return styles
+        
+    def create_excel_export(self, calendar_data: Dict[str, Any], trip_data: Dict[str, Any], streaming: bool = None,
+                            compression: str = None) -> bytes:
+        """Create Excel file with calendar and event list sheets
+        
+        streaming=True builds in write-only mode, which holds fewer cells in
+        memory but is no faster, so it is only used when asked for.
+        compression is one of COMPRESSION_LEVELS; None uses HOLIDAYMOO_XLSX_COMPRESSION.
+        """
+        excel_buffer = self.render_excel_export(calendar_data, trip_data, streaming, compression)
+        return excel_buffer.getvalue()
+    
+    def render_excel_export(self, calendar_data: Dict[str, Any], trip_data: Dict[str, Any], streaming: bool = None,
+                            compression: str = None) -> io.BytesIO:
+        """Render the Excel file into an in-memory buffer without copying the saved bytes"""
         # Get trip events
         trip_events = self._get_trip_events(calendar_data['events'], trip_data['id'])
+        export_metrics.observe_export(events=len(trip_events))
+        
+        if self.pool is not None and self.pool.uses_workers:
+            # Build in a worker process so concurrent exports are not bound by the GIL;
+            # the sheets only read the trip's events, so only those are sent
+            with export_metrics.stage('render_pool'):
+                data, stages = self.pool.run(
+                    render_export_bytes, dict(calendar_data, events=[]), trip_data, trip_events, streaming, compression)
+            export_metrics.record_stages(stages)
+            return io.BytesIO(data)
+        
+        return self.build_excel_export(calendar_data, trip_data, trip_events, streaming, compression)
+    
+    def build_excel_export(self, calendar_data: Dict[str, Any], trip_data: Dict[str, Any], trip_events: List[Dict],
+                           streaming: bool = None, compression: str = None) -> io.BytesIO:
+        """Build and save the workbook for already filtered trip events in this process"""
+        if streaming:
+            wb = self._create_streaming_workbook(calendar_data, trip_data, trip_events)
+        else:
+            wb = self._create_workbook(calendar_data, trip_data, trip_events)
+        
+        # Save to bytes
+        excel_buffer = io.BytesIO()
+        with export_metrics.stage('save'):
+            save_workbook(wb, excel_buffer, compression)
+        excel_buffer.seek(0)
+        
+        return excel_buffer
+    
+    def _create_workbook(self, calendar_data: Dict, trip_data: Dict, trip_events: List[Dict]) -> Workbook:
+        """Build the workbook with regular in-memory worksheets"""
+        wb = Workbook()
+        
+        # Remove default sheet
+        wb.remove(wb.active)
         
         # Create Calendar sheet
         calendar_sheet = wb.create_sheet("Calendar")
@@ -68,17 +169,42 @@ class TravelCalendarExporter:
         summary_sheet = wb.create_sheet("Trip Summary")
         self._create_trip_summary_sheet(summary_sheet, calendar_data, trip_data, trip_events)
         
-        # Save to bytes
-        excel_buffer = io.BytesIO()
-        wb.save(excel_buffer)
-        excel_buffer.seek(0)
+        return wb
+    
+    def _create_streaming_workbook(self, calendar_data: Dict, trip_data: Dict, trip_events: List[Dict]) -> Workbook:
+        """Build a write-only workbook that streams the event list row by row"""
+        wb = Workbook(write_only=True)
         
-        return excel_buffer.getvalue()
+        # Calendar and summary sheets are small, so build them normally and copy them across
+        scratch = Workbook()
+        scratch.remove(scratch.active)
+        
+        calendar_sheet = scratch.create_sheet("Calendar")
+        custom_day_headers = calendar_data.get('customDayHeaders', {})
+        self._create_calendar_sheet(calendar_sheet, trip_data, trip_events, custom_day_headers)
+        
+        summary_sheet = scratch.create_sheet("Trip Summary")
+        self._create_trip_summary_sheet(summary_sheet, calendar_data, trip_data, trip_events)
+        
+        copy_worksheet_streamed(wb, calendar_sheet)
+        self._stream_event_list_sheet(wb, trip_events)
+        copy_worksheet_streamed(wb, summary_sheet)
+        
+        return wb
+    
+    def trip_event_filter(self, trip_data: Dict[str, Any]):
+        """Predicate keeping the calendar events _get_trip_events picks, or None to keep all"""
+        if 'id' not in trip_data:
+            return None
+        trip_id = trip_data['id']
+        return lambda event: not isinstance(event, dict) or event.get('tripId') == trip_id
     
+    @export_metrics.timed_stage('filter_events')
     def _get_trip_events(self, all_events: List[Dict], trip_id: str) -> List[Dict]:
         """Filter events for the specific trip"""
         return [event for event in all_events if event.get('tripId') == trip_id]
     
+    @export_metrics.timed_stage('calendar_sheet')
     def _create_calendar_sheet(self, sheet, trip_data: Dict, events: List[Dict], custom_day_headers: Dict = None):
         """Create the calendar view sheet"""
         start_date = datetime.fromisoformat(trip_data['startDate'].replace('Z', '+00:00')).date()
@@ -118,42 +244,35 @@ class TravelCalendarExporter:
                 else:
                     display_time = f"{hour - 12}:{minute:02d} PM"
                 time_slots.append((time_str, display_time))
+        slot_table = floor_slot_table(tuple(time_str for time_str, _ in time_slots))
         
         # Calculate date range
+        dates = []
         current_date = start_date
-        date_columns = []
-        col_index = 2  # Start from column B (A is for time)
-        
         while current_date <= end_date:
-            date_columns.append((current_date, col_index))
-            col_index += 1
+            dates.append(current_date)
             current_date += timedelta(days=1)
         
-        # Create headers
+        # Lay out events up front so overlapping ones sit side by side in
+        # lanes of their day column (column A is for time)
+        layouts = self._layout_calendar_events(dates, events, slot_table, len(time_slots))
+        lane_columns = day_columns(dates, layouts)
+        date_columns = [(date, lane_columns[date][0]) for date in dates]
+        last_col = 1 + sum(lanes for _, lanes in lane_columns.values())
+        
+        # Parse the custom day headers once, keyed by date
+        day_headers = self._index_custom_day_headers(custom_day_headers)
+        
+        # Create headers (styles include the grid borders)
         time_header_cell = sheet['A4']
         time_header_cell.value = "Time"
-        time_header_cell.font = Font(bold=True, size=10, color='FFFFFFFF')
-        time_header_cell.fill = PatternFill(start_color='FF3B82F6', end_color='FF3B82F6', fill_type='solid')
-        time_header_cell.alignment = Alignment(horizontal='center', vertical='center')
+        calendar_styles.apply(time_header_cell, 'time_header')
         
         for date, col in date_columns:
             cell = sheet.cell(row=4, column=col)
             
             # Check for custom day header
-            date_key = date.strftime('%a %b %d %Y')  # Format: "Sat Sep 13 2025"
-            custom_header = None
-            
-            if custom_day_headers:
-                # Try different date key formats
-                for key, header_data in custom_day_headers.items():
-                    try:
-                        # Parse the key date and compare
-                        key_date = datetime.strptime(key, '%a %b %d %Y').date()
-                        if key_date == date:
-                            custom_header = header_data
-                            break
-                    except:
-                        continue
+            custom_header = day_headers.get(date)
             
             # Enhanced date header with custom day header if available
             date_header = f"{date.strftime('%A')}\n{date.strftime('%B %d, %Y')}"
@@ -171,10 +290,12 @@ class TravelCalendarExporter:
             date_header += f"\n{date.strftime('%m/%d')}"
             
             cell.value = date_header
-            cell.font = Font(bold=True, size=9, color='FFFFFFFF')  # White text on blue background
-            cell.fill = PatternFill(start_color='FF3B82F6', end_color='FF3B82F6', fill_type='solid')
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            sheet.column_dimensions[get_column_letter(col)].width = 20
+            calendar_styles.apply(cell, 'date_header')  # White text on blue background
+            lanes = lane_columns[date][1]
+            for lane_col in range(col, col + lanes):
+                sheet.column_dimensions[get_column_letter(lane_col)].width = 20 if lanes == 1 else 16
+            if lanes > 1:
+                sheet.merge_cells(start_row=4, start_column=col, end_row=4, end_column=col + lanes - 1)
             
             # Make the header row taller to accommodate more text
             sheet.row_dimensions[4].height = 60
@@ -182,112 +303,181 @@ class TravelCalendarExporter:
         # Create time slots
         for i, (time_str, display_time) in enumerate(time_slots):
             row = current_row + i
-            sheet.cell(row=row, column=1, value=display_time)
-            sheet.cell(row=row, column=1).font = Font(size=9)
-            sheet.cell(row=row, column=1).fill = PatternFill(start_color='FFF9FAFB', end_color='FFF9FAFB', fill_type='solid')
+            calendar_styles.apply(sheet.cell(row=row, column=1, value=display_time), 'time_slot')
         
         # Set time column width
         sheet.column_dimensions['A'].width = 12
         
         # Add events to calendar
         event_positions = {}  # Store event positions for hyperlinks
+        merged = set()  # Non-anchor cells of event merges; the merge borders their outline
+        for date, col in date_columns:
+            for placement in layouts[date].placements:
+                event, event_start, event_end = placement.item
+                start_row = current_row + placement.start
+                end_row = current_row + placement.end - 1
+                start_col = col + placement.lane
+                end_col = col + placement.last_lane
+                
+                # Get event style
+                event_type = event.get('type', 'default')
+                event_style = f'event_{event_type}' if event_type in self.event_colors else 'event_default'
+                
+                # Create event block with sanitized data
+                event_name = self._sanitize_for_excel(event.get('name', 'Event'))
+                event_text = f"{event_name}\n{event_start.strftime('%H:%M')}-{event_end.strftime('%H:%M')}"
+                
+                event_cell = sheet.cell(row=start_row, column=start_col)
+                event_cell.value = event_text
+                calendar_styles.apply(event_cell, event_style)
+                
+                # Store position for hyperlinks
+                event_positions[event['id']] = f"{get_column_letter(start_col)}{start_row}"
+                
+                # Merge cells if event spans multiple time slots or lanes
+                if end_row > start_row or end_col > start_col:
+                    sheet.merge_cells(start_row=start_row, start_column=start_col, end_row=end_row, end_column=end_col)
+                    merged.update((row, column) for row in range(start_row, end_row + 1)
+                                  for column in range(start_col, end_col + 1))
+                    merged.discard((start_row, start_col))
+        
+        # Add borders to the rest of the calendar. Merging copies the anchor's
+        # border onto the cells of the merge's outline only, so merged cells are
+        # left alone and just the empty grid is styled here
+        for row in range(4, current_row + len(time_slots)):
+            for col in range(1, last_col + 1):
+                if (row, col) in merged:
+                    continue
+                cell = sheet.cell(row=row, column=col)
+                if not cell.border.left.style:
+                    calendar_styles.apply(cell, 'grid')
         
+        return event_positions
+    
+    def _index_custom_day_headers(self, custom_day_headers: Dict) -> Dict:
+        """Map customDayHeaders keys to dates; the first key for a date wins.
+        
+        Keys in no recognised format are logged once per export and skipped.
+        """
+        index = {}
+        unrecognised = []
+        for key, header_data in (custom_day_headers or {}).items():
+            key_date = parse_day_key(key)
+            if key_date is None:
+                unrecognised.append(key)
+            else:
+                index.setdefault(key_date, header_data)
+        
+        if unrecognised:
+            log.warning("Ignoring custom day headers with unrecognised date keys", extra=fields(
+                count=len(unrecognised), keys=[str(key) for key in unrecognised[:10]]))
+        return index
+    
+    def _layout_calendar_events(self, dates, events: List[Dict], slot_table, num_slots: int) -> Dict:
+        """Assign overlapping events to side-by-side lanes; returns {date: DayLayout}"""
+        intervals = []
         for event in events:
             # Parse event times
             event_start = self._parse_local_datetime(event['startTime'])
             event_end = self._parse_local_datetime(event['endTime'])
-            event_date = event_start.date()
-            
-            # Find the column for this date
-            event_col = None
-            for date, col in date_columns:
-                if date == event_date:
-                    event_col = col
-                    break
-            
-            if event_col is None:
-                continue
             
             # Find the row for start time
-            start_time_str = event_start.strftime('%H:%M')
-            start_row = None
-            
-            for i, (time_str, _) in enumerate(time_slots):
-                if time_str <= start_time_str:
-                    start_row = current_row + i
-            
-            if start_row is None:
-                start_row = current_row
+            start_slot = slot_table[event_start.hour * 60 + event_start.minute] or 0
             
             # Calculate duration in 30-minute slots
             duration_minutes = (event_end - event_start).total_seconds() / 60
             duration_slots = max(1, int(duration_minutes / 30))
+            end_slot = min(start_slot + duration_slots, num_slots)
             
-            # Get event color
-            event_type = event.get('type', 'default')
-            color = self.event_colors.get(event_type, self.event_colors['default'])
-            
-            # Create event block with sanitized data
-            event_name = self._sanitize_for_excel(event.get('name', 'Event'))
-            event_text = f"{event_name}\n{event_start.strftime('%H:%M')}-{event_end.strftime('%H:%M')}"
-            
-            event_cell = sheet.cell(row=start_row, column=event_col)
-            event_cell.value = event_text
-            event_cell.font = Font(size=9, bold=True, color='FF1F2937')
-            event_cell.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-            event_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            event_cell.border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            
-            # Store position for hyperlinks
-            event_positions[event['id']] = f"{get_column_letter(event_col)}{start_row}"
-            
-            # Merge cells if event spans multiple time slots
-            if duration_slots > 1:
-                end_row = min(start_row + duration_slots - 1, current_row + len(time_slots) - 1)
-                if end_row > start_row:
-                    sheet.merge_cells(f"{get_column_letter(event_col)}{start_row}:{get_column_letter(event_col)}{end_row}")
-        
-        # Add borders to the entire calendar
-        for row in range(4, current_row + len(time_slots)):
-            for col in range(1, len(date_columns) + 2):
-                cell = sheet.cell(row=row, column=col)
-                if not cell.border.left.style:
-                    cell.border = Border(
-                        left=Side(style='thin', color='FFE5E7EB'),
-                        right=Side(style='thin', color='FFE5E7EB'),
-                        top=Side(style='thin', color='FFE5E7EB'),
-                        bottom=Side(style='thin', color='FFE5E7EB')
-                    )
-        
-        return event_positions
+            intervals.append((event_start.date(), start_slot, end_slot, (event, event_start, event_end)))
+        layouts = layout_days(dates, intervals)
+        
+        # Conflict report: one entry per run of overlapping events
+        conflicts = [
+            {
+                'date': date.isoformat(),
+                'start_slot': conflict.start,
+                'end_slot': conflict.end,
+                'lanes': conflict.lanes,
+                'events': [event.get('id') for event, _, _ in conflict.items],
+            }
+            for date, layout in layouts.items()
+            for conflict in layout.conflicts
+        ]
+        if conflicts:
+            log.info("Overlapping events placed side by side", extra=fields(
+                days=len({conflict['date'] for conflict in conflicts}), conflicts=len(conflicts)))
+            for conflict in conflicts:
+                log.debug("Calendar overlap", extra=fields(**conflict))
+        return layouts
     
+    @export_metrics.timed_stage('events_sheet')
     def _create_event_list_sheet(self, sheet, events: List[Dict], calendar_sheet):
         """Create the event list sheet with hyperlinks to calendar"""
         sheet.title = "Event List"
         
-        # Enhanced headers with more information
-        headers = [
-            "Event Name", "Date", "Day of Week", "Start Time", "End Time", "Duration", 
-            "Type", "Location", "Description", "Cost", "Contact", "Tags", "Website", "Rating", "Prepaid"
-        ]
-        
         # Set headers
-        for col, header in enumerate(headers, 1):
+        for col, header in enumerate(self.event_list_headers, 1):
             cell = sheet.cell(row=1, column=col, value=header)
             cell.font = Font(bold=True, color='FFFFFFFF')
             cell.fill = PatternFill(start_color='FF3B82F6', end_color='FF3B82F6', fill_type='solid')
             cell.alignment = Alignment(horizontal='center', vertical='center')
         
+        # Add event data
+        for row, (values, location_url, website, linked) in enumerate(self._event_list_rows(events), 2):
+            for col, value in enumerate(values, 1):
+                if value is not None:
+                    sheet.cell(row=row, column=col, value=value)
+            
+            # Event name styled as a link to the calendar
+            if linked:
+                sheet.cell(row=row, column=1).font = Font(color='FF2563EB', underline='single')
+            
+            # Add hyperlink if available
+            if location_url:
+                location_cell = sheet.cell(row=row, column=8)
+                location_cell.hyperlink = location_url
+                location_cell.font = Font(color='FF2563EB', underline='single')
+            
+            if website:
+                website_cell = sheet.cell(row=row, column=13)
+                website_cell.hyperlink = website
+                website_cell.font = Font(color='FF2563EB', underline='single')
+        
+        self._set_event_list_widths(sheet)
+    
+    @export_metrics.timed_stage('events_sheet')
+    def _stream_event_list_sheet(self, wb, events: List[Dict]):
+        """Write the event list into a write-only workbook one row at a time"""
+        sheet = wb.create_sheet("Event List")
+        
+        # Column widths have to be set before any row is written
+        self._set_event_list_widths(sheet)
+        
+        header_font = Font(bold=True, color='FFFFFFFF')
+        header_fill = PatternFill(start_color='FF3B82F6', end_color='FF3B82F6', fill_type='solid')
+        header_alignment = Alignment(horizontal='center', vertical='center')
+        sheet.append([
+            styled_cell(sheet, header, font=header_font, fill=header_fill, alignment=header_alignment)
+            for header in self.event_list_headers
+        ])
+        
+        link_font = Font(color='FF2563EB', underline='single')
+        for values, location_url, website, linked in self._event_list_rows(events):
+            if linked:
+                values[0] = styled_cell(sheet, values[0], font=link_font)
+            if location_url:
+                values[7] = styled_cell(sheet, values[7], font=link_font, hyperlink=location_url)
+            if website:
+                values[12] = styled_cell(sheet, values[12], font=link_font, hyperlink=website)
+            sheet.append(values)
+    
+    def _event_list_rows(self, events: List[Dict]):
+        """Yield (values, location_url, website, linked) for each event list row, sorted by start time"""
         # Sort events by start time
         sorted_events = sorted(events, key=lambda x: x['startTime'])
         
-        # Add event data
-        for row, event in enumerate(sorted_events, 2):
+        for event in sorted_events:
             try:
                 # Parse event times
                 event_start = self._parse_local_datetime(event['startTime'])
@@ -299,32 +489,13 @@ class TravelCalendarExporter:
                 
                 # Event name with hyperlink to calendar
                 event_name = self._sanitize_for_excel(event.get('name', 'Untitled Event'))
-                name_cell = sheet.cell(row=row, column=1, value=event_name)
-                name_cell.font = Font(color='FF2563EB', underline='single')
-                
-
-                
-                # Other event details with sanitization
-                sheet.cell(row=row, column=2, value=event_start.strftime('%Y-%m-%d'))
-                sheet.cell(row=row, column=3, value=event_start.strftime('%A'))  # Day of week
-                sheet.cell(row=row, column=4, value=event_start.strftime('%H:%M'))
-                sheet.cell(row=row, column=5, value=event_end.strftime('%H:%M'))
-                sheet.cell(row=row, column=6, value=duration_str)
-                sheet.cell(row=row, column=7, value=self._sanitize_for_excel(event.get('type', 'Event')))
                 
                 # Handle complex location objects with hyperlinks
                 location_value = event.get('location', '')
                 location_str, location_url = self._extract_location_with_link(location_value)
-                location_cell = sheet.cell(row=row, column=8, value=location_str)
-                
-                # Add hyperlink if available
-                if location_url:
-                    location_cell.hyperlink = location_url
-                    location_cell.font = Font(color='FF2563EB', underline='single')
                 
                 # Description/remark
                 description = self._sanitize_for_excel(event.get('remark', ''))
-                sheet.cell(row=row, column=9, value=description)
                 
                 # Cost formatting
                 cost = event.get('cost', '')
@@ -335,41 +506,53 @@ class TravelCalendarExporter:
                         cost_str = f"${cost_value:.2f}"
                     except:
                         cost_str = self._sanitize_for_excel(str(cost))
-                sheet.cell(row=row, column=10, value=cost_str)
                 
                 # Contact
                 contact = self._sanitize_for_excel(event.get('contact', ''))
-                sheet.cell(row=row, column=11, value=contact)
                 
                 # Tags
                 tags = self._sanitize_for_excel(event.get('tags', ''))
-                sheet.cell(row=row, column=12, value=tags)
                 
                 # Website/Link
                 website = self._sanitize_for_excel(event.get('link', ''))
-                if website:
-                    website_cell = sheet.cell(row=row, column=13, value=website)
-                    website_cell.hyperlink = website
-                    website_cell.font = Font(color='FF2563EB', underline='single')
                 
                 # Rating (if available from location data)
                 rating = ""
                 if isinstance(location_value, dict) and 'rating' in location_value:
                     rating = f"⭐ {location_value['rating']}"
-                sheet.cell(row=row, column=14, value=rating)
                 
                 # Prepaid status
                 prepaid_status = "✅ Yes" if event.get('isPrepaid') else "❌ No"
-                sheet.cell(row=row, column=15, value=prepaid_status)
+                
+                values = [
+                    event_name,
+                    event_start.strftime('%Y-%m-%d'),
+                    event_start.strftime('%A'),  # Day of week
+                    event_start.strftime('%H:%M'),
+                    event_end.strftime('%H:%M'),
+                    duration_str,
+                    self._sanitize_for_excel(event.get('type', 'Event')),
+                    location_str,
+                    description,
+                    cost_str,
+                    contact,
+                    tags,
+                    website or None,
+                    rating,
+                    prepaid_status,
+                ]
+                row = (values, location_url, website, True)
                 
             except Exception as e:
                 # Add a basic row with error info
-                sheet.cell(row=row, column=1, value=f"Error: {event.get('name', 'Unknown Event')}")
-                sheet.cell(row=row, column=2, value="Error processing event")
-                continue
-        
+                row = ([f"Error: {event.get('name', 'Unknown Event')}", "Error processing event"], None, None, False)
+            
+            yield row
+    
+    def _set_event_list_widths(self, sheet):
+        """Set event list column widths"""
         # Auto-adjust column widths
-        for col in range(1, len(headers) + 1):
+        for col in range(1, len(self.event_list_headers) + 1):
             sheet.column_dimensions[get_column_letter(col)].width = 12
         
         # Special width adjustments for better readability
@@ -511,6 +694,11 @@ class TravelCalendarExporter:
         if not datetime_str:
             return datetime.now()
         
+        # Fast path: plain ISO-8601, memoised across events
+        parsed_dt = parse_iso_local(datetime_str)
+        if parsed_dt is not None:
+            return parsed_dt + timedelta(hours=8)
+        
         try:
             parsed_dt = None
             
@@ -549,6 +737,17 @@ class TravelCalendarExporter:
         # Fallback to current time
         return datetime.now()
     
+    def _summary_cost(self, event: Dict) -> float:
+        """Numeric cost of an event for the summary totals, 0 when it is not a number"""
+        cost = event.get('cost', '')
+        if cost:
+            try:
+                return float(cost)
+            except (TypeError, ValueError):
+                pass
+        return 0
+    
+    @export_metrics.timed_stage('summary_sheet')
     def _create_trip_summary_sheet(self, sheet, calendar_data: Dict, trip_data: Dict, events: List[Dict]):
         """Create a comprehensive trip summary sheet"""
         sheet.title = "Trip Summary"
@@ -591,29 +790,16 @@ class TravelCalendarExporter:
         
         # Calculate statistics
         total_events = len(events)
-        event_types = {}
-        total_cost = 0
-        prepaid_count = 0
-        events_with_location = 0
-        
-        for event in events:
-            # Count by type
-            event_type = event.get('type', 'Other')
-            event_types[event_type] = event_types.get(event_type, 0) + 1
-            
-            # Calculate costs
-            cost = event.get('cost', '')
-            if cost:
-                try:
-                    total_cost += float(cost)
-                except:
-                    pass
-            
-            if event.get('isPrepaid'):
-                prepaid_count += 1
-            
-            if event.get('location'):
-                events_with_location += 1
+        columns = EventColumns.build(
+            start_date.date(),
+            max((end_date.date() - start_date.date()).days + 1, 0),
+            ((self._parse_local_datetime(event['startTime']).date(), event.get('type', 'Other'), self._summary_cost(event))
+             for event in events),
+        )
+        event_types = columns.type_counts()
+        total_cost = columns.total_cost
+        prepaid_count = sum(1 for event in events if event.get('isPrepaid'))
+        events_with_location = sum(1 for event in events if event.get('location'))
         
         stats = [
             ("Total Events:", str(total_events)),
@@ -648,26 +834,17 @@ class TravelCalendarExporter:
         sheet[f'A{row}'].font = Font(size=14, bold=True, color='FF3B82F6')
         row += 1
         
-        # Group events by date
-        events_by_date = {}
-        for event in events:
-            event_date = self._parse_local_datetime(event['startTime']).date()
-            if event_date not in events_by_date:
-                events_by_date[event_date] = []
-            events_by_date[event_date].append(event)
-        
-        # Create daily overview
+        # Create daily overview: event counts and the first three names per day
         current_date = start_date.date()
-        while current_date <= end_date.date():
-            day_events = events_by_date.get(current_date, [])
+        for day_count, first_events in zip(columns.day_counts(), columns.day_members(limit=3)):
             sheet[f'A{row}'] = current_date.strftime('%A, %B %d')
             sheet[f'A{row}'].font = Font(bold=True)
-            sheet[f'B{row}'] = f"{len(day_events)} events"
+            sheet[f'B{row}'] = f"{day_count} events"
             
-            if day_events:
-                event_names = [event.get('name', 'Untitled') for event in day_events[:3]]
-                if len(day_events) > 3:
-                    event_names.append(f"... and {len(day_events) - 3} more")
+            if day_count:
+                event_names = [events[position].get('name', 'Untitled') for position in first_events]
+                if day_count > 3:
+                    event_names.append(f"... and {day_count - 3} more")
                 sheet[f'C{row}'] = ", ".join(event_names)
             
             row += 1
@@ -679,47 +856,174 @@ class TravelCalendarExporter:
         sheet.column_dimensions['C'].width = 40
         sheet.column_dimensions['D'].width = 15
 
+def render_export_bytes(calendar_data: Dict[str, Any], trip_data: Dict[str, Any], trip_events: List[Dict],
+                        streaming: bool = None, compression: str = None) -> Tuple[bytes, List[Tuple[str, float]]]:
+    """Render pool job: build the export in this process and return its bytes and stage timings"""
+    with export_metrics.collect_stages() as stages:
+        excel_buffer = TravelCalendarExporter().build_excel_export(
+            calendar_data, trip_data, trip_events, streaming, compression)
+    return excel_buffer.getvalue(), stages
+
+def warm_render_worker():
+    """Render pool initializer: load openpyxl and the style definitions up front"""
+    TravelCalendarExporter()
+    Workbook().save(io.BytesIO())
+
+# Workbook rendering, in worker processes when HOLIDAYMOO_RENDER_WORKERS is set
+render_pool = RenderPool.from_env(initializer=warm_render_worker)
+
+def export_response(calendar_data: Dict, trip_data: Dict, data: Dict):
+    """Render one trip and answer with the raw file or the JSON/base64 payload"""
+    log.info("Processing export", extra=fields(
+        trip=trip_data.get('name'),
+        trip_id=trip_data.get('id'),
+        total_events=len(calendar_data.get('events', [])),
+    ))
+    
+    # Generate Excel file
+    excel_buffer = exporter.render_excel_export(
+        calendar_data, trip_data, streaming=data.get('streaming'), compression=data.get('compression'))
+    export_metrics.observe_export(output_bytes=excel_buffer.getbuffer().nbytes)
+    
+    # Generate filename
+    filename = exporter.generate_filename(
+        calendar_data.get('title', 'Calendar'),
+        trip_data['name'],
+        trip_data['startDate'],
+        trip_data['endDate']
+    )
+    
+    # Stream the raw file to clients that accept xlsx
+    if wants_binary_xlsx():
+        with export_metrics.stage('response'):
+            return send_xlsx(excel_buffer, filename)
+    
+    # Convert to base64 for JSON response
+    with export_metrics.stage('base64_encode'):
+        excel_b64 = base64.b64encode(excel_buffer.getbuffer()).decode('ascii')
+    
+    with export_metrics.stage('response'):
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'data': excel_b64
+        })
+
+def compression_error_response(data: Dict):
+    """400 response for an unknown `compression` in a request body, else None"""
+    compression = data.get('compression')
+    if compression is None or compression in COMPRESSION_LEVELS:
+        return None
+    return jsonify({
+        'error': f"Unknown compression '{compression}'",
+        'compressions': list(COMPRESSION_LEVELS),
+    }), 400
+
 # Flask API endpoints
-exporter = TravelCalendarExporter()
+exporter = TravelCalendarExporter(pool=render_pool)
+
+# calendarData keys besides events that an export reads
+TRIP_CALENDAR_KEYS = ('title', 'customDayHeaders')
 
 @app.route('/export-trip', methods=['POST'])
+@export_metrics.track_export('export_trip')
 def export_trip():
     """Export trip calendar as Excel file"""
     try:
-        data = request.json
+        try:
+            with export_metrics.stage('decode_json'):
+                # Only the trip's events and the calendar fields the workbook shows are kept
+                data = decode_trip_request(exporter.trip_event_filter, TRIP_CALENDAR_KEYS) or {}
+        except RequestBodyError as e:
+            return request_body_error_response(e)
+        export_metrics.observe_export(payload_bytes=request.content_length)
         calendar_data = data.get('calendarData')
         trip_data = data.get('tripData')
         
         if not calendar_data or not trip_data:
             return jsonify({'error': 'Missing calendar or trip data'}), 400
         
-        # Generate Excel file
-        excel_bytes = exporter.create_excel_export(calendar_data, trip_data)
+        compression_error = compression_error_response(data)
+        if compression_error:
+            return compression_error
         
-        # Generate filename
-        filename = exporter.generate_filename(
-            calendar_data.get('title', 'Calendar'),
-            trip_data['name'],
-            trip_data['startDate'],
-            trip_data['endDate']
-        )
+        return export_response(calendar_data, trip_data, data)
         
-        # Convert to base64 for JSON response
-        excel_b64 = base64.b64encode(excel_bytes).decode('utf-8')
+    except Exception as e:
+        log.exception("Export error")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export-trip/<trip_id>', methods=['POST'])
+@export_metrics.track_export('export_stored_trip')
+def export_stored_trip(trip_id):
+    """Export one trip of a calendar kept in the event store
+    
+    The body (optional) takes `streaming`, `compression`, the stored calendar's
+    `calendarId` (or ?calendarId=) and a `tripData` to use instead of the
+    stored trip, whose id must match the URL's. Only the trip's own event
+    rows are read.
+    """
+    if event_store is None:
+        return jsonify({'error': 'Event store is not enabled'}), 404
+    
+    try:
+        try:
+            with export_metrics.stage('decode_json'):
+                data = decode_request_body() or {}
+        except RequestBodyError as e:
+            return request_body_error_response(e)
         
-        return jsonify({
-            'success': True,
-            'filename': filename,
-            'data': excel_b64
-        })
+        calendar_id = data.get('calendarId') or request.args.get('calendarId')
+        if not calendar_id:
+            return jsonify({'error': 'Missing calendarId'}), 400
+        
+        compression_error = compression_error_response(data)
+        if compression_error:
+            return compression_error
+        
+        # Stored events are looked up by the trip's id, which the URL names
+        if data.get('tripData') is not None and (
+                not isinstance(data['tripData'], dict) or str(data['tripData'].get('id')) != trip_id):
+            return jsonify({'error': 'tripData must be an object with the id of the trip in the URL'}), 400
+        
+        try:
+            with export_metrics.stage('load_events'):
+                calendar_fields = event_store.calendar_fields(calendar_id)
+                trip_data = data.get('tripData') or next(
+                    (trip for trip in calendar_fields.get('trips') or []
+                     if isinstance(trip, dict) and str(trip.get('id')) == trip_id),
+                    None,
+                )
+                if trip_data is None:
+                    raise StoreError("Unknown trip", status=404)
+                calendar_data = dict(calendar_fields, events=event_store.trip_events(calendar_id, trip_data['id']))
+        except StoreError as e:
+            return jsonify({'error': str(e)}), e.status
+        
+        return export_response(calendar_data, trip_data, data)
         
     except Exception as e:
+        log.exception("Export error")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'excel-export'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'excel-export',
+        'accepts': {'encodings': request_encodings(), 'contentTypes': request_content_types()},
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for export stages, sizes and errors"""
+    return metrics_response()
+
+@app.route('/render-stats', methods=['GET'])
+def render_stats():
+    """Render pool size, queue length and per-worker busy time"""
+    return jsonify(render_pool.stats())
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Content-addressed cache for generated workbooks
+
+Two tiers:
+- memory: LRU bounded by a byte budget
+- disk: entries evicted from memory spill here and expire after a TTL
+
+The disk tier is off unless a directory is configured. Cached workbooks hold
+names, locations and costs, so the directory must be private to this user.
+
+Environment:
+- HOLIDAYMOO_CACHE_MB: memory budget (default 64)
+- HOLIDAYMOO_CACHE_DIR: directory for the disk tier (default: no disk tier)
+- HOLIDAYMOO_CACHE_TTL: seconds a disk entry is kept (default 3600)
+"""
+
+import hashlib
+import json
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+from exportLogging import fields, get_logger
+
+log = get_logger('workbook_cache')
+
+
+def cache_key(*parts):
+    """Hash JSON-compatible parts into a stable hex key.
+
+    Keys are sorted and whitespace removed so that the same calendar always
+    hashes the same regardless of how the client serialised it.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        canonical = json.dumps(part, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        digest.update(canonical.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class WorkbookCache:
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, disk_dir=None, disk_ttl=3600):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_ttl = disk_ttl
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0
+
+        self.counters = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+        }
+
+        if self.disk_dir and not self._prepare_disk_dir():
+            self.disk_dir = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from HOLIDAYMOO_CACHE_* environment variables"""
+        return cls(
+            max_memory_bytes=int(os.environ.get('HOLIDAYMOO_CACHE_MB', '64')) * 1024 * 1024,
+            disk_dir=os.environ.get('HOLIDAYMOO_CACHE_DIR') or None,
+            disk_ttl=int(os.environ.get('HOLIDAYMOO_CACHE_TTL', '3600')),
+        )
+
+    def get(self, key):
+        """Return cached workbook bytes, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters['hits'] += 1
+                self.counters['memory_hits'] += 1
+                return data
+
+        data = self._read_disk(key)
+
+        with self._lock:
+            if data is None:
+                self.counters['misses'] += 1
+                return None
+
+            self.counters['hits'] += 1
+            self.counters['disk_hits'] += 1
+            spills = self._store_memory(key, data)
+
+        self._spill_all(spills)
+        return data
+
+    def put(self, key, data):
+        """Store workbook bytes in the memory tier"""
+        with self._lock:
+            spills = self._store_memory(key, data)
+        self._spill_all(spills)
+        self.sweep_disk()
+
+    def stats(self):
+        """Snapshot of counters and tier sizes"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['memory_budget_bytes'] = self.max_memory_bytes
+        stats['disk_enabled'] = bool(self.disk_dir)
+        stats['disk_ttl_seconds'] = self.disk_ttl
+        return stats
+
+    def clear(self):
+        """Drop every memory entry and disk file"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for path in self._disk_paths():
+            self._remove(path)
+
+    def sweep_disk(self, force=False):
+        """Remove expired disk entries, at most a few times per TTL"""
+        now = time.time()
+        if not force and now - self._last_sweep < self.disk_ttl / 10:
+            return
+        self._last_sweep = now
+
+        cutoff = now - self.disk_ttl
+        for path in self._disk_paths():
+            try:
+                expired = os.path.getmtime(path) < cutoff
+            except OSError:
+                continue
+            if expired and self._remove(path):
+                with self._lock:
+                    self.counters['disk_evictions'] += 1
+
+    def _store_memory(self, key, data):
+        # Caller must hold the lock. Returns the (key, data) pairs evicted from
+        # memory, which the caller spills to disk after releasing it
+        if len(data) > self.max_memory_bytes:
+            return [(key, data)]
+
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+
+        spills = []
+        while self._memory_bytes > self.max_memory_bytes:
+            evicted_key, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.counters['memory_evictions'] += 1
+            spills.append((evicted_key, evicted))
+        return spills
+
+    def _spill_all(self, spills):
+        for key, data in spills:
+            self._spill(key, data)
+
+    def _spill(self, key, data):
+        if not self.disk_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Could not spill cached workbook to disk", extra=fields(error=str(e)))
+            self._remove(tmp_path)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            if os.path.getmtime(path) < time.time() - self.disk_ttl:
+                if self._remove(path):
+                    with self._lock:
+                        self.counters['disk_evictions'] += 1
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _prepare_disk_dir(self):
+        """Create the disk tier directory, refusing one other users can touch"""
+        try:
+            os.makedirs(self.disk_dir, mode=0o700, exist_ok=True)
+            info = os.lstat(self.disk_dir)
+        except OSError as e:
+            log.warning("Workbook cache disk tier disabled", extra=fields(dir=self.disk_dir, error=str(e)))
+            return False
+
+        # Another user could have created it first and planted cache entries
+        if not stat.S_ISDIR(info.st_mode):
+            problem = 'not a directory'
+        elif hasattr(os, 'getuid') and info.st_uid != os.getuid():
+            problem = 'owned by another user'
+        elif hasattr(os, 'getuid') and info.st_mode & 0o077:
+            problem = 'accessible to other users'
+        else:
+            return True
+
+        log.warning("Workbook cache disk tier disabled", extra=fields(dir=self.disk_dir, error=problem))
+        return False
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.xlsx")
+
+    def _disk_paths(self):
+        if not self.disk_dir:
+            return []
+        try:
+            names = os.listdir(self.disk_dir)
+        except OSError:
+            return []
+        return [os.path.join(self.disk_dir, name) for name in names if name.endswith('.xlsx')]
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - HTTP helpers shared by the export services
+
+Request bodies may be JSON or MessagePack, sent as is or with a gzip (or,
+with the zstandard package, zstd) Content-Encoding. They are decompressed
+in bounded chunks, so a small upload cannot inflate past the size limit.
+JSON export requests can also be parsed as they are read, keeping only the
+events of the trip being exported (see jsonStream).
+
+Environment:
+- HOLIDAYMOO_MAX_BODY_MB: largest decoded request body accepted (default 64)
+"""
+
+import json
+import os
+import unicodedata
+import zlib
+from urllib.parse import quote
+
+from flask import Response, jsonify, request, send_file, stream_with_context
+
+from jsonStream import read_trip_request
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib parser is used without it
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional; MessagePack bodies are refused without it
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Optional; zstd bodies are refused without it
+    zstandard = None
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+ZIP_MIMETYPE = 'application/zip'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+MAX_BODY_BYTES = int(float(os.environ.get('HOLIDAYMOO_MAX_BODY_MB', '64')) * 1024 * 1024)
+BODY_CHUNK_BYTES = 64 * 1024
+
+# Raised by the decompressors on corrupt input
+CODEC_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+class RequestBodyError(Exception):
+    """A request body that cannot be accepted, with the status to answer"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def request_encodings():
+    """Content-Encodings accepted on request bodies"""
+    return ['identity', 'gzip'] + (['zstd'] if zstandard is not None else [])
+
+
+def request_content_types():
+    """Content-Types accepted for request bodies"""
+    return ['application/json'] + (list(MSGPACK_MIMETYPES) if msgpack is not None else [])
+
+
+def decode_request_body(max_bytes=None):
+    """Decode a JSON or MessagePack request body, decompressing it first.
+
+    Returns None for any other content type, like request.get_json(silent=True).
+    Raises RequestBodyError for bodies over the size limit (413), encodings
+    or content types this process cannot decode (415), and corrupt data (400).
+    """
+    if request.mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise RequestBodyError('MessagePack bodies are not supported by this server', 415)
+        decode = _decode_msgpack
+    elif request.is_json:
+        decode = _decode_json
+    else:
+        return None
+
+    body = read_request_body(max_bytes)
+    try:
+        return decode(body)
+    except ValueError as e:
+        raise RequestBodyError(f'Malformed request body: {e}')
+
+
+def decode_trip_request(keep_event_for, calendar_keys=None, max_bytes=None):
+    """Decode an export request body, keeping only the events its trip needs.
+
+    JSON bodies are parsed incrementally by read_trip_request, with the same
+    `keep_event_for` and `calendar_keys`; MessagePack bodies are decoded
+    whole. Returns None and raises RequestBodyError like decode_request_body.
+    """
+    if request.mimetype in MSGPACK_MIMETYPES:
+        return decode_request_body(max_bytes)
+    if not request.is_json:
+        return None
+
+    try:
+        return read_trip_request(request_body_chunks(max_bytes), keep_event_for, calendar_keys)
+    except ValueError as e:
+        raise RequestBodyError(f'Malformed request body: {e}')
+
+
+def read_request_body(max_bytes=None):
+    """Read the raw request body, undoing its Content-Encoding"""
+    body = bytearray()
+    for chunk in request_body_chunks(max_bytes):
+        body += chunk
+    return body
+
+
+def request_body_chunks(max_bytes=None):
+    """Yield the request body in chunks as it is read, undoing its Content-Encoding"""
+    limit = MAX_BODY_BYTES if max_bytes is None else max_bytes
+    if request.content_length is not None and request.content_length > limit:
+        raise RequestBodyError(f'Request body is larger than {limit} bytes', 413)
+
+    encoding = (request.headers.get('Content-Encoding') or 'identity').strip().lower()
+    if encoding == 'identity':
+        chunks = _read_chunks(request.stream)
+    elif encoding in ('gzip', 'x-gzip'):
+        chunks = _gunzip(request.stream)
+    elif encoding == 'zstd' and zstandard is not None:
+        chunks = _unzstd(request.stream)
+    else:
+        raise RequestBodyError(f"Unsupported Content-Encoding '{encoding}'", 415)
+
+    return _limited(chunks, limit, encoding)
+
+
+def request_body_error_response(error):
+    return jsonify({'success': False, 'error': str(error)}), error.status
+
+
+def _limited(chunks, limit, encoding):
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            if size > limit:
+                raise RequestBodyError(f'Request body is larger than {limit} bytes', 413)
+            yield chunk
+    except CODEC_ERRORS as e:
+        raise RequestBodyError(f'Malformed {encoding} body: {e}')
+
+
+def _read_chunks(stream):
+    return iter(lambda: stream.read(BODY_CHUNK_BYTES), b'')
+
+
+def _gunzip(stream):
+    # Output is capped per call so the caller sees the size grow chunk by chunk
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in _read_chunks(stream):
+        while chunk:
+            yield inflater.decompress(chunk, BODY_CHUNK_BYTES)
+            chunk = inflater.unconsumed_tail
+    yield inflater.flush()
+    if not inflater.eof:
+        raise RequestBodyError('Malformed gzip body: truncated')
+
+
+def _unzstd(stream):
+    reader = zstandard.ZstdDecompressor().stream_reader(stream)
+    return iter(lambda: reader.read(BODY_CHUNK_BYTES), b'')
+
+
+def _decode_json(body):
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Fall through: the stdlib parser also takes NaN and huge integers
+            pass
+    return json.loads(body)
+
+
+def _decode_msgpack(body):
+    try:
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    except msgpack.UnpackException as e:
+        raise ValueError(str(e) or type(e).__name__) from e
+
+
+def wants_binary_xlsx():
+    """Check whether the client negotiated a raw xlsx response.
+
+    Old clients send no Accept header (or */*) and keep getting the
+    JSON/base64 payload; JSON wins any tie.
+    """
+    return request.accept_mimetypes.best_match(['application/json', XLSX_MIMETYPE]) == XLSX_MIMETYPE
+
+
+def send_xlsx(excel_buffer, filename):
+    """Stream an in-memory workbook to the client as a file download"""
+    return send_attachment(excel_buffer, filename, XLSX_MIMETYPE)
+
+
+def send_zip(zip_buffer, filename):
+    """Stream an in-memory archive to the client as a file download"""
+    return send_attachment(zip_buffer, filename, ZIP_MIMETYPE)
+
+
+def send_stream(chunks, filename, mimetype):
+    """Stream an attachment from an iterable of text chunks as they are produced"""
+    response = Response(stream_with_context(chunks), content_type=mimetype)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Same Content-Disposition send_file writes, with an RFC 5987 fallback
+    # for names that are not plain ASCII
+    try:
+        filename.encode('ascii')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        response.headers.set('Content-Disposition', 'attachment', filename=simple,
+                             **{'filename*': f"UTF-8''{quote(filename, safe='')}"})
+    return response
+
+
+def send_attachment(buffer, filename, mimetype):
+    """Send an in-memory buffer as an uncached attachment"""
+    buffer.seek(0)
+    return send_file(
+        buffer,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=filename,
+        max_age=0,
+    )
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Background export jobs
+
+Long exports run on a small bounded thread pool instead of the request thread.
+Clients submit a job, poll its state and progress, then download the result,
+which can be fetched until it expires. Finished jobs are also capped by
+count and by total result size, dropping the oldest first.
+
+Environment:
+- HOLIDAYMOO_JOB_WORKERS: exports rendered at once (default 2)
+- HOLIDAYMOO_JOB_QUEUE: jobs allowed to wait for a worker (default 16)
+- HOLIDAYMOO_JOB_TTL: seconds a finished job and its result are kept (default 900)
+- HOLIDAYMOO_JOB_RESULTS: finished jobs kept at most (default 32)
+- HOLIDAYMOO_JOB_RESULT_MB: total size of the kept results (default 256)
+"""
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from exportLogging import fields, get_logger
+
+log = get_logger('export_jobs')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ExportJob:
+    __slots__ = ('id', 'state', 'stage', 'progress', 'created', 'started', 'finished',
+                 'filename', 'data', 'error')
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.state = QUEUED
+        self.stage = QUEUED
+        self.progress = 0.0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.filename = None
+        self.data = None
+        self.error = None
+
+    def report(self, stage, progress):
+        """Progress callback handed to the render function"""
+        self.stage = stage
+        self.progress = max(self.progress, min(1.0, progress))
+
+    def snapshot(self, ttl):
+        """JSON-ready view of the job"""
+        status = {
+            'jobId': self.id,
+            'state': self.state,
+            'stage': self.stage,
+            'progress': round(self.progress, 3),
+            'createdAt': self.created,
+        }
+        if self.started is not None:
+            status['queuedSeconds'] = round(self.started - self.created, 3)
+        if self.finished is not None:
+            status['runSeconds'] = round(self.finished - (self.started or self.finished), 3)
+            status['expiresAt'] = self.finished + ttl
+        if self.state == DONE:
+            status['filename'] = self.filename
+            status['size'] = len(self.data)
+        if self.error:
+            status['error'] = self.error
+        return status
+
+
+class ExportJobQueue:
+    def __init__(self, max_workers=2, max_queued=16, result_ttl=900, max_results=32,
+                 max_result_bytes=256 * 1024 * 1024):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self.max_result_bytes = max_result_bytes
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a queue from HOLIDAYMOO_JOB_* environment variables"""
+        return cls(
+            max_workers=max(1, int(os.environ.get('HOLIDAYMOO_JOB_WORKERS', '2'))),
+            max_queued=max(0, int(os.environ.get('HOLIDAYMOO_JOB_QUEUE', '16'))),
+            result_ttl=int(os.environ.get('HOLIDAYMOO_JOB_TTL', '900')),
+            max_results=max(1, int(os.environ.get('HOLIDAYMOO_JOB_RESULTS', '32'))),
+            max_result_bytes=int(float(os.environ.get('HOLIDAYMOO_JOB_RESULT_MB', '256')) * 1024 * 1024),
+        )
+
+    def submit(self, render, *args):
+        """Queue render(report, *args) -> (workbook bytes, filename).
+
+        Returns the new job, or None when every worker is busy and the queue
+        is full.
+        """
+        self.sweep()
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.state in (QUEUED, RUNNING))
+            if pending >= self.max_workers + self.max_queued:
+                return None
+            job = ExportJob()
+            self._jobs[job.id] = job
+
+        # Keep the submitting request's id on the job's log lines
+        context = contextvars.copy_context()
+        self._executor.submit(context.run, self._run, job, render, args)
+        log.info("Export job queued", extra=fields(job_id=job.id, pending=pending + 1))
+        return job
+
+    def get(self, job_id):
+        """Look up a job; None if unknown or expired"""
+        self.sweep()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def sweep(self):
+        """Forget finished jobs whose results have expired"""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self):
+        """Job counts by state"""
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        stats = {state: states.count(state) for state in (QUEUED, RUNNING, DONE, FAILED)}
+        stats['workers'] = self.max_workers
+        stats['max_queued'] = self.max_queued
+        stats['result_ttl_seconds'] = self.result_ttl
+        stats['max_results'] = self.max_results
+        stats['max_result_bytes'] = self.max_result_bytes
+        return stats
+
+    def _evict(self, keep):
+        """Drop the oldest finished jobs until the results fit the caps, never `keep`"""
+        with self._lock:
+            finished = sorted((job for job in self._jobs.values() if job.state in (DONE, FAILED) and job is not keep),
+                              key=lambda job: job.finished)
+            count = len(finished) + 1
+            size = sum(len(job.data) for job in finished if job.data is not None) + len(keep.data or b'')
+            evicted = []
+            while finished and (count > self.max_results or size > self.max_result_bytes):
+                job = finished.pop(0)
+                del self._jobs[job.id]
+                count -= 1
+                size -= len(job.data or b'')
+                evicted.append(job.id)
+        if evicted:
+            log.info("Export job results evicted", extra=fields(jobs=evicted, kept=count, kept_bytes=size))
+
+    def _run(self, job, render, args):
+        job.started = time.time()
+        job.state = RUNNING
+        job.report(RUNNING, 0.05)
+        try:
+            data, filename = render(job.report, *args)
+        except Exception as e:
+            log.exception("Export job failed", extra=fields(job_id=job.id))
+            job.error = str(e)
+            job.finished = time.time()
+            job.state = FAILED
+            self._evict(job)
+            return
+
+        job.data = data
+        job.filename = filename
+        job.report(DONE, 1.0)
+        job.finished = time.time()
+        job.state = DONE
+        log.info("Export job finished", extra=fields(
+            job_id=job.id, size=len(data), seconds=round(job.finished - job.started, 3)))
+        self._evict(job)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Structured logging for the export services
+
+Log lines are written as JSON with the request id and any structured fields.
+Debug detail is only produced for sampled requests, and hot paths guard their
+debug calls with `trace_enabled()` so unsampled requests pay nothing to
+build the messages.
+
+Environment:
+- HOLIDAYMOO_LOG_LEVEL: base level (default INFO; DEBUG traces every request)
+- HOLIDAYMOO_LOG_SAMPLE_RATE: fraction of requests traced at DEBUG (default 0)
+Clients can also force tracing of a single request with `X-Debug-Trace: 1`.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+
+ROOT_LOGGER = 'holidaymoo'
+
+_request_id = contextvars.ContextVar('holidaymoo_request_id', default=None)
+_request_traced = contextvars.ContextVar('holidaymoo_request_traced', default=None)
+
+_settings = {
+    'configured': False,
+    'trace_all': False,
+    'sample_rate': 0.0,
+}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render records as one JSON object per line"""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        request_id = _request_id.get()
+        if request_id:
+            payload['request_id'] = request_id
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TraceFilter(logging.Filter):
+    """Drop DEBUG records unless the current request is traced"""
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or trace_enabled()
+
+
+def configure_logging():
+    """Install the structured handler once per process"""
+    if _settings['configured']:
+        return
+
+    level_name = os.environ.get('HOLIDAYMOO_LOG_LEVEL', 'INFO').upper()
+    level = getattr(logging, level_name, logging.INFO)
+    _settings['trace_all'] = level <= logging.DEBUG
+    _settings['sample_rate'] = float(os.environ.get('HOLIDAYMOO_LOG_SAMPLE_RATE', '0') or 0)
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(StructuredFormatter())
+    handler.addFilter(TraceFilter())
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.addHandler(handler)
+    # Sampled requests need DEBUG records to reach the handler
+    logger.setLevel(logging.DEBUG if _settings['trace_all'] or _settings['sample_rate'] > 0 else level)
+    logger.propagate = False
+    _settings['configured'] = True
+
+
+def get_logger(name):
+    """Get a service logger under the holidaymoo namespace"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def begin_request_logging(force_trace=False):
+    """Assign a request id and decide whether this request is traced"""
+    _request_id.set(uuid.uuid4().hex[:12])
+    traced = (
+        force_trace
+        or _settings['trace_all']
+        or (_settings['sample_rate'] > 0 and random.random() < _settings['sample_rate'])
+    )
+    _request_traced.set(traced)
+    return traced
+
+
+def flask_request_logging():
+    """Flask before_request hook"""
+    from flask import request
+    begin_request_logging(force_trace=request.headers.get('X-Debug-Trace') == '1')
+
+
+def trace_enabled():
+    """Whether debug detail should be produced for the current request"""
+    traced = _request_traced.get()
+    if traced is None:
+        return _settings['trace_all']
+    return traced
+
+
+def fields(**kwargs):
+    """Structured fields for a log call: log.info('msg', extra=fields(a=1))"""
+    return {'fields': kwargs}
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Prometheus-style metrics for the export services
+
+A small in-process registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format, so each service can serve /metrics
+without extra dependencies. Every series carries a `service` label.
+
+Stages recorded by the services:
+- decode_json, filter_events, calendar_sheet, overview_sheet, events_sheet,
+  summary_sheet, save, base64_encode, response
+- render_pool: waiting on a worker process when HOLIDAYMOO_RENDER_WORKERS is
+  set (sheet stages then happen in the worker, which hands their timings
+  back to be recorded here)
+"""
+
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+EVENT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# (stage, seconds) list that stage() also appends to, inside collect_stages()
+_collected_stages = contextvars.ContextVar('collected_stages', default=None)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_series(key, value) for key, value in items)
+        return '\n'.join(lines)
+
+    def _render_series(self, key, value):
+        return f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def _render_series(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, series['counts']):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{labels} {series['count']}")
+        return '\n'.join(lines)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    'holidaymoo_export_stage_seconds', 'Time spent in each export pipeline stage',
+    ('service', 'stage'), SECONDS_BUCKETS))
+EXPORT_EVENTS = registry.register(Histogram(
+    'holidaymoo_export_events', 'Events included in each export',
+    ('service',), EVENT_BUCKETS))
+PAYLOAD_BYTES = registry.register(Histogram(
+    'holidaymoo_export_payload_bytes', 'Size of export request bodies',
+    ('service',), BYTES_BUCKETS))
+OUTPUT_BYTES = registry.register(Histogram(
+    'holidaymoo_export_output_bytes', 'Size of generated workbooks',
+    ('service',), BYTES_BUCKETS))
+IN_FLIGHT = registry.register(Gauge(
+    'holidaymoo_exports_in_flight', 'Exports currently being handled',
+    ('service',)))
+EXPORTS_TOTAL = registry.register(Counter(
+    'holidaymoo_exports_total', 'Export requests handled, by route',
+    ('service', 'route')))
+ERRORS_TOTAL = registry.register(Counter(
+    'holidaymoo_export_errors_total', 'Export requests that failed, by route and kind',
+    ('service', 'route', 'kind')))
+
+
+class ServiceMetrics:
+    """Metrics helpers bound to one service label"""
+
+    def __init__(self, service):
+        self.service = service
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage: `with metrics.stage('save'): ...`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            STAGE_SECONDS.observe(seconds, service=self.service, stage=name)
+            collected = _collected_stages.get()
+            if collected is not None:
+                collected.append((name, seconds))
+
+    @contextmanager
+    def collect_stages(self):
+        """Also gather the stages timed inside the block into a (stage, seconds) list
+        
+        Render pool jobs return the list so the parent process can record_stages() it.
+        """
+        stages = []
+        token = _collected_stages.set(stages)
+        try:
+            yield stages
+        finally:
+            _collected_stages.reset(token)
+
+    def record_stages(self, stages):
+        """Record stage timings measured elsewhere, such as in a render pool worker"""
+        for name, seconds in stages:
+            STAGE_SECONDS.observe(seconds, service=self.service, stage=name)
+
+    def timed_stage(self, name):
+        """Decorator form of stage() for methods that are a whole stage"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def track_export(self, route):
+        """Route decorator: count requests, in-flight exports and error responses"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                EXPORTS_TOTAL.inc(service=self.service, route=route)
+                IN_FLIGHT.inc(service=self.service)
+                try:
+                    rv = fn(*args, **kwargs)
+                except Exception:
+                    self.error(route)
+                    raise
+                finally:
+                    IN_FLIGHT.dec(service=self.service)
+
+                status = rv[1] if isinstance(rv, tuple) and len(rv) > 1 else getattr(rv, 'status_code', 200)
+                if status >= 500:
+                    self.error(route, 'server_error')
+                elif status >= 400:
+                    self.error(route, 'client_error')
+                return rv
+            return wrapper
+        return decorate
+
+    def observe_export(self, events=None, payload_bytes=None, output_bytes=None):
+        """Record the size of one export"""
+        if events is not None:
+            EXPORT_EVENTS.observe(events, service=self.service)
+        if payload_bytes is not None:
+            PAYLOAD_BYTES.observe(payload_bytes, service=self.service)
+        if output_bytes is not None:
+            OUTPUT_BYTES.observe(output_bytes, service=self.service)
+
+    def error(self, route, kind='exception'):
+        """Count a failed export request"""
+        ERRORS_TOTAL.inc(service=self.service, route=route, kind=kind)
+
+
+def metrics_response():
+    """Flask response for a /metrics route"""
+    from flask import Response
+    return Response(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
@@ -35,16 +35,9 @@ class ExportService {
         );
       }
 
-      // Prepare data for export
+      // Prepare data for export. tripData goes first so the service can
+      // drop other trips' events while it reads calendarData
       const exportData = {
-        calendarData: {
-          title: calendarData.title || "Travel Calendar",
-          events: calendarData.events || [],
-          trips: calendarData.trips || [],
-          customDayHeaders: calendarData.customDayHeaders || {},
-          bucketList: calendarData.bucketList || [],
-          checklistItems: calendarData.checklistItems || [],
-        },
         tripData: {
           id: tripData.id,
           name: tripData.name,
@@ -53,6 +46,14 @@ class ExportService {
           destination: tripData.destination || "",
           description: tripData.description || "",
         },
+        calendarData: {
+          title: calendarData.title || "Travel Calendar",
+          events: calendarData.events || [],
+          trips: calendarData.trips || [],
+          customDayHeaders: calendarData.customDayHeaders || {},
+          bucketList: calendarData.bucketList || [],
+          checklistItems: calendarData.checklistItems || [],
+        },
       };
 
       // Send export request
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Incremental JSON request reading
+
+An export only needs one trip's events, but its request carries the whole
+calendar: every trip's events, the bucket list and the checklist. Parsing
+that in one go holds all of it in memory before most of it is thrown away.
+
+JsonStream reads a JSON document from an iterable of byte chunks, one value
+at a time. Only a window of the body is held as text: it grows while a value
+is incomplete and its consumed prefix is dropped as more is read. Objects and
+arrays can be walked entry by entry, and any value skipped without building
+it, so the peak is bounded by the largest value kept rather than the body.
+"""
+
+import codecs
+import json
+import re
+
+# JSON whitespace, as the stdlib parser skips it
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# What may still follow a parsed number: '1' can be the start of '1.5e-3'
+NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Pull parser over an iterable of UTF-8 byte chunks"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        # utf-8-sig drops a leading BOM, which json.loads on bytes also accepts
+        self._utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+        self._text = ''
+        self._pos = 0
+        self._consumed = 0  # Characters dropped from the front of _text
+        self._eof = False
+
+    def peek(self):
+        """The next non-whitespace character, without consuming it; '' at the end"""
+        while True:
+            self._pos = WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._read():
+                return ''
+
+    def value(self):
+        """Parse and return the next complete value"""
+        scalar = self.peek() not in '"[{'
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise self._error(e.msg, e.pos)
+                self._read_more()
+                continue
+            # A number cut off by the end of the window may go on in the next chunk
+            if scalar and not self._eof and NUMBER_TAIL.match(self._text, end).end() == len(self._text):
+                self._read_more()
+                continue
+            self._pos = end
+            return value
+
+    def skip(self):
+        """Consume the next value, building at most one of its entries at a time"""
+        first = self.peek()
+        if first == '{':
+            for _ in self.items():
+                self.value()
+        elif first == '[':
+            for _ in self.elements():
+                self.value()
+        else:
+            self.value()
+
+    def items(self):
+        """Walk an object, yielding each key with the stream at its value
+
+        The caller consumes every value (value(), skip() or a nested walk)
+        before asking for the next key.
+        """
+        self._expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error('Expecting property name enclosed in double quotes')
+            key = self.value()
+            self._expect(':')
+            yield key
+            if not self._separator('}'):
+                return
+
+    def elements(self):
+        """Walk an array, yielding once per element with the stream at it"""
+        self._expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield
+            if not self._separator(']'):
+                return
+
+    def end(self):
+        """Check that nothing but whitespace follows the document"""
+        if self.peek():
+            raise self._error('Extra data')
+
+    def _separator(self, close):
+        # True after a ',', False after the closing bracket
+        char = self.peek()
+        self._pos += 1
+        if char == ',':
+            return True
+        if char == close:
+            return False
+        self._pos -= 1
+        raise self._error("Expecting ',' delimiter" if char else 'Unexpected end of data')
+
+    def _expect(self, char):
+        if self.peek() != char:
+            raise self._error(f"Expecting '{char}'")
+        self._pos += 1
+
+    def _read(self, wanted=1):
+        """Read at least `wanted` more characters (fewer at the end), dropping
+        the consumed text; False when there is nothing left to read"""
+        if self._eof:
+            return False
+        pieces = [self._text[self._pos:]]
+        size = 0
+        while size < wanted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                pieces.append(self._utf8.decode(b'', final=True))
+                break
+            pieces.append(self._utf8.decode(chunk))
+            size += len(pieces[-1])
+        self._consumed += self._pos
+        self._text = ''.join(pieces)
+        self._pos = 0
+        return True
+
+    def _read_more(self):
+        # Double the unparsed window, so a large value is retried O(log n) times
+        if not self._read(len(self._text) - self._pos + 1):
+            raise self._error('Unexpected end of data')
+
+    def _error(self, message, pos=None):
+        pos = self._pos if pos is None else pos
+        return ValueError(f'{message}: char {self._consumed + pos}')
+
+
+def read_trip_request(chunks, keep_event_for, calendar_keys=None):
+    """Read an export request, keeping only the calendar events its trip needs
+
+    `keep_event_for(trip_data)` returns a predicate over events, or None to
+    keep them all. Events can only be filtered as they are read when
+    tripData comes before calendarData in the body; otherwise every event is
+    kept. `calendar_keys` names the other calendarData keys to keep (None
+    keeps all of them); the rest are skipped. Raises ValueError for
+    malformed JSON.
+    """
+    stream = JsonStream(chunks)
+    if stream.peek() != '{':
+        data = stream.value()
+        stream.end()
+        return data
+
+    data = {}
+    for key in stream.items():
+        if key == 'calendarData' and stream.peek() == '{':
+            trip_data = data.get('tripData')
+            keep = keep_event_for(trip_data) if isinstance(trip_data, dict) else None
+            data[key] = _read_calendar(stream, keep, calendar_keys)
+        else:
+            data[key] = stream.value()
+    stream.end()
+    return data
+
+
+def _read_calendar(stream, keep, calendar_keys):
+    calendar_data = {}
+    for key in stream.items():
+        if key == 'events' and stream.peek() == '[':
+            events = []
+            for _ in stream.elements():
+                event = stream.value()
+                if keep is None or keep(event):
+                    events.append(event)
+            calendar_data[key] = events
+        elif calendar_keys is None or key in calendar_keys:
+            calendar_data[key] = stream.value()
+        else:
+            stream.skip()
+    return calendar_data
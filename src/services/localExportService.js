@@ -4,11 +4,32 @@
  */
 
 const LOCAL_EXPORT_URL = "http://localhost:5001";
+const XLSX_MIME_TYPE =
+  "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet";
+// JSON request bodies at least this large are sent gzipped
+const COMPRESS_MIN_BYTES = 64 * 1024;
+// calendarData keys, besides events, kept in the server-side snapshot
+const SNAPSHOT_FIELDS = [
+  "title",
+  "trips",
+  "customDayHeaders",
+  "bucketList",
+  "checklistItems",
+];
+// Error responses meaning the service no longer holds our calendar snapshot
+const SNAPSHOT_ERROR_STATUSES = [404, 409];
+const SNAPSHOT_ERROR_PATTERN = /calendar snapshot/i;
 
 class LocalExportService {
   constructor() {
     this.baseUrl = LOCAL_EXPORT_URL;
     this.timeout = 30000; // 30 seconds for Excel generation
+    this.jobTimeout = 10 * 60 * 1000; // Background exports may run for 10 minutes
+    this.pollInterval = 1000;
+    // Last calendar version the service holds for us, used to send deltas
+    this.snapshot = null;
+    // Request Content-Encodings the service advertises in /health
+    this.requestEncodings = [];
   }
 
   /**
@@ -28,6 +49,7 @@ class LocalExportService {
       }
 
       const data = await response.json();
+      this.requestEncodings = (data.accepts && data.accepts.encodings) || [];
       return data.status === "healthy";
     } catch (error) {
       console.log("Local export service not available:", error.message);
@@ -49,16 +71,9 @@ class LocalExportService {
         );
       }
 
-      // Prepare data for export
+      // Prepare data for export. tripData goes first so the service can
+      // drop other trips' events while it reads calendarData
       const exportData = {
-        calendarData: {
-          title: calendarData.title || "Holiday Moo Calendar",
-          events: calendarData.events || [],
-          trips: calendarData.trips || [],
-          customDayHeaders: calendarData.customDayHeaders || {},
-          bucketList: calendarData.bucketList || [],
-          checklistItems: calendarData.checklistItems || [],
-        },
         tripData: {
           id: tripData.id,
           name: tripData.name,
@@ -67,64 +82,383 @@ class LocalExportService {
           destination: tripData.destination || "",
           description: tripData.description || "",
         },
+        calendarData: {
+          title: calendarData.title || "Holiday Moo Calendar",
+          events: calendarData.events || [],
+          trips: calendarData.trips || [],
+          customDayHeaders: calendarData.customDayHeaders || {},
+          bucketList: calendarData.bucketList || [],
+          checklistItems: calendarData.checklistItems || [],
+        },
       };
 
       console.log("🧪 Sending data to local export service...");
       console.log("Trip:", tripData.name);
       console.log("Events:", exportData.calendarData.events.length);
 
-      // Create abort controller for timeout
-      const controller = new AbortController();
-      const timeoutId = setTimeout(() => controller.abort(), this.timeout);
+      // Send only what changed since the last export when the service keeps
+      // calendar snapshots; otherwise upload the whole calendar each time
+      const calendarRef = await this.syncCalendarSnapshot(
+        exportData.calendarData
+      );
+      if (!calendarRef) {
+        return await this.exportRequest(exportData, tripData);
+      }
 
-      // Send export request
-      const response = await fetch(`${this.baseUrl}/export-trip`, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify(exportData),
-        signal: controller.signal,
-      });
+      try {
+        return await this.exportRequest(
+          { ...calendarRef, tripData: exportData.tripData },
+          tripData
+        );
+      } catch (error) {
+        if (!error.snapshotError) {
+          throw error;
+        }
+        // The service expired, evicted or restarted without our snapshot:
+        // upload the calendar again and retry once
+        console.log("Calendar snapshot lost, uploading again:", error.message);
+        this.snapshot = null;
+        const freshRef = await this.syncCalendarSnapshot(
+          exportData.calendarData
+        );
+        return await this.exportRequest(
+          freshRef
+            ? { ...freshRef, tripData: exportData.tripData }
+            : exportData,
+          tripData
+        );
+      }
+    } catch (error) {
+      if (error.name === "AbortError") {
+        throw new Error(
+          "Export request timed out. The Excel generation is taking longer than expected."
+        );
+      }
 
-      clearTimeout(timeoutId);
+      console.error("Local export service error:", error);
+      throw error;
+    }
+  }
+
+  /**
+   * Export one request body, as a background job when the service has jobs.
+   * Large trips can outlast a single request; older services without jobs
+   * get a direct request.
+   */
+  async exportRequest(requestData, tripData) {
+    const jobResult = await this.exportViaJob(requestData, tripData);
+    if (jobResult) {
+      return jobResult;
+    }
+
+    return await this.exportDirect(requestData, tripData);
+  }
+
+  /**
+   * Error for a failed export response. Marked with snapshotError when the
+   * service no longer holds the calendar snapshot the request named.
+   */
+  exportError(status, errorData) {
+    const error = new Error(
+      errorData.error || `Export failed with status ${status}`
+    );
+    error.snapshotError =
+      SNAPSHOT_ERROR_STATUSES.includes(status) &&
+      SNAPSHOT_ERROR_PATTERN.test(errorData.error || "");
+    return error;
+  }
+
+  /**
+   * Bring the service's copy of the calendar up to date.
+   * Returns { calendarId, calendarVersion }, or null to send calendarData in full.
+   */
+  async syncCalendarSnapshot(calendarData) {
+    const eventJson = new Map(
+      calendarData.events.map((event) => [event.id, JSON.stringify(event)])
+    );
+    const fieldJson = {};
+    SNAPSHOT_FIELDS.forEach((key) => {
+      fieldJson[key] = JSON.stringify(calendarData[key]);
+    });
+
+    try {
+      if (this.snapshot) {
+        const delta = this.diffCalendar(calendarData, eventJson, fieldJson);
+        if (!delta) {
+          return {
+            calendarId: this.snapshot.calendarId,
+            calendarVersion: this.snapshot.version,
+          };
+        }
+
+        const response = await this.fetchWithTimeout(
+          `${this.baseUrl}/calendars/${this.snapshot.calendarId}`,
+          await this.jsonRequest("PATCH", delta)
+        );
+
+        if (response.ok) {
+          const { calendarId, version } = await response.json();
+          this.snapshot = { calendarId, version, eventJson, fieldJson };
+          return { calendarId, calendarVersion: version };
+        }
+        // Expired or out-of-date snapshot: upload the calendar again
+      }
+
+      this.snapshot = null;
+      const response = await this.fetchWithTimeout(
+        `${this.baseUrl}/calendars`,
+        await this.jsonRequest("POST", { calendarData })
+      );
 
       if (!response.ok) {
-        const errorData = await response.json().catch(() => ({}));
+        return null;
+      }
+
+      const { calendarId, version } = await response.json();
+      this.snapshot = { calendarId, version, eventJson, fieldJson };
+      return { calendarId, calendarVersion: version };
+    } catch (error) {
+      if (error.name === "AbortError") {
+        throw error;
+      }
+      console.log("Calendar snapshot unavailable:", error.message);
+      this.snapshot = null;
+      return null;
+    }
+  }
+
+  /**
+   * Delta between the last synced snapshot and the current calendar, or null if unchanged
+   */
+  diffCalendar(calendarData, eventJson, fieldJson) {
+    const previous = this.snapshot;
+    const added = [];
+    const changed = [];
+    const removed = [];
+
+    calendarData.events.forEach((event) => {
+      const before = previous.eventJson.get(event.id);
+      if (before === undefined) {
+        added.push(event);
+      } else if (before !== eventJson.get(event.id)) {
+        changed.push(event);
+      }
+    });
+    previous.eventJson.forEach((_, id) => {
+      if (!eventJson.has(id)) {
+        removed.push(id);
+      }
+    });
+
+    const fields = {};
+    SNAPSHOT_FIELDS.forEach((key) => {
+      if (previous.fieldJson[key] !== fieldJson[key]) {
+        fields[key] = calendarData[key];
+      }
+    });
+
+    if (
+      !added.length &&
+      !changed.length &&
+      !removed.length &&
+      !Object.keys(fields).length
+    ) {
+      return null;
+    }
+
+    return { baseVersion: previous.version, added, changed, removed, fields };
+  }
+
+  /**
+   * Export through the background jobs API: submit, poll, then download.
+   * Returns null when the service does not support jobs.
+   */
+  async exportViaJob(exportData, tripData) {
+    const submitResponse = await this.fetchWithTimeout(
+      `${this.baseUrl}/export-jobs`,
+      await this.jsonRequest("POST", exportData)
+    );
+
+    if (submitResponse.status === 405) {
+      return null;
+    }
+
+    if (!submitResponse.ok) {
+      const errorData = await submitResponse.json().catch(() => ({}));
+      const error = this.exportError(submitResponse.status, errorData);
+      // A plain 404 means a service without the jobs API
+      if (submitResponse.status === 404 && !error.snapshotError) {
+        return null;
+      }
+      throw error;
+    }
+
+    const { jobId } = await submitResponse.json();
+    const deadline = Date.now() + this.jobTimeout;
+
+    // Poll until the job finishes
+    for (;;) {
+      if (Date.now() > deadline) {
         throw new Error(
-          errorData.error || `Export failed with status ${response.status}`
+          "Export timed out. The Excel generation is taking longer than expected."
         );
       }
 
-      const result = await response.json();
+      await new Promise((resolve) => setTimeout(resolve, this.pollInterval));
+
+      const statusResponse = await this.fetchWithTimeout(
+        `${this.baseUrl}/export-jobs/${jobId}`,
+        { method: "GET" }
+      );
+      const status = await statusResponse.json().catch(() => ({}));
 
-      if (!result.success) {
-        throw new Error(result.error || "Export failed");
+      if (!statusResponse.ok || status.state === "failed") {
+        throw new Error(
+          status.error || `Export failed with status ${statusResponse.status}`
+        );
       }
 
+      if (status.state === "done") {
+        break;
+      }
+
+      console.log(
+        `⏳ Export ${status.state}: ${Math.round((status.progress || 0) * 100)}%`
+      );
+    }
+
+    const resultResponse = await this.fetchWithTimeout(
+      `${this.baseUrl}/export-jobs/${jobId}/result`,
+      {
+        method: "GET",
+        headers: {
+          Accept: `${XLSX_MIME_TYPE}, application/json;q=0.9`,
+        },
+      }
+    );
+
+    return this.handleExportResponse(resultResponse, tripData);
+  }
+
+  /**
+   * Export with a single request to /export-trip
+   */
+  async exportDirect(exportData, tripData) {
+    const response = await this.fetchWithTimeout(
+      `${this.baseUrl}/export-trip`,
+      await this.jsonRequest("POST", exportData, {
+        // Prefer the raw xlsx file; older services still answer with JSON
+        Accept: `${XLSX_MIME_TYPE}, application/json;q=0.9`,
+      })
+    );
+
+    return this.handleExportResponse(response, tripData);
+  }
+
+  /**
+   * Fetch options for a JSON body, gzipped when it is large and the
+   * service accepts gzip request bodies
+   */
+  async jsonRequest(method, data, headers = {}) {
+    const json = JSON.stringify(data);
+    if (
+      json.length < COMPRESS_MIN_BYTES ||
+      !this.requestEncodings.includes("gzip") ||
+      typeof CompressionStream === "undefined"
+    ) {
+      return {
+        method,
+        headers: { "Content-Type": "application/json", ...headers },
+        body: json,
+      };
+    }
+
+    const gzipped = new Blob([json])
+      .stream()
+      .pipeThrough(new CompressionStream("gzip"));
+    return {
+      method,
+      headers: {
+        "Content-Type": "application/json",
+        "Content-Encoding": "gzip",
+        ...headers,
+      },
+      body: await new Response(gzipped).blob(),
+    };
+  }
+
+  /**
+   * Fetch with the request timeout applied until the body has been read
+   */
+  async fetchWithTimeout(url, options) {
+    // Create abort controller for timeout
+    const controller = new AbortController();
+    const timeoutId = setTimeout(() => controller.abort(), this.timeout);
+
+    try {
+      const response = await fetch(url, {
+        ...options,
+        signal: controller.signal,
+      });
+      // Read the body while the timeout still applies
+      const body = await response.blob();
+      return new Response(body, {
+        status: response.status,
+        statusText: response.statusText,
+        headers: response.headers,
+      });
+    } finally {
+      clearTimeout(timeoutId);
+    }
+  }
+
+  /**
+   * Download a finished export from a raw xlsx or JSON/base64 response
+   */
+  async handleExportResponse(response, tripData) {
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw this.exportError(response.status, errorData);
+    }
+
+    const contentType = response.headers.get("Content-Type") || "";
+    if (contentType.startsWith(XLSX_MIME_TYPE)) {
+      const blob = await response.blob();
+      const filename = this.getDownloadFilename(response, tripData);
+
       console.log("✅ Local export completed successfully!");
-      console.log("File:", result.filename);
-      console.log("Size:", (result.size / 1024).toFixed(1) + " KB");
+      console.log("File:", filename);
+      console.log("Size:", (blob.size / 1024).toFixed(1) + " KB");
 
-      // Download the file
-      this.downloadExcelFile(result.filename, result.data);
+      this.downloadBlob(filename, blob);
 
       return {
         success: true,
-        filename: result.filename,
-        message: `Beautiful Excel dashboard "${result.filename}" has been downloaded! 📊`,
-        size: result.size,
+        filename: filename,
+        message: `Beautiful Excel dashboard "${filename}" has been downloaded! 📊`,
+        size: blob.size,
       };
-    } catch (error) {
-      if (error.name === "AbortError") {
-        throw new Error(
-          "Export request timed out. The Excel generation is taking longer than expected."
-        );
-      }
+    }
 
-      console.error("Local export service error:", error);
-      throw error;
+    const result = await response.json();
+
+    if (!result.success) {
+      throw new Error(result.error || "Export failed");
     }
+
+    console.log("✅ Local export completed successfully!");
+    console.log("File:", result.filename);
+    console.log("Size:", (result.size / 1024).toFixed(1) + " KB");
+
+    // Download the file
+    this.downloadExcelFile(result.filename, result.data);
+
+    return {
+      success: true,
+      filename: result.filename,
+      message: `Beautiful Excel dashboard "${result.filename}" has been downloaded! 📊`,
+      size: result.size,
+    };
   }
 
   /**
@@ -141,9 +475,21 @@ class LocalExportService {
       }
 
       const blob = new Blob([bytes], {
-        type: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        type: XLSX_MIME_TYPE,
       });
 
+      return this.downloadBlob(filename, blob);
+    } catch (error) {
+      console.error("Download Error:", error);
+      throw new Error("Failed to download Excel file");
+    }
+  }
+
+  /**
+   * Download an Excel blob
+   */
+  downloadBlob(filename, blob) {
+    try {
       // Create download link
       const url = URL.createObjectURL(blob);
       const link = document.createElement("a");
@@ -165,6 +511,24 @@ class LocalExportService {
     }
   }
 
+  /**
+   * Read the filename from a binary export response
+   */
+  getDownloadFilename(response, tripData) {
+    const disposition = response.headers.get("Content-Disposition") || "";
+    const encodedMatch = disposition.match(/filename\*=UTF-8''([^;]+)/i);
+    if (encodedMatch) {
+      return decodeURIComponent(encodedMatch[1]);
+    }
+
+    const plainMatch = disposition.match(/filename="?([^";]+)"?/i);
+    if (plainMatch) {
+      return plainMatch[1];
+    }
+
+    return `HolidayMoo_${(tripData.name || "Trip").replace(/[ /]/g, "_")}.xlsx`;
+  }
+
   /**
    * Get service status and setup instructions
    */
@@ -7,19 +7,138 @@ Beautiful calendar-focused Excel dashboard generator
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import BarChart, PieChart, Reference
 import base64
+import contextvars
 import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import json
+import re
+
+from calendarLayout import day_columns, layout_days
+from calendarSnapshots import SnapshotError, SnapshotStore
+from eventExports import EVENT_EXPORT_FORMATS, csv_lines, ics_event_times, ics_lines, ndjson_lines
+from eventStore import EventStore, StoreError
+from exportCache import WorkbookCache, cache_key
+from exportHttp import (
+    RequestBodyError, decode_request_body, decode_trip_request, request_body_error_response, request_content_types,
+    request_encodings, send_stream, send_xlsx, send_zip, wants_binary_xlsx,
+)
+from exportJobs import DONE, FAILED, ExportJobQueue
+from exportLogging import fields, flask_request_logging, get_logger, trace_enabled
+from exportMetrics import ServiceMetrics, metrics_response
+from renderPool import RenderPool
+from spreadsheetWriter import DirectWorkbook
+from timeSlots import minute_of_day, nearest_slot_table, parse_iso_local
+from tripAnalytics import EventColumns
+from workbookCompression import COMPRESSION_LEVELS, DEFAULT_COMPRESSION, copy_package, save_workbook, worksheet_part
+from workbookStreaming import append_row, copy_worksheet_streamed, styled_cell
+from workbookStyles import StyleRegistry, box_border, solid_fill
+from workbookTemplate import WorkbookTemplate
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['Content-Disposition'])
+app.before_request(flask_request_logging)
+
+log = get_logger('local_export')
+export_metrics = ServiceMetrics('localExportService')
+
+# Generated workbooks shared across requests
+workbook_cache = WorkbookCache.from_env()
+
+# Versioned calendars so clients can upload only what changed
+calendar_snapshots = SnapshotStore.from_env()
+
+# Calendars kept in SQLite so exports can name a trip (HOLIDAYMOO_EVENT_DB)
+event_store = EventStore.from_env()
+
+# Background exports for trips that outlast a client's request timeout
+export_jobs = ExportJobQueue.from_env()
+
+# Upper bound on workbooks rendered at once for a batch export
+BATCH_MAX_WORKERS = int(os.environ.get('HOLIDAYMOO_BATCH_WORKERS', '4'))
+
+# Workbook writers: openpyxl, or the direct SpreadsheetML writer. Requests
+# pick one with `engine`; HOLIDAYMOO_RENDER_ENGINE sets the default.
+RENDER_ENGINES = ('openpyxl', 'direct')
+DEFAULT_RENDER_ENGINE = os.environ.get('HOLIDAYMOO_RENDER_ENGINE', 'openpyxl')
+
+# Calendar layouts: the whole trip on one sheet, or one sheet per week or
+# month. Requests pick one with `calendarPages`; HOLIDAYMOO_CALENDAR_PAGES
+# sets the default.
+CALENDAR_PAGINATIONS = ('single', 'week', 'month')
+DEFAULT_CALENDAR_PAGES = os.environ.get('HOLIDAYMOO_CALENDAR_PAGES', 'single')
+
+# Calendar grid styles, built once per process
+calendar_styles = StyleRegistry('Holiday Moo')
+
+# Static sheet content, recorded once per process (optionally from a branded file)
+export_template = WorkbookTemplate.from_env()
+
+# Fallback patterns for timestamps that are not plain ISO-8601
+ISO_TIME_PATTERN = re.compile(r'T(\d{1,2}):(\d{2})')
+ANY_TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})')
+DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+# The summary sheet's "generated on" line; cached workbooks get a fresh time when served
+GENERATED_CELL = 'A42'
+GENERATED_CELL_TAG = f'<c r="{GENERATED_CELL}"'.encode('utf-8')
+GENERATED_PREFIX = 'Generated by Holiday Moo 🏖️ on '
+GENERATED_TIME_FORMAT = '%B %d, %Y at %H:%M'
+GENERATED_TIME_PATTERN = re.compile(re.escape(GENERATED_PREFIX.encode('utf-8')) + rb'[^|<]*? \|')
+
+class TripEvent:
+    """Compact event record parsed once per export and shared by every sheet"""
+    __slots__ = ('event', 'date', 'start_time', 'end_time', 'start_slot', 'end_slot',
+                 'title', 'cost', 'type', 'location')
+
+    def __init__(self, event, date, start_time, end_time, start_slot, end_slot, title, cost, event_type, location):
+        self.event = event            # Raw event dict for rarely used fields
+        self.date = date              # datetime.date of the start time
+        self.start_time = start_time  # 'HH:MM' local start time
+        self.end_time = end_time      # 'HH:MM' local end time
+        self.start_slot = start_slot  # Index into time_slots
+        self.end_slot = end_slot      # Index into time_slots
+        self.title = title            # Resolved, Excel-safe title
+        self.cost = cost              # Numeric cost value
+        self.type = event_type        # Raw event type (may be None)
+        self.location = location      # Raw location (dict or string)
+
+    @property
+    def sort_key(self):
+        return (self.date, self.start_time)
 
 class HolidayMooExcelGenerator:
-    def __init__(self):
+    # Direct-engine trips with at least this many events build their sheets in
+    # parallel across the render pool's workers
+    PARALLEL_SHEET_EVENT_THRESHOLD = 1000
+
+    # Bump when the workbook layout changes so cached exports are not reused
+    CACHE_LAYOUT_VERSION = 3
+
+    # Sheet titles; template sheets are matched to these
+    CALENDAR_SHEET = "📅 Trip Calendar"
+    OVERVIEW_SHEET = "📊 Trip Analytics"
+    SUMMARY_SHEET = "📝 Trip Summary & Notes"
+    
+    # Event type rows in the analytics sheet, between its two headings
+    OVERVIEW_TYPE_ROWS = 7
+
+    def __init__(self, cache=None, pool=None):
+        # Optional WorkbookCache for repeated exports of the same trip
+        self.cache = cache
+        # Optional RenderPool that builds workbooks in worker processes
+        self.pool = pool
+        
+        # Per-event debug logging; decided once so disabled tracing costs nothing
+        self.trace = trace_enabled()
+        
         # Color scheme for professional dashboard
         self.colors = {
             'header': 'FF2E4057',      # Dark blue-gray
@@ -44,68 +163,255 @@ class HolidayMooExcelGenerator:
             'default': 'FF95A5A6'      # Gray
         }
         
+        # Paid status colors (fill, font)
+        self.paid_status_colors = {
+            'Paid': ('FFC6EFCE', 'FF006100'),     # Light green / dark green
+            'Pending': ('FFFFEB9C', 'FF9C5700'),  # Light yellow / dark orange
+            'Unpaid': ('FFFFC7CE', 'FF9C0006'),   # Light red / dark red
+        }
+        
+        # Trip Analytics labels, one row each
+        self.overview_trip_labels = ['📍 Destination', '📅 Start Date', '📅 End Date', '⏱️ Duration', '📋 Total Events', '📊 Events per Day']
+        self.overview_financial_labels = ['💵 Total Estimated Cost', '🎯 Budget', '📊 Budget Usage', '⚖️ Budget Status', '💸 Cost per Day', '🎫 Average Event Cost']
+        
+        # Events Details sheet layout
+        self.event_detail_headers = ['#', 'Date', 'Start Time', 'End Time', 'Event Name', 'Location', 'Address', 'Type', 'Cost', 'Paid Status', 'Description', 'Notes']
+        self.event_detail_widths = [5, 12, 10, 10, 30, 25, 35, 15, 12, 12, 50, 30]
+        # Keys for the same columns in NDJSON exports
+        self.event_detail_fields = ['index', 'date', 'startTime', 'endTime', 'title', 'location', 'address', 'type', 'cost', 'paidStatus', 'description', 'notes']
+        
         # Time slots for calendar (30-minute intervals)
         self.time_slots = []
         for hour in range(6, 24):  # 6:00 AM to 11:30 PM
             self.time_slots.append(f"{hour:02d}:00")
             self.time_slots.append(f"{hour:02d}:30")
+        self.slot_table = nearest_slot_table(tuple(self.time_slots))
+        
+        calendar_styles.define_once(self.build_calendar_styles)
+        export_template.define_once(self.build_template)
 
-    def create_workbook(self, calendar_data, trip_data):
+    def build_calendar_styles(self):
+        """Style definitions for the calendar grid, applied by name"""
+        thin_border = box_border('thin', 'FF000000')
+        thick_border = box_border('thick', 'FF000000')
+        center = Alignment(horizontal='center', vertical='center')
+        center_wrap = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        
+        styles = {
+            'time_header': dict(font=Font(bold=True, color='FFFFFF'), fill=solid_fill(self.colors['header']),
+                                alignment=center, border=thick_border),
+            'day_header': dict(font=Font(bold=True, color='FFFFFF', size=10), fill=solid_fill(self.colors['primary']),
+                               alignment=center_wrap, border=thick_border),
+            'time_slot': dict(font=Font(size=9, color=self.colors['text']), fill=solid_fill(self.colors['light']),
+                              alignment=center, border=thin_border),
+            'slot': dict(fill=solid_fill(self.colors['white']), border=thin_border),
+            'merged_slot': dict(border=thin_border),
+        }
+        
+        event_font = Font(size=8, bold=True, color='FFFFFF')
+        for event_type, color in self.event_colors.items():
+            styles[f'event_{event_type}'] = dict(font=event_font, fill=solid_fill(color),
+                                                 alignment=center_wrap, border=thin_border)
+        return styles
+
+    def build_template(self, wb):
+        """Static parts of each sheet; recorded once by export_template"""
+        self.calendar_template(wb.create_sheet(self.CALENDAR_SHEET))
+        self.overview_template(wb.create_sheet(self.OVERVIEW_SHEET))
+        self.summary_template(wb.create_sheet(self.SUMMARY_SHEET))
+
+    def create_workbook(self, calendar_data, trip_data, trip_events=None, engine='openpyxl', calendar_pages='single'):
         """Create the main workbook with all sheets"""
-        wb = openpyxl.Workbook()
+        if trip_events is None:
+            trip_events = self.normalize_trip_events(calendar_data, trip_data)
         
-        # Remove default sheet
-        wb.remove(wb.active)
+        if engine == 'direct':
+            # Same sheet code, written straight to SpreadsheetML on save
+            wb = DirectWorkbook()
+        else:
+            wb = openpyxl.Workbook()
+            
+            # Remove default sheet
+            wb.remove(wb.active)
         
         # Create sheets in order
-        self.create_calendar_sheet(wb, calendar_data, trip_data)
-        self.create_overview_sheet(wb, calendar_data, trip_data)
-        self.create_events_sheet(wb, calendar_data, trip_data)
+        self.create_calendar_sheet(wb, trip_data, trip_events, calendar_pages)
+        self.create_overview_sheet(wb, trip_data, trip_events)
+        self.create_events_sheet(wb, trip_events)
         self.create_summary_sheet(wb, calendar_data, trip_data)
         
         return wb
 
-    def create_calendar_sheet(self, wb, calendar_data, trip_data):
-        """Create the main calendar dashboard sheet"""
-        ws = wb.create_sheet("📅 Trip Calendar", 0)
+    def create_streaming_workbook(self, calendar_data, trip_data, trip_events=None, calendar_pages='single'):
+        """Create a write-only workbook that streams the events list row by row"""
+        if trip_events is None:
+            trip_events = self.normalize_trip_events(calendar_data, trip_data)
+        
+        wb = openpyxl.Workbook(write_only=True)
+        
+        # Fixed-layout sheets are small, so build them normally and copy them across
+        scratch = openpyxl.Workbook()
+        scratch.remove(scratch.active)
+        
+        # Calendar pages are built and copied one at a time, so only one is ever held
+        with export_metrics.stage('calendar_sheet'):
+            for page in self.calendar_pages(trip_data, trip_events, calendar_pages):
+                page_ws = self.create_calendar_page(scratch, trip_data, page)
+                copy_worksheet_streamed(wb, page_ws)
+                scratch.remove(page_ws)
+        
+        self.create_overview_sheet(scratch, trip_data, trip_events)
+        self.create_summary_sheet(scratch, calendar_data, trip_data)
+        
+        # Create sheets in order
+        copy_worksheet_streamed(wb, scratch.worksheets[0])
+        self.stream_events_sheet(wb, trip_events)
+        copy_worksheet_streamed(wb, scratch.worksheets[1])
+        
+        return wb
+
+    @export_metrics.timed_stage('filter_events')
+    def normalize_trip_events(self, calendar_data, trip_data):
+        """Parse each event inside the trip dates into a TripEvent, exactly once"""
+        return list(self.iter_trip_events(calendar_data, trip_data))
+
+    def iter_trip_events(self, calendar_data, trip_data):
+        """Yield a TripEvent for each event inside the trip dates"""
+        start_date, end_date = self.trip_date_range(trip_data)
+        
+        for event in calendar_data.get('events', []):
+            try:
+                event_date = self.extract_date_only(event.get('startTime', '2025-01-01'))
+            except Exception as e:
+                log.warning("Could not parse event date", extra=fields(start_time=event.get('startTime'), error=str(e)))
+                continue
+            
+            if not start_date <= event_date <= end_date:
+                if self.trace:
+                    log.debug("Event outside trip range", extra=fields(title=event.get('title'), date=event_date, trip_start=start_date, trip_end=end_date))
+                continue
+            
+            start_time = self.extract_time_simple(event.get('startTime', '09:00'))
+            end_time = self.extract_time_simple(event.get('endTime', event.get('startTime', '10:00')))
+            
+            # Try multiple fields for event name
+            title = event.get('title') or event.get('name') or event.get('eventName') or 'Untitled Event'
+            
+            yield TripEvent(
+                event,
+                event_date,
+                start_time,
+                end_time,
+                self.slot_for_time(start_time),
+                self.slot_for_time(end_time),
+                self.safe_excel_value(title),
+                self.extract_cost_value(event.get('cost', event.get('estimatedCost', 0))),
+                event.get('type'),
+                event.get('location'),
+            )
+
+    def trip_date_range(self, trip_data):
+        """First and last day of the trip, as iter_trip_events reads them"""
+        start_date = self.parse_datetime(trip_data.get('startDate', '2025-01-01')).date()
+        end_date = self.parse_datetime(trip_data.get('endDate', '2025-01-02')).date()
+        return start_date, end_date
+
+    def trip_event_filter(self, trip_data):
+        """Predicate keeping the calendar events iter_trip_events may export, or None to keep all
         
-        # Get trip dates and events
+        Used while a request is read, so the other trips' events are dropped
+        before the calendar is ever whole. Events whose date cannot be read
+        are kept for iter_trip_events to report.
+        """
+        try:
+            start_date, end_date = self.trip_date_range(trip_data)
+        except Exception:
+            return None
+        
+        def keep(event):
+            if not isinstance(event, dict):
+                return True
+            try:
+                event_date = self.extract_date_only(event.get('startTime', '2025-01-01'))
+            except Exception:
+                return True
+            return start_date <= event_date <= end_date
+        
+        return keep
+
+    @export_metrics.timed_stage('calendar_sheet')
+    def create_calendar_sheet(self, wb, trip_data, trip_events, calendar_pages='single'):
+        """Create the main calendar dashboard: one sheet, or one per week or month"""
+        for index, page in enumerate(self.calendar_pages(trip_data, trip_events, calendar_pages)):
+            self.create_calendar_page(wb, trip_data, page, index)
+
+    def calendar_pages(self, trip_data, trip_events, calendar_pages='single'):
+        """Split the trip into calendar sheets: a list of (title, dates, events)
+        
+        Week pages follow ISO weeks (Monday to Sunday) and month pages
+        calendar months, cut to the trip dates. Each page carries only the
+        events on its own days, so pages can be built independently.
+        """
+        # Get trip dates
         start_date = self.parse_datetime(trip_data.get('startDate', '2025-01-01'))
         end_date = self.parse_datetime(trip_data.get('endDate', '2025-01-02'))
-        trip_events = self.get_trip_events(calendar_data.get('events', []), start_date, end_date)
         
         # Calculate trip duration and create date range
         duration = (end_date - start_date).days + 1
         dates = [start_date + timedelta(days=i) for i in range(duration)]
         
+        if calendar_pages == 'single':
+            return [(self.CALENDAR_SHEET, dates, trip_events)]
+        
+        page_dates = {}
+        for date in dates:
+            key = date.isocalendar()[:2] if calendar_pages == 'week' else (date.year, date.month)
+            page_dates.setdefault(key, []).append(date)
+        
+        page_of_day = {date.date(): key for key, days in page_dates.items() for date in days}
+        page_events = {key: [] for key in page_dates}
+        for event in trip_events:
+            key = page_of_day.get(event.date)
+            if key is not None:
+                page_events[key].append(event)
+        
+        pages = []
+        for number, (key, days) in enumerate(page_dates.items(), 1):
+            if calendar_pages == 'week':
+                title = f"📅 Week {number} ({days[0].strftime('%b %d')})"
+            else:
+                title = f"📅 {days[0].strftime('%B %Y')}"
+            pages.append((title, days, page_events[key]))
+        return pages
+
+    def create_calendar_page(self, wb, trip_data, page, index=0):
+        """Create one calendar sheet from a (title, dates, events) page"""
+        title, dates, events = page
+        
+        # Every page repeats the calendar template: header styling, time column and legend
+        ws = export_template.apply(wb.create_sheet(title, index), self.CALENDAR_SHEET)
+        
         # Create header section
         self.create_calendar_header(ws, trip_data, dates)
         
-        # Create calendar grid
-        self.create_calendar_grid(ws, dates, trip_events)
-        
-        # Add legend
-        self.create_calendar_legend(ws, len(dates))
+        # Create calendar grid (the time column and legend come from the template)
+        columns = self.create_calendar_grid(ws, dates, events)
         
-        # Set column widths and row heights
-        self.format_calendar_sheet(ws, len(dates))
+        # Set column widths
+        self.format_calendar_sheet(ws, columns)
+        return ws
 
-    def create_calendar_header(self, ws, trip_data, dates):
-        """Create the header section with trip info"""
-        # Main title
+    def calendar_template(self, ws):
+        """Static parts of the calendar sheet: header styling, time column and legend"""
+        # Header section
         ws.merge_cells('A1:H1')
         title_cell = ws['A1']
-        title_cell.value = f"🏖️ {trip_data.get('name', 'Holiday Moo Trip')}"
         title_cell.font = Font(size=20, bold=True, color='FFFFFF')
         title_cell.fill = PatternFill(start_color=self.colors['header'], end_color=self.colors['header'], fill_type='solid')
         title_cell.alignment = Alignment(horizontal='center', vertical='center')
         
-        # Trip details
         ws.merge_cells('A2:H2')
         details_cell = ws['A2']
-        start_str = dates[0].strftime('%B %d, %Y')
-        end_str = dates[-1].strftime('%B %d, %Y')
-        details_cell.value = f"📍 {trip_data.get('destination', 'Unknown')} • {start_str} - {end_str} • {len(dates)} days"
         details_cell.font = Font(size=12, color='FFFFFF')
         details_cell.fill = PatternFill(start_color=self.colors['primary'], end_color=self.colors['primary'], fill_type='solid')
         details_cell.alignment = Alignment(horizontal='center', vertical='center')
@@ -114,41 +420,99 @@ class HolidayMooExcelGenerator:
         ws.row_dimensions[1].height = 35
         ws.row_dimensions[2].height = 25
         ws.row_dimensions[3].height = 10  # Spacer
-
-    def create_calendar_grid(self, ws, dates, events):
-        """Create the main calendar grid with time slots and events"""
+        
+        # Time column (styles include the grid borders)
         start_row = 4
+        calendar_styles.apply(ws.cell(row=start_row, column=1, value="Time"), 'time_header')
+        for i, time_slot in enumerate(self.time_slots, start_row + 1):
+            calendar_styles.apply(ws.cell(row=i, column=1, value=time_slot), 'time_slot')
         
-        # Create day headers
-        ws.cell(row=start_row, column=1, value="Time")
-        ws.cell(row=start_row, column=1).font = Font(bold=True, color='FFFFFF')
-        ws.cell(row=start_row, column=1).fill = PatternFill(start_color=self.colors['header'], end_color=self.colors['header'], fill_type='solid')
-        ws.cell(row=start_row, column=1).alignment = Alignment(horizontal='center', vertical='center')
+        # Add legend
+        self.create_calendar_legend(ws)
         
-        for i, date in enumerate(dates, 2):
-            day_cell = ws.cell(row=start_row, column=i)
-            day_cell.value = f"{date.strftime('%a')}\n{date.strftime('%m/%d')}"
-            day_cell.font = Font(bold=True, color='FFFFFF', size=10)
-            day_cell.fill = PatternFill(start_color=self.colors['primary'], end_color=self.colors['primary'], fill_type='solid')
-            day_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        # Time column width and row heights for time slots (smaller since we have 30-minute slots)
+        ws.column_dimensions['A'].width = 10
+        for i in range(5, 5 + len(self.time_slots)):
+            ws.row_dimensions[i].height = 25
+
+    def create_calendar_header(self, ws, trip_data, dates):
+        """Fill in the header section with trip info"""
+        # Main title
+        ws['A1'].value = f"🏖️ {trip_data.get('name', 'Holiday Moo Trip')}"
         
-        # Create time slots
-        for i, time_slot in enumerate(self.time_slots, start_row + 1):
-            time_cell = ws.cell(row=i, column=1, value=time_slot)
-            time_cell.font = Font(size=9, color=self.colors['text'])
-            time_cell.fill = PatternFill(start_color=self.colors['light'], end_color=self.colors['light'], fill_type='solid')
-            time_cell.alignment = Alignment(horizontal='center', vertical='center')
-            
-            # Create empty cells for each day
-            for j in range(2, len(dates) + 2):
-                cell = ws.cell(row=i, column=j, value="")
-                cell.fill = PatternFill(start_color=self.colors['white'], end_color=self.colors['white'], fill_type='solid')
+        # Trip details
+        start_str = dates[0].strftime('%B %d, %Y')
+        end_str = dates[-1].strftime('%B %d, %Y')
+        ws['A2'].value = f"📍 {trip_data.get('destination', 'Unknown')} • {start_str} - {end_str} • {len(dates)} days"
+
+    def create_calendar_grid(self, ws, dates, events):
+        """Create the main calendar grid with time slots and events
+        
+        Returns {date: (first column, lanes)} for the day columns.
+        """
+        start_row = 4
+        
+        # Lay out overlapping events first; a day gets one column per lane
+        days = [date.date() for date in dates]
+        layouts = self.layout_calendar_events(days, events)
+        columns = day_columns(days, layouts)
+        last_col = 1 + sum(lanes for _, lanes in columns.values())
+        
+        # Create day headers (styles include the grid borders)
+        for date, day in zip(dates, days):
+            col, lanes = columns[day]
+            day_cell = ws.cell(row=start_row, column=col, value=f"{date.strftime('%a')}\n{date.strftime('%m/%d')}")
+            calendar_styles.apply(day_cell, 'day_header')
+            if lanes > 1:
+                ws.merge_cells(start_row=start_row, start_column=col, end_row=start_row, end_column=col + lanes - 1)
+        
+        # Create empty cells for each day
+        for i in range(start_row + 1, start_row + 1 + len(self.time_slots)):
+            for j in range(2, last_col + 1):
+                calendar_styles.apply(ws.cell(row=i, column=j, value=""), 'slot')
         
         # Place events in calendar
-        self.place_events_in_calendar(ws, dates, events, start_row)
+        self.place_events_in_calendar(ws, days, layouts, columns, start_row)
         
         # Add borders to calendar grid
-        self.add_calendar_borders(ws, start_row, len(dates), len(self.time_slots))
+        self.add_calendar_borders(ws, days, layouts, columns, start_row)
+        return columns
+
+    def layout_calendar_events(self, days, events):
+        """Assign overlapping events to side-by-side lanes within their day
+        
+        Returns {date: DayLayout}. Overlaps are logged as a conflict report.
+        """
+        intervals = []
+        for event in events:
+            # Ensure every event covers at least one slot
+            end_slot = max(event.end_slot, event.start_slot + 1)
+            intervals.append((event.date, event.start_slot, end_slot, event))
+        layouts = layout_days(days, intervals)
+        
+        conflicts = self.layout_conflict_report(layouts)
+        if conflicts:
+            log.info("Overlapping events placed side by side", extra=fields(
+                days=len({conflict['date'] for conflict in conflicts}), conflicts=len(conflicts)))
+            if self.trace:
+                for conflict in conflicts:
+                    log.debug("Calendar overlap", extra=fields(**conflict))
+        return layouts
+
+    def layout_conflict_report(self, layouts):
+        """One entry per run of overlapping events: date, time span, lanes and titles"""
+        report = []
+        for day, layout in layouts.items():
+            for conflict in layout.conflicts:
+                end_slot = min(conflict.end, len(self.time_slots)) - 1
+                report.append({
+                    'date': day.isoformat(),
+                    'start': self.time_slots[conflict.start],
+                    'end': self.time_slots[end_slot],
+                    'lanes': conflict.lanes,
+                    'events': [event.title for event in conflict.items],
+                })
+        return report
 
     def extract_date_simple(self, date_string):
         """Simple string-based date extraction - no datetime conversion"""
@@ -156,171 +520,97 @@ class HolidayMooExcelGenerator:
             return "2025-01-01"
             
         date_str = str(date_string).strip()
-        print(f"🗓️ Raw date input: '{date_str}'")
         
         # Extract YYYY-MM-DD pattern
-        import re
-        match = re.search(r'(\d{4})-(\d{2})-(\d{2})', date_str)
+        match = DATE_PATTERN.search(date_str)
         if match:
             result = f"{match.group(1)}-{match.group(2)}-{match.group(3)}"
-            print(f"✅ Date extracted: '{result}'")
+            if self.trace:
+                log.debug("Date extracted", extra=fields(raw=date_str, result=result))
             return result
         
-        print(f"⚠️ No date found in '{date_str}', using default")
+        if self.trace:
+            log.debug("No date found, using default", extra=fields(raw=date_str))
         return "2025-01-01"
 
     def extract_date_only(self, datetime_string):
         """Extract date as datetime.date object"""
+        parsed = parse_iso_local(datetime_string)
+        if parsed is not None:
+            return parsed.date()
+        
         date_str = self.extract_date_simple(datetime_string)
         parts = date_str.split('-')
         year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
         return datetime(year, month, day).date()
 
-    def place_events_in_calendar(self, ws, dates, events, start_row):
-        """Place events in their appropriate time slots with cell merging"""
-        # Track merged cells to avoid conflicts
-        merged_cells = set()
-        
-        for event in events:
-            try:
-                # Extract date and times separately to avoid timezone issues
-                event_date = self.extract_date_only(event.get('startTime', '2025-01-01'))
-                print(f"📅 Event date: {event_date}")
-            except Exception as e:
-                print(f"Warning: Could not parse event time {event.get('startTime', 'unknown')}: {e}")
-                continue
-            
-            # Find the date column
-            date_col = None
-            for i, date in enumerate(dates):
-                if date.date() == event_date:
-                    date_col = i + 2  # +2 because column 1 is time, dates start at column 2
-                    break
-            
-            if date_col is None:
-                continue
-            
-            # Find start and end time slots using simple string extraction
-            start_time_slot = self.find_time_slot_simple(event.get('startTime', '2025-01-01T09:00:00'))
-            end_time_slot = self.find_time_slot_simple(event.get('endTime', event.get('startTime', '2025-01-01T10:00:00')))
-            
-            if start_time_slot is None:
-                continue
-            
-            # Calculate rows
-            start_row_idx = start_row + 1 + start_time_slot
-            end_row_idx = start_row + 1 + end_time_slot if end_time_slot is not None else start_row_idx
-            
-            # Ensure end row is at least one slot after start
-            if end_row_idx <= start_row_idx:
-                end_row_idx = start_row_idx + 1
-            
-            # Format event text - try multiple fields for event name
-            event_title = event.get('title') or event.get('name') or event.get('eventName') or 'Untitled Event'
-            event_title = self.safe_excel_value(event_title)
-            event_text = f"{event_title}"
+    def place_events_in_calendar(self, ws, days, layouts, columns, start_row):
+        """Write events into their lanes, merging the cells each one spans"""
+        for day in days:
+            first_col, _ = columns[day]
             
-            # Add location info
-            location_value = event.get('location')
-            if location_value:
-                if isinstance(location_value, dict):
-                    location_name = location_value.get('name', '')
-                    if location_name:
-                        event_text += f"\n📍 {location_name}"
-                else:
-                    location_str = self.safe_excel_value(location_value)
-                    event_text += f"\n📍 {location_str}"
-            
-            # Get event color based on type
-            event_type = event.get('type', 'default').lower()
-            event_color = self.event_colors.get(event_type, self.event_colors['default'])
-            
-            # Merge cells if event spans multiple time slots
-            if end_row_idx > start_row_idx:
-                try:
-                    # Validate merge range before attempting
-                    if start_row_idx > 0 and end_row_idx > start_row_idx and date_col > 0:
-                        start_cell = f"{get_column_letter(date_col)}{start_row_idx}"
-                        end_cell = f"{get_column_letter(date_col)}{end_row_idx - 1}"
-                        
-                        # Check if cells are already merged or contain data
-                        merge_range = f"{start_cell}:{end_cell}"
-                        print(f"🔗 Attempting to merge: {merge_range}")
-                        
-                        # Check for conflicts with existing merges
-                        conflict = False
-                        for row in range(start_row_idx, end_row_idx):
-                            cell_key = f"{date_col}_{row}"
-                            if cell_key in merged_cells:
-                                print(f"⚠️ Merge conflict detected at {get_column_letter(date_col)}{row}")
-                                conflict = True
-                                break
-                        
-                        if not conflict:
-                            # Clear any existing content in the range first
-                            for row in range(start_row_idx, end_row_idx):
-                                cell_to_clear = ws.cell(row=row, column=date_col)
-                                if cell_to_clear.value:
-                                    print(f"⚠️ Clearing existing content in {get_column_letter(date_col)}{row}")
-                                    cell_to_clear.value = None
-                            
-                            # Perform the merge
-                            ws.merge_cells(merge_range)
-                            print(f"✅ Successfully merged: {merge_range}")
-                            
-                            # Track merged cells
-                            for row in range(start_row_idx, end_row_idx):
-                                merged_cells.add(f"{date_col}_{row}")
-                        else:
-                            print(f"❌ Skipping merge due to conflict: {merge_range}")
-                            raise ValueError("Merge conflict")
-                        
-                        # Set value and formatting on the merged cell
-                        cell = ws.cell(row=start_row_idx, column=date_col)
-                        cell.value = event_text
-                        cell.font = Font(size=8, bold=True, color='FFFFFF')
-                        cell.fill = PatternFill(start_color=event_color, end_color=event_color, fill_type='solid')
-                        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                        
+            for placement in layouts[day].placements:
+                event = placement.item
+                
+                # Calculate rows and columns
+                start_row_idx = start_row + 1 + placement.start
+                end_row_idx = start_row + placement.end
+                start_col = first_col + placement.lane
+                end_col = first_col + placement.last_lane
+                
+                # Format event text
+                event_text = f"{event.title}"
+                
+                # Add location info
+                location_value = event.location
+                if location_value:
+                    if isinstance(location_value, dict):
+                        location_name = location_value.get('name', '')
+                        if location_name:
+                            event_text += f"\n📍 {location_name}"
                     else:
-                        print(f"⚠️ Invalid merge range: start_row={start_row_idx}, end_row={end_row_idx}, col={date_col}")
-                        raise ValueError("Invalid merge range")
-                        
-                except Exception as e:
-                    print(f"❌ Could not merge cells for event {event_title}: {e}")
-                    # Fallback to single cell
-                    cell = ws.cell(row=start_row_idx, column=date_col)
-                    cell.value = event_text
-                    cell.font = Font(size=8, bold=True, color='FFFFFF')
-                    cell.fill = PatternFill(start_color=event_color, end_color=event_color, fill_type='solid')
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            else:
-                # Single cell event
-                cell = ws.cell(row=start_row_idx, column=date_col)
-                cell.value = event_text
-                cell.font = Font(size=8, bold=True, color='FFFFFF')
-                cell.fill = PatternFill(start_color=event_color, end_color=event_color, fill_type='solid')
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+                        location_str = self.safe_excel_value(location_value)
+                        event_text += f"\n📍 {location_str}"
+                
+                # Get event style based on type
+                event_type = (event.type or 'default').lower()
+                event_style = f'event_{event_type}' if event_type in self.event_colors else 'event_default'
+                
+                # Lanes never overlap, so every merge can be made directly
+                if end_row_idx > start_row_idx or end_col > start_col:
+                    ws.merge_cells(start_row=start_row_idx, start_column=start_col,
+                                   end_row=end_row_idx, end_column=end_col)
+                    if self.trace:
+                        log.debug("Merged event cells", extra=fields(
+                            range=f"{get_column_letter(start_col)}{start_row_idx}:{get_column_letter(end_col)}{end_row_idx}",
+                            title=event.title))
+                
+                # Set value and formatting on the top-left cell
+                cell = ws.cell(row=start_row_idx, column=start_col, value=event_text)
+                calendar_styles.apply(cell, event_style)
 
     def extract_time_simple(self, time_string):
         """Simple string-based time extraction - no datetime conversion at all"""
         if not time_string:
             return "09:00"
             
+        # Fast path: plain ISO-8601, memoised across events
+        parsed = parse_iso_local(time_string)
+        if parsed is not None:
+            return f"{parsed.hour:02d}:{parsed.minute:02d}"
+        
         # Convert to string and clean it
         time_str = str(time_string).strip()
-        print(f"🔍 Raw time input: '{time_str}'")
         
         # Method 1: Direct regex extraction (timezone-naive)
-        import re
-        
         # Look for HH:MM pattern after T - treat as local time
-        match = re.search(r'T(\d{1,2}):(\d{2})', time_str)
+        match = ISO_TIME_PATTERN.search(time_str)
         if match:
             hour = int(match.group(1))
             minute = int(match.group(2))
             result = f"{hour:02d}:{minute:02d}"
-            print(f"✅ Local time extracted: '{result}' (no timezone conversion)")
+            if self.trace:
+                log.debug("Local time extracted", extra=fields(raw=time_str, result=result, method='iso'))
             return result
         
         # Method 2: Manual string splitting
@@ -338,21 +628,25 @@ class HolidayMooExcelGenerator:
                             hour = int(time_components[0])
                             minute = int(time_components[1])
                             result = f"{hour:02d}:{minute:02d}"
-                            print(f"✅ Manual extracted: '{result}'")
+                            if self.trace:
+                                log.debug("Local time extracted", extra=fields(raw=time_str, result=result, method='split'))
                             return result
             except Exception as e:
-                print(f"⚠️ Manual extraction error: {e}")
+                if self.trace:
+                    log.debug("Manual time extraction failed", extra=fields(raw=time_str, error=str(e)))
         
         # Method 3: Look for any HH:MM pattern
-        match = re.search(r'(\d{1,2}):(\d{2})', time_str)
+        match = ANY_TIME_PATTERN.search(time_str)
         if match:
             hour = int(match.group(1))
             minute = int(match.group(2))
             result = f"{hour:02d}:{minute:02d}"
-            print(f"✅ General pattern extracted: '{result}'")
+            if self.trace:
+                log.debug("Local time extracted", extra=fields(raw=time_str, result=result, method='pattern'))
             return result
         
-        print(f"⚠️ No time found in '{time_str}', using default 09:00")
+        if self.trace:
+            log.debug("No time found, using default 09:00", extra=fields(raw=time_str))
         return "09:00"
 
     def extract_local_time(self, datetime_string):
@@ -363,14 +657,24 @@ class HolidayMooExcelGenerator:
 
     def find_time_slot_simple(self, time_string):
         """Find time slot using simple string extraction"""
-        time_str = self.extract_time_simple(time_string)
-        print(f"🎯 Finding slot for time: '{time_str}'")
+        return self.slot_for_time(self.extract_time_simple(time_string))
+
+    def slot_for_time(self, time_str):
+        """Find the time slot index for an 'HH:MM' string"""
         
         # Parse the time string
         parts = time_str.split(':')
         hour = int(parts[0])
         minute = int(parts[1])
         
+        # Constant-time lookup for any valid time of day
+        minutes = minute_of_day(hour, minute)
+        if minutes is not None:
+            slot_index = self.slot_table[minutes]
+            if self.trace:
+                log.debug("Time slot found", extra=fields(time=time_str, slot=slot_index))
+            return slot_index
+        
         # Round to nearest 30-minute slot
         if minute < 15:
             target_time = f"{hour:02d}:00"
@@ -381,21 +685,20 @@ class HolidayMooExcelGenerator:
             next_hour = (hour + 1) % 24
             target_time = f"{next_hour:02d}:00"
         
-        print(f"🎯 Rounded {time_str} -> {target_time}")
-        
         # Find the slot index
         try:
             slot_index = self.time_slots.index(target_time)
-            print(f"✅ Found slot index: {slot_index}")
-            return slot_index
         except ValueError:
             # If not found, find closest slot
+            slot_index = len(self.time_slots) - 1  # Last slot if nothing found
             for i, slot in enumerate(self.time_slots):
                 if slot >= target_time:
-                    print(f"✅ Closest slot index: {i}")
-                    return i
-            print(f"✅ Using last slot: {len(self.time_slots) - 1}")
-            return len(self.time_slots) - 1  # Last slot if nothing found
+                    slot_index = i
+                    break
+        
+        if self.trace:
+            log.debug("Time slot found", extra=fields(time=time_str, rounded=target_time, slot=slot_index))
+        return slot_index
 
     def find_time_slot(self, datetime_obj):
         """Wrapper for backward compatibility"""
@@ -408,32 +711,23 @@ class HolidayMooExcelGenerator:
 
 
 
-    def add_calendar_borders(self, ws, start_row, num_days, num_time_slots):
-        """Add professional borders to the calendar grid"""
-        thin_border = Border(
-            left=Side(style='thin', color='FF000000'),
-            right=Side(style='thin', color='FF000000'),
-            top=Side(style='thin', color='FF000000'),
-            bottom=Side(style='thin', color='FF000000')
-        )
-        
-        thick_border = Border(
-            left=Side(style='thick', color='FF000000'),
-            right=Side(style='thick', color='FF000000'),
-            top=Side(style='thick', color='FF000000'),
-            bottom=Side(style='thick', color='FF000000')
-        )
-        
-        # Apply borders to entire calendar grid
-        for row in range(start_row, start_row + num_time_slots + 1):
-            for col in range(1, num_days + 2):
-                cell = ws.cell(row=row, column=col)
-                if row == start_row:  # Header row
-                    cell.border = thick_border
-                else:
-                    cell.border = thin_border
+    def add_calendar_borders(self, ws, days, layouts, columns, start_row):
+        """Add professional borders to the calendar grid
+        
+        Grid cells get their borders from their named styles; only the cells
+        swallowed by event merges still need one.
+        """
+        for day in days:
+            first_col, _ = columns[day]
+            for placement in layouts[day].placements:
+                top = start_row + 1 + placement.start
+                left = first_col + placement.lane
+                for row in range(top, start_row + placement.end + 1):
+                    for col in range(left, first_col + placement.last_lane + 1):
+                        if (row, col) != (top, left):
+                            calendar_styles.apply(ws.cell(row=row, column=col), 'merged_slot')
 
-    def create_calendar_legend(self, ws, num_days):
+    def create_calendar_legend(self, ws):
         """Create legend for event types"""
         legend_start_row = 4 + len(self.time_slots) + 3
         
@@ -468,59 +762,32 @@ class HolidayMooExcelGenerator:
             label_cell = ws.cell(row=row, column=col + 1, value=label)
             label_cell.font = Font(size=9)
 
-    def format_calendar_sheet(self, ws, num_days):
-        """Set column widths and row heights for calendar"""
-        # Time column
-        ws.column_dimensions['A'].width = 10
-        
-        # Date columns - much wider for better event display
-        for i in range(2, num_days + 2):
-            col_letter = get_column_letter(i)
-            ws.column_dimensions[col_letter].width = 25  # Increased from 15 to 25
-        
-        # Row heights for time slots (smaller since we have 30-minute slots)
-        for i in range(5, 5 + len(self.time_slots)):
-            ws.row_dimensions[i].height = 25
+    def format_calendar_sheet(self, ws, columns):
+        """Set the date column widths for calendar"""
+        # Date columns - much wider for better event display; days with
+        # side-by-side events get narrower lanes
+        for first_col, lanes in columns.values():
+            width = 25 if lanes == 1 else 18
+            for i in range(first_col, first_col + lanes):
+                ws.column_dimensions[get_column_letter(i)].width = width
 
-    def create_overview_sheet(self, wb, calendar_data, trip_data):
-        """Create comprehensive trip analytics and overview sheet"""
-        ws = wb.create_sheet("📊 Trip Analytics")
-        
+    def overview_template(self, ws):
+        """Static parts of the analytics sheet: section headings, labels and widths"""
         # Header
         ws.merge_cells('A1:H1')
-        ws['A1'].value = f"📊 Trip Analytics Dashboard - {trip_data.get('name', 'Holiday Moo Trip')}"
         ws['A1'].font = Font(size=18, bold=True, color='FFFFFF')
         ws['A1'].fill = PatternFill(start_color=self.colors['header'], end_color=self.colors['header'], fill_type='solid')
         ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
         ws.row_dimensions[1].height = 40
         
-        # Trip statistics
-        start_date = self.parse_datetime(trip_data.get('startDate', '2025-01-01'))
-        end_date = self.parse_datetime(trip_data.get('endDate', '2025-01-02'))
-        duration = (end_date - start_date).days + 1
-        trip_events = self.get_trip_events(calendar_data.get('events', []), start_date, end_date)
-        
-        # Calculate financial analytics
-        total_cost, budget, cost_breakdown = self.calculate_financial_analytics(trip_events, trip_data)
-        
         # Basic trip info section
         ws.merge_cells('A3:D3')
         ws['A3'].value = "🎯 Trip Summary"
         ws['A3'].font = Font(size=14, bold=True, color=self.colors['text'])
         ws['A3'].fill = PatternFill(start_color=self.colors['secondary'], end_color=self.colors['secondary'], fill_type='solid')
         
-        basic_stats = [
-            ('📍 Destination', self.safe_excel_value(trip_data.get('destination', 'Unknown'))),
-            ('📅 Start Date', start_date.strftime('%B %d, %Y')),
-            ('📅 End Date', end_date.strftime('%B %d, %Y')),
-            ('⏱️ Duration', f"{duration} days"),
-            ('📋 Total Events', len(trip_events)),
-            ('📊 Events per Day', f"{len(trip_events) / duration:.1f}"),
-        ]
-        
-        for i, (label, value) in enumerate(basic_stats, 4):
+        for i, label in enumerate(self.overview_trip_labels, 4):
             ws.cell(row=i, column=1, value=label).font = Font(bold=True)
-            ws.cell(row=i, column=2, value=self.safe_excel_value(value))
         
         # Financial analytics section
         ws.merge_cells('A11:D11')
@@ -528,30 +795,8 @@ class HolidayMooExcelGenerator:
         ws['A11'].font = Font(size=14, bold=True, color=self.colors['text'])
         ws['A11'].fill = PatternFill(start_color=self.colors['accent'], end_color=self.colors['accent'], fill_type='solid')
         
-        budget_over_under = "Over Budget" if total_cost > budget else "Under Budget" if total_cost < budget else "On Budget"
-        budget_percentage = (total_cost / budget * 100) if budget > 0 else 0
-        
-        financial_stats = [
-            ('💵 Total Estimated Cost', f"${total_cost:.2f}"),
-            ('🎯 Budget', f"${budget:.2f}"),
-            ('📊 Budget Usage', f"{budget_percentage:.1f}%"),
-            ('⚖️ Budget Status', budget_over_under),
-            ('💸 Cost per Day', f"${total_cost / duration:.2f}"),
-            ('🎫 Average Event Cost', f"${total_cost / len(trip_events):.2f}" if trip_events else "$0.00"),
-        ]
-        
-        for i, (label, value) in enumerate(financial_stats, 12):
-            cell = ws.cell(row=i, column=1, value=label)
-            cell.font = Font(bold=True)
-            value_cell = ws.cell(row=i, column=2, value=value)
-            
-            # Color code budget status
-            if "Over Budget" in str(value):
-                value_cell.fill = PatternFill(start_color='FFFFC7CE', end_color='FFFFC7CE', fill_type='solid')
-                value_cell.font = Font(color='FF9C0006', bold=True)
-            elif "Under Budget" in str(value):
-                value_cell.fill = PatternFill(start_color='FFC6EFCE', end_color='FFC6EFCE', fill_type='solid')
-                value_cell.font = Font(color='FF006100', bold=True)
+        for i, label in enumerate(self.overview_financial_labels, 12):
+            ws.cell(row=i, column=1, value=label).font = Font(bold=True)
         
         # Event type analytics
         ws.merge_cells('F3:H3')
@@ -559,22 +804,10 @@ class HolidayMooExcelGenerator:
         ws['F3'].font = Font(size=14, bold=True, color=self.colors['text'])
         ws['F3'].fill = PatternFill(start_color=self.colors['primary'], end_color=self.colors['primary'], fill_type='solid')
         
-        event_types = {}
-        for event in trip_events:
-            event_type = event.get('type', 'Other')
-            event_types[event_type] = event_types.get(event_type, 0) + 1
-        
-        # Event type breakdown with percentages
         ws.cell(row=4, column=6, value="Event Type").font = Font(bold=True)
         ws.cell(row=4, column=7, value="Count").font = Font(bold=True)
         ws.cell(row=4, column=8, value="Percentage").font = Font(bold=True)
         
-        for i, (event_type, count) in enumerate(event_types.items(), 5):
-            percentage = (count / len(trip_events) * 100) if trip_events else 0
-            ws.cell(row=i, column=6, value=event_type)
-            ws.cell(row=i, column=7, value=count)
-            ws.cell(row=i, column=8, value=f"{percentage:.1f}%")
-        
         # Cost breakdown by category
         ws.merge_cells('F12:H12')
         ws['F12'].value = "💰 Cost Breakdown by Category"
@@ -585,33 +818,12 @@ class HolidayMooExcelGenerator:
         ws.cell(row=13, column=7, value="Cost").font = Font(bold=True)
         ws.cell(row=13, column=8, value="% of Total").font = Font(bold=True)
         
-        for i, (category, cost) in enumerate(cost_breakdown.items(), 14):
-            cost_percentage = (cost / total_cost * 100) if total_cost > 0 else 0
-            ws.cell(row=i, column=6, value=category)
-            ws.cell(row=i, column=7, value=f"${cost:.2f}")
-            ws.cell(row=i, column=8, value=f"{cost_percentage:.1f}%")
-        
         # Daily activity analysis
         ws.merge_cells('A20:H20')
         ws['A20'].value = "📅 Daily Activity Analysis"
         ws['A20'].font = Font(size=14, bold=True, color=self.colors['text'])
         ws['A20'].fill = PatternFill(start_color=self.colors['secondary'], end_color=self.colors['secondary'], fill_type='solid')
         
-        # Group events by day
-        daily_events = {}
-        daily_costs = {}
-        for event in trip_events:
-            event_date = self.parse_datetime(event.get('startTime', '2025-01-01T00:00:00')).date()
-            day_key = event_date.strftime('%m/%d')
-            
-            if day_key not in daily_events:
-                daily_events[day_key] = 0
-                daily_costs[day_key] = 0
-            
-            daily_events[day_key] += 1
-            event_cost = self.extract_cost_value(event.get('cost', event.get('estimatedCost', 0)))
-            daily_costs[day_key] += event_cost
-        
         # Daily breakdown headers
         headers = ['Date', 'Day of Week', 'Events', 'Total Cost', 'Avg Cost/Event']
         for i, header in enumerate(headers, 1):
@@ -619,12 +831,90 @@ class HolidayMooExcelGenerator:
             cell.font = Font(bold=True, color='FFFFFF')
             cell.fill = PatternFill(start_color=self.colors['header'], end_color=self.colors['header'], fill_type='solid')
         
-        # Daily data
+        # Set column widths
+        column_widths = [20, 25, 15, 15, 20, 20, 15, 15]
+        for i, width in enumerate(column_widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+
+    @export_metrics.timed_stage('overview_sheet')
+    def create_overview_sheet(self, wb, trip_data, trip_events):
+        """Create comprehensive trip analytics and overview sheet"""
+        ws = export_template.apply(wb.create_sheet(self.OVERVIEW_SHEET))
+        
+        # Header
+        ws['A1'].value = f"📊 Trip Analytics Dashboard - {trip_data.get('name', 'Holiday Moo Trip')}"
+        
+        # Trip statistics
+        start_date = self.parse_datetime(trip_data.get('startDate', '2025-01-01'))
+        end_date = self.parse_datetime(trip_data.get('endDate', '2025-01-02'))
+        duration = (end_date - start_date).days + 1
+        
+        # Calculate financial analytics
+        columns = self.event_columns(trip_events, start_date, duration)
+        total_cost, budget, cost_breakdown = self.calculate_financial_analytics(columns, trip_data)
+        
+        # Basic trip info section, next to the template's labels
+        basic_stats = [
+            self.safe_excel_value(trip_data.get('destination', 'Unknown')),
+            start_date.strftime('%B %d, %Y'),
+            end_date.strftime('%B %d, %Y'),
+            f"{duration} days",
+            len(trip_events),
+            f"{len(trip_events) / duration:.1f}",
+        ]
+        
+        for i, value in enumerate(basic_stats, 4):
+            ws.cell(row=i, column=2, value=self.safe_excel_value(value))
+        
+        # Financial analytics section
+        budget_over_under = "Over Budget" if total_cost > budget else "Under Budget" if total_cost < budget else "On Budget"
+        budget_percentage = (total_cost / budget * 100) if budget > 0 else 0
+        
+        financial_stats = [
+            f"${total_cost:.2f}",
+            f"${budget:.2f}",
+            f"{budget_percentage:.1f}%",
+            budget_over_under,
+            f"${total_cost / duration:.2f}",
+            f"${total_cost / len(trip_events):.2f}" if trip_events else "$0.00",
+        ]
+        
+        for i, value in enumerate(financial_stats, 12):
+            value_cell = ws.cell(row=i, column=2, value=value)
+            
+            # Color code budget status
+            if "Over Budget" in str(value):
+                value_cell.fill = PatternFill(start_color='FFFFC7CE', end_color='FFFFC7CE', fill_type='solid')
+                value_cell.font = Font(color='FF9C0006', bold=True)
+            elif "Under Budget" in str(value):
+                value_cell.fill = PatternFill(start_color='FFC6EFCE', end_color='FFC6EFCE', fill_type='solid')
+                value_cell.font = Font(color='FF006100', bold=True)
+        
+        # Event type breakdown with percentages; rows 5-11 sit above the cost
+        # breakdown heading, so types past the sixth share the last row
+        event_types = list(columns.type_counts().items())
+        if len(event_types) > self.OVERVIEW_TYPE_ROWS:
+            kept = self.OVERVIEW_TYPE_ROWS - 1
+            others = event_types[kept:]
+            event_types = event_types[:kept] + [(f"{len(others)} more types", sum(count for _, count in others))]
+        for i, (event_type, count) in enumerate(event_types, 5):
+            percentage = (count / len(trip_events) * 100) if trip_events else 0
+            ws.cell(row=i, column=6, value=event_type)
+            ws.cell(row=i, column=7, value=count)
+            ws.cell(row=i, column=8, value=f"{percentage:.1f}%")
+        
+        # Cost breakdown by category, stepping over the daily analysis heading
+        # (row 20); the daily table below only uses columns A-E
+        for i, (category, cost) in enumerate(cost_breakdown.items(), 14):
+            row = i + 1 if i >= 20 else i
+            cost_percentage = (cost / total_cost * 100) if total_cost > 0 else 0
+            ws.cell(row=row, column=6, value=category)
+            ws.cell(row=row, column=7, value=f"${cost:.2f}")
+            ws.cell(row=row, column=8, value=f"{cost_percentage:.1f}%")
+        
+        # Daily activity analysis: events and cost per trip day
         current_date = start_date
-        for i in range(duration):
-            day_key = current_date.strftime('%m/%d')
-            events_count = daily_events.get(day_key, 0)
-            day_cost = daily_costs.get(day_key, 0)
+        for i, (events_count, day_cost) in enumerate(zip(columns.day_counts(), columns.day_costs())):
             avg_cost = day_cost / events_count if events_count > 0 else 0
             
             row = 22 + i
@@ -640,17 +930,17 @@ class HolidayMooExcelGenerator:
                     ws.cell(row=row, column=col).fill = PatternFill(start_color='FFFFEB9C', end_color='FFFFEB9C', fill_type='solid')
             
             current_date += timedelta(days=1)
-        
-        # Set column widths
-        column_widths = [20, 25, 15, 15, 20, 20, 15, 15]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(i)].width = width
 
-    def calculate_financial_analytics(self, events, trip_data):
-        """Calculate comprehensive financial analytics"""
-        total_cost = 0
-        cost_breakdown = {}
-        
+    def event_columns(self, trip_events, start_date, duration):
+        """Day, type and cost columns of the trip's events for the analytics tables"""
+        return EventColumns.build(
+            start_date.date(),
+            max(duration, 0),
+            ((event.date, event.type or 'Other', event.cost) for event in trip_events),
+        )
+
+    def calculate_financial_analytics(self, columns, trip_data):
+        """Calculate comprehensive financial analytics from EventColumns"""
         # Extract budget from trip data
         budget = trip_data.get('budget', 0)
         if isinstance(budget, str):
@@ -667,17 +957,8 @@ class HolidayMooExcelGenerator:
                 pass
             budget = duration * 150  # $150 per day default budget
         
-        # Calculate costs by category
-        for event in events:
-            event_cost = self.extract_cost_value(event.get('cost', event.get('estimatedCost', 0)))
-            total_cost += event_cost
-            
-            event_type = event.get('type', 'Other')
-            if event_type not in cost_breakdown:
-                cost_breakdown[event_type] = 0
-            cost_breakdown[event_type] += event_cost
-        
-        return total_cost, budget, cost_breakdown
+        # Costs by category
+        return columns.total_cost, budget, columns.type_costs()
 
     def extract_cost_value(self, cost_info):
         """Extract numeric cost value from various formats"""
@@ -699,35 +980,86 @@ class HolidayMooExcelGenerator:
         
         return 0
 
-    def create_events_sheet(self, wb, calendar_data, trip_data):
+    @export_metrics.timed_stage('events_sheet')
+    def create_events_sheet(self, wb, trip_events):
         """Create detailed events list sheet with comprehensive information"""
         ws = wb.create_sheet("📋 Events Details")
         
         # Header
-        headers = ['#', 'Date', 'Start Time', 'End Time', 'Event Name', 'Location', 'Address', 'Type', 'Cost', 'Paid Status', 'Description', 'Notes']
-        for i, header in enumerate(headers, 1):
+        for i, header in enumerate(self.event_detail_headers, 1):
             cell = ws.cell(row=1, column=i, value=header)
             cell.font = Font(bold=True, color='FFFFFF')
             cell.fill = PatternFill(start_color=self.colors['header'], end_color=self.colors['header'], fill_type='solid')
             cell.alignment = Alignment(horizontal='center', vertical='center')
         
-        # Get trip events
-        start_date = self.parse_datetime(trip_data.get('startDate', '2025-01-01'))
-        end_date = self.parse_datetime(trip_data.get('endDate', '2025-01-02'))
-        trip_events = self.get_trip_events(calendar_data.get('events', []), start_date, end_date)
-        
         # Sort events by date and time
-        trip_events.sort(key=lambda x: self.parse_datetime(x.get('startTime', '2025-01-01T00:00:00')))
+        trip_events = sorted(trip_events, key=lambda x: x.sort_key)
         
         # Add events
-        for i, event in enumerate(trip_events, 2):
-            # Extract date and times separately to avoid timezone conversion
-            event_date = self.extract_date_only(event.get('startTime', '2025-01-01'))
-            start_hour, start_minute = self.extract_local_time(event.get('startTime', '2025-01-01T09:00:00'))
-            end_hour, end_minute = self.extract_local_time(event.get('endTime', event.get('startTime', '2025-01-01T10:00:00')))
+        for i, (values, location_url, paid_status) in enumerate(self.get_event_detail_rows(trip_events), 2):
+            for col, value in enumerate(values, 1):
+                ws.cell(row=i, column=col, value=value)
+            
+            # Location with hyperlink if available
+            if location_url:
+                location_cell = ws.cell(row=i, column=6)
+                location_cell.hyperlink = location_url
+                location_cell.font = Font(color='FF0000FF', underline='single')  # Blue underlined
+            
+            # Color code paid status
+            if paid_status in self.paid_status_colors:
+                fill_color, font_color = self.paid_status_colors[paid_status]
+                paid_cell = ws.cell(row=i, column=10)
+                paid_cell.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type='solid')
+                paid_cell.font = Font(color=font_color)
+        
+        # Set column widths - wider for better readability
+        for i, width in enumerate(self.event_detail_widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+        
+        # Set row heights for better readability
+        for row in range(2, len(trip_events) + 2):
+            ws.row_dimensions[row].height = 30
+
+    @export_metrics.timed_stage('events_sheet')
+    def stream_events_sheet(self, wb, trip_events):
+        """Write the events list into a write-only workbook one row at a time"""
+        ws = wb.create_sheet("📋 Events Details")
+        
+        # Column widths have to be set before any row is written
+        for i, width in enumerate(self.event_detail_widths, 1):
+            ws.column_dimensions[get_column_letter(i)].width = width
+        
+        header_font = Font(bold=True, color='FFFFFF')
+        header_fill = PatternFill(start_color=self.colors['header'], end_color=self.colors['header'], fill_type='solid')
+        header_alignment = Alignment(horizontal='center', vertical='center')
+        ws.append([
+            styled_cell(ws, header, font=header_font, fill=header_fill, alignment=header_alignment)
+            for header in self.event_detail_headers
+        ])
+        
+        link_font = Font(color='FF0000FF', underline='single')
+        paid_styles = {
+            status: (PatternFill(start_color=fill_color, end_color=fill_color, fill_type='solid'), Font(color=font_color))
+            for status, (fill_color, font_color) in self.paid_status_colors.items()
+        }
+        
+        trip_events = sorted(trip_events, key=lambda x: x.sort_key)
+        for i, (values, location_url, paid_status) in enumerate(self.get_event_detail_rows(trip_events), 2):
+            if location_url:
+                values[5] = styled_cell(ws, values[5], font=link_font, hyperlink=location_url)
+            if paid_status in paid_styles:
+                paid_fill, paid_font = paid_styles[paid_status]
+                values[9] = styled_cell(ws, values[9], font=paid_font, fill=paid_fill)
+            append_row(ws, i, values, height=30)
+
+    def get_event_detail_rows(self, trip_events):
+        """Yield (values, location_url, paid_status) for each row of the events sheet"""
+        for index, record in enumerate(trip_events, 1):
+            event = record.event
             
             # Extract location information
-            location_info = event.get('location', {})
+            location_info = record.location or {}
             location_name = ""
             location_address = ""
             location_url = ""
@@ -749,94 +1081,50 @@ class HolidayMooExcelGenerator:
             # Determine paid status
             paid_status = self.get_paid_status(event)
             
-            # Get proper event title
-            event_title = event.get('title', event.get('name', 'Untitled Event'))
-            
-            # Use simple string extraction for display
-            start_time_str = self.extract_time_simple(event.get('startTime', '09:00'))
-            end_time_str = self.extract_time_simple(event.get('endTime', event.get('startTime', '10:00')))
-            date_str = self.extract_date_simple(event.get('startTime', '2025-01-01'))
-            
-            # Convert date string to display format
-            date_parts = date_str.split('-')
-            display_date = f"{date_parts[1]}/{date_parts[2]}/{date_parts[0]}"
-            
-            # Row data with pure string-based times (no conversion)
-            ws.cell(row=i, column=1, value=i-1)  # #
-            ws.cell(row=i, column=2, value=display_date)  # Date (string-based)
-            ws.cell(row=i, column=3, value=start_time_str)  # Start Time (string-based)
-            ws.cell(row=i, column=4, value=end_time_str)  # End Time (string-based)
-            ws.cell(row=i, column=5, value=self.safe_excel_value(event_title))  # Event Name
+            # Convert date to display format
+            display_date = record.date.strftime('%m/%d/%Y')
             
-            # Location with hyperlink if available
-            location_cell = ws.cell(row=i, column=6, value=self.safe_excel_value(location_name))
-            if location_url:
-                location_cell.hyperlink = location_url
-                location_cell.font = Font(color='FF0000FF', underline='single')  # Blue underlined
-            
-            ws.cell(row=i, column=7, value=self.safe_excel_value(location_address))  # Address
-            ws.cell(row=i, column=8, value=self.safe_excel_value(event.get('type', 'Event')))  # Type
-            ws.cell(row=i, column=9, value=cost_display)  # Cost
-            ws.cell(row=i, column=10, value=paid_status)  # Paid Status
             # Get description from multiple possible fields with enhanced debug logging
             description_fields = ['remark', 'description', 'desc', 'details', 'note', 'notes', 'summary', 'content', 'body', 'text']
             description = ''
             
-            print(f"\n🔍 Processing event: '{event.get('title', event.get('name', 'Unknown'))}'")
-            print(f"🔍 Event keys: {list(event.keys())}")
-            
+            description_field = None
             for field in description_fields:
                 field_value = event.get(field)
                 if field_value:
                     description = field_value
-                    print(f"✅ Found description in field '{field}': '{str(description)[:100]}...'")
+                    description_field = field
                     break
-                else:
-                    print(f"❌ Field '{field}': {repr(field_value)}")
             
             if not description:
-                print(f"⚠️ No description found for event '{event.get('title', event.get('name', 'Unknown'))}'")
-                print(f"🔍 Full event data: {event}")
                 description = 'No description available'
             
             # Process description through safe_excel_value
             safe_description = self.safe_excel_value(description)
-            print(f"📝 Final description for Excel: '{safe_description}'")
+            if self.trace:
+                log.debug("Event description resolved", extra=fields(
+                    title=record.title,
+                    event_keys=list(event.keys()),
+                    field=description_field,
+                    description=str(safe_description)[:100],
+                ))
             
-            ws.cell(row=i, column=11, value=safe_description)  # Description
-            ws.cell(row=i, column=12, value=self.safe_excel_value(event.get('notes', '')))  # Notes
-            
-            # Alternate row colors
-            if i % 2 == 0:
-                for col in range(1, 13):
-                    cell = ws.cell(row=i, column=col)
-                    if not cell.fill.start_color.rgb or cell.fill.start_color.rgb == 'FFFFFFFF':
-                        cell.fill = PatternFill(
-                            start_color=self.colors['light'], 
-                            end_color=self.colors['light'], 
-                            fill_type='solid'
-                        )
-            
-            # Color code paid status
-            paid_cell = ws.cell(row=i, column=10)
-            if paid_status == 'Paid':
-                paid_cell.fill = PatternFill(start_color='FFC6EFCE', end_color='FFC6EFCE', fill_type='solid')  # Light green
-                paid_cell.font = Font(color='FF006100')  # Dark green
-            elif paid_status == 'Pending':
-                paid_cell.fill = PatternFill(start_color='FFFFEB9C', end_color='FFFFEB9C', fill_type='solid')  # Light yellow
-                paid_cell.font = Font(color='FF9C5700')  # Dark orange
-            elif paid_status == 'Unpaid':
-                paid_cell.fill = PatternFill(start_color='FFFFC7CE', end_color='FFFFC7CE', fill_type='solid')  # Light red
-                paid_cell.font = Font(color='FF9C0006')  # Dark red
-        
-        # Set column widths - wider for better readability
-        column_widths = [5, 12, 10, 10, 30, 25, 35, 15, 12, 12, 50, 30]
-        for i, width in enumerate(column_widths, 1):
-            ws.column_dimensions[get_column_letter(i)].width = width
-        
-        # Set row heights for better readability
-        for row in range(2, len(trip_events) + 2):
-            ws.row_dimensions[row].height = 30
+            # Row data with pure string-based times (no conversion)
+            values = [
+                index,  # #
+                display_date,  # Date (string-based)
+                record.start_time,  # Start Time (string-based)
+                record.end_time,  # End Time (string-based)
+                record.title,  # Event Name
+                self.safe_excel_value(location_name),  # Location
+                self.safe_excel_value(location_address),  # Address
+                self.safe_excel_value(record.type or 'Event'),  # Type
+                cost_display,  # Cost
+                paid_status,  # Paid Status
+                safe_description,  # Description
+                self.safe_excel_value(event.get('notes', '')),  # Notes
+            ]
+            yield values, location_url, paid_status
 
     def format_cost(self, cost_info):
         """Format cost information for display"""
@@ -891,13 +1179,25 @@ class HolidayMooExcelGenerator:
         # Default status
         return 'TBD'
 
+    @export_metrics.timed_stage('summary_sheet')
     def create_summary_sheet(self, wb, calendar_data, trip_data):
-        """Create trip summary and notes sheet with much wider layout"""
-        ws = wb.create_sheet("📝 Trip Summary & Notes")
+        """Create trip summary and notes sheet with much wider layout
+        
+        Everything but the title, description and generated line comes from the template.
+        """
+        ws = export_template.apply(wb.create_sheet(self.SUMMARY_SHEET))
         
+        ws['A1'].value = f"📝 Trip Summary & Notes - {trip_data.get('name', 'Holiday Moo Trip')}"
+        
+        description = trip_data.get('description') or trip_data.get('notes') or 'No description provided. Add your trip details, objectives, and special notes here.'
+        ws['A4'].value = self.safe_excel_value(description)
+        
+        ws[GENERATED_CELL].value = f"{GENERATED_PREFIX}{datetime.now().strftime(GENERATED_TIME_FORMAT)} | Visit us at holidaymoo.com"
+
+    def summary_template(self, ws):
+        """Static parts of the summary sheet: checklist, information and notes blocks"""
         # Header - much wider
         ws.merge_cells('A1:J1')
-        ws['A1'].value = f"📝 Trip Summary & Notes - {trip_data.get('name', 'Holiday Moo Trip')}"
         ws['A1'].font = Font(size=18, bold=True, color='FFFFFF')
         ws['A1'].fill = PatternFill(start_color=self.colors['header'], end_color=self.colors['header'], fill_type='solid')
         ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
@@ -907,8 +1207,6 @@ class HolidayMooExcelGenerator:
         ws.cell(row=3, column=1, value="📋 Trip Description:").font = Font(bold=True, size=14)
         ws.merge_cells('A4:J10')
         desc_cell = ws['A4']
-        description = trip_data.get('description') or trip_data.get('notes') or 'No description provided. Add your trip details, objectives, and special notes here.'
-        desc_cell.value = self.safe_excel_value(description)
         desc_cell.alignment = Alignment(vertical='top', wrap_text=True)
         desc_cell.font = Font(size=11)
         
@@ -979,7 +1277,6 @@ Local Information:
         # Generated info - full width
         ws.merge_cells('A42:J42')
         generated_cell = ws['A42']
-        generated_cell.value = f"Generated by Holiday Moo 🏖️ on {datetime.now().strftime('%B %d, %Y at %H:%M')} | Visit us at holidaymoo.com"
         generated_cell.font = Font(italic=True, size=9, color='FF666666')
         generated_cell.alignment = Alignment(horizontal='center')
         
@@ -1023,7 +1320,8 @@ Local Information:
         for fmt in formats:
             try:
                 parsed_dt = datetime.strptime(clean_date, fmt)
-                print(f"🕐 Parsed '{date_string}' -> '{clean_date}' as {parsed_dt} (format: {fmt})")
+                if self.trace:
+                    log.debug("Parsed datetime", extra=fields(raw=date_string, clean=clean_date, parsed=parsed_dt, format=fmt))
                 return parsed_dt
             except ValueError:
                 continue
@@ -1032,11 +1330,12 @@ Local Information:
         try:
             date_part = clean_date[:10] if len(clean_date) >= 10 else clean_date
             parsed_dt = datetime.strptime(date_part, '%Y-%m-%d')
-            print(f"🕐 Parsed date part '{date_string}' -> '{date_part}' as {parsed_dt}")
+            if self.trace:
+                log.debug("Parsed date part", extra=fields(raw=date_string, clean=date_part, parsed=parsed_dt))
             return parsed_dt
         except ValueError:
             # Last resort - return current date
-            print(f"⚠️ Could not parse datetime '{date_string}', using current time")
+            log.warning("Could not parse datetime, using current time", extra=fields(raw=date_string))
             return datetime.now()
 
     def safe_excel_value(self, value):
@@ -1071,93 +1370,805 @@ Local Information:
                 event_date = self.extract_date_only(event.get('startTime', '2025-01-01'))
                 if start_date.date() <= event_date <= end_date.date():
                     trip_events.append(event)
-                    print(f"✅ Event '{event.get('title', 'Unknown')}' on {event_date} included in trip")
-                else:
-                    print(f"❌ Event '{event.get('title', 'Unknown')}' on {event_date} outside trip range {start_date.date()} - {end_date.date()}")
+                elif self.trace:
+                    log.debug("Event outside trip range", extra=fields(title=event.get('title'), date=event_date, trip_start=start_date.date(), trip_end=end_date.date()))
             except Exception as e:
-                print(f"Warning: Could not parse event date {event.get('startTime', 'unknown')}: {e}")
+                log.warning("Could not parse event date", extra=fields(start_time=event.get('startTime'), error=str(e)))
                 continue
         return trip_events
 
-    def generate_excel(self, calendar_data, trip_data):
-        """Main method to generate Excel file"""
-        wb = self.create_workbook(calendar_data, trip_data)
+    def render_excel(self, calendar_data, trip_data, streaming=None, progress=None, engine=None, compression=None,
+                     calendar_pages=None):
+        """Render the workbook into an in-memory buffer
+        
+        streaming=True builds in write-only mode, which holds fewer cells in
+        memory but is no faster, so it is only used when asked for.
+        engine is one of RENDER_ENGINES; None uses DEFAULT_RENDER_ENGINE.
+        compression is one of COMPRESSION_LEVELS; None uses DEFAULT_COMPRESSION.
+        calendar_pages is one of CALENDAR_PAGINATIONS; None uses DEFAULT_CALENDAR_PAGES.
+        progress, if given, is called as progress(stage, fraction) between stages.
+        Returns (excel_buffer, filename) without copying the saved bytes.
+        """
+        report = progress or (lambda stage, fraction: None)
+        engine = engine or DEFAULT_RENDER_ENGINE
+        compression = compression or DEFAULT_COMPRESSION
+        calendar_pages = calendar_pages or DEFAULT_CALENDAR_PAGES
+        filename = self.generate_filename(trip_data)
+        
+        # Cache hits skip openpyxl entirely
+        trip_events = self.normalize_trip_events(calendar_data, trip_data)
+        export_metrics.observe_export(events=len(trip_events))
+        report('events', 0.15)
+        
+        key = None
+        if self.cache is not None:
+            key = cache_key(self.CACHE_LAYOUT_VERSION, engine, compression, calendar_pages, export_template.fingerprint, trip_data, [event.event for event in trip_events])
+            cached = self.cache.get(key)
+            if cached is not None:
+                report('cached', 0.95)
+                export_metrics.observe_export(output_bytes=len(cached))
+                return self.restamp_workbook(cached, compression), filename
+        
+        report('rendering', 0.2)
+        if (self.pool is not None and self.pool.uses_workers and engine == 'direct'
+                and len(trip_events) >= self.PARALLEL_SHEET_EVENT_THRESHOLD):
+            with export_metrics.stage('render_pool'):
+                excel_buffer = self.build_workbook_in_parallel(
+                    calendar_data, trip_data, trip_events, compression, calendar_pages)
+        elif self.pool is not None and self.pool.uses_workers:
+            # Build in a worker process so concurrent exports are not bound by the GIL;
+            # only the trip's own events are pickled and parsed again there
+            trip_calendar = dict(calendar_data, events=[event.event for event in trip_events])
+            with export_metrics.stage('render_pool'):
+                data, stages = self.pool.run(
+                    render_workbook_bytes, trip_calendar, trip_data, streaming, engine, compression, calendar_pages)
+            export_metrics.record_stages(stages)
+            excel_buffer = io.BytesIO(data)
+        else:
+            excel_buffer = self.build_workbook(
+                calendar_data, trip_data, trip_events, streaming, engine, compression, calendar_pages)
+        report('rendered', 0.9)
+        export_metrics.observe_export(output_bytes=excel_buffer.getbuffer().nbytes)
+        
+        if key is not None:
+            self.cache.put(key, excel_buffer.getvalue())
+        
+        return excel_buffer, filename
+
+    def restamp_workbook(self, data, compression):
+        """Repackage cached workbook bytes with the summary's generated-on time set to now
+        
+        Only the summary sheet's part is rewritten; every other part keeps its
+        compressed bytes.
+        """
+        stamp = f"{GENERATED_PREFIX}{datetime.now().strftime(GENERATED_TIME_FORMAT)} |".encode('utf-8')
+        with export_metrics.stage('restamp'), zipfile.ZipFile(io.BytesIO(data)) as source:
+            name = worksheet_part(source, self.SUMMARY_SHEET)
+            if name is None:
+                return io.BytesIO(data)
+            
+            # Only the generated-on cell, not text that happens to share its prefix
+            part = source.read(name)
+            start = part.find(GENERATED_CELL_TAG)
+            end = part.find(b'</c>', start)
+            if start < 0 or end < 0:
+                return io.BytesIO(data)
+            cell = GENERATED_TIME_PATTERN.sub(lambda match: stamp, part[start:end], count=1)
+            
+            excel_buffer = io.BytesIO()
+            copy_package(source, excel_buffer, {name: part[:start] + cell + part[end:]}, compression)
+        return excel_buffer
+
+    def build_workbook(self, calendar_data, trip_data, trip_events, streaming=None, engine='openpyxl', compression=None,
+                       calendar_pages='single'):
+        """Build and save the workbook in this process"""
+        if engine == 'direct':
+            # The direct writer never holds openpyxl cells, so it has no streaming mode
+            wb = self.create_workbook(calendar_data, trip_data, trip_events, engine, calendar_pages)
+        elif streaming:
+            wb = self.create_streaming_workbook(calendar_data, trip_data, trip_events, calendar_pages)
+        else:
+            wb = self.create_workbook(calendar_data, trip_data, trip_events, calendar_pages=calendar_pages)
         
         # Save to bytes
         excel_buffer = io.BytesIO()
-        wb.save(excel_buffer)
+        with export_metrics.stage('save'):
+            save_workbook(wb, excel_buffer, compression)
         excel_buffer.seek(0)
+        return excel_buffer
+
+    def build_workbook_in_parallel(self, calendar_data, trip_data, trip_events, compression=None,
+                                   calendar_pages='single'):
+        """Build each sheet on its own render pool worker, then package them here
+        
+        Sheets do not depend on each other, so they are built and serialised
+        at the same time (each calendar page separately) and the export takes
+        about as long as its slowest sheet. Only the direct engine can hand
+        back serialised sheets; the result matches build_workbook's.
+        """
+        calls = [(render_sheet_part, 'calendar', trip_data, page)
+                 for page in self.calendar_pages(trip_data, trip_events, calendar_pages)]
+        calls.append((render_sheet_part, 'overview', trip_data, trip_events))
+        calls.append((render_sheet_part, 'events', trip_events))
+        # The summary sheet does not read events; skip pickling them
+        calls.append((render_sheet_part, 'summary', dict(calendar_data, events=[]), trip_data))
+        
+        wb = DirectWorkbook()
+        for parts, stages in self.pool.run_all(calls):
+            export_metrics.record_stages(stages)
+            for part in parts:
+                wb.add_sheet_part(part)
         
-        # Encode to base64
-        excel_b64 = base64.b64encode(excel_buffer.getvalue()).decode('utf-8')
-        
-        # Generate filename
+        excel_buffer = io.BytesIO()
+        with export_metrics.stage('save'):
+            save_workbook(wb, excel_buffer, compression)
+        excel_buffer.seek(0)
+        return excel_buffer
+
+    def generate_filename(self, trip_data, extension='xlsx'):
+        """Generate the download filename for a trip"""
         trip_name = trip_data['name'].replace(' ', '_').replace('/', '_')
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"HolidayMoo_{trip_name}_{timestamp}.xlsx"
+        return f"HolidayMoo_{trip_name}_{timestamp}.{extension}"
+
+    def stream_event_export(self, calendar_data, trip_data, export_format):
+        """Render the trip's event rows as csv, ics or ndjson, chunk by chunk
+        
+        Returns (chunks, filename, mimetype). Events are filtered and sorted
+        up front, in events-sheet order; each row is only formatted when the
+        response reaches it, so no more than one row is ever held as text.
+        """
+        mimetype, extension = EVENT_EXPORT_FORMATS[export_format]
+        trip_events = sorted(self.iter_trip_events(calendar_data, trip_data), key=lambda x: x.sort_key)
+        rows = self.get_event_detail_rows(trip_events)
+        
+        if export_format == 'csv':
+            chunks = csv_lines(self.event_detail_headers, (values for values, _, _ in rows))
+        elif export_format == 'ndjson':
+            chunks = ndjson_lines(self.event_detail_records(rows))
+        else:
+            chunks = ics_lines(trip_data.get('name', 'Holiday Moo Trip'), self.ics_events(trip_events, rows))
+        return chunks, self.generate_filename(trip_data, extension), mimetype
+
+    def event_detail_records(self, rows):
+        """Events-sheet rows as dicts keyed by event_detail_fields"""
+        for values, location_url, _ in rows:
+            record = dict(zip(self.event_detail_fields, values))
+            record['locationUrl'] = location_url or None
+            yield record
+
+    def ics_events(self, trip_events, rows):
+        """Events-sheet rows as VEVENT dicts for ics_lines"""
+        for record, (values, location_url, paid_status) in zip(trip_events, rows):
+            start, end = ics_event_times(record.date, record.start_time, record.end_time)
+            event_id = record.event.get('id')
+            location = ', '.join(str(part) for part in values[5:7] if part and part != 'TBD')
+            details = [f'Cost: {values[8]}', f'Payment: {paid_status}']
+            if values[10] != 'No description available':
+                details.insert(0, str(values[10]))
+            if values[11]:
+                details.append(f'Notes: {values[11]}')
+            yield {
+                'uid': f"{event_id}@holidaymoo" if event_id else f"{record.date:%Y%m%d}-{values[0]}@holidaymoo",
+                'start': start,
+                'end': end,
+                'summary': record.title,
+                'location': location,
+                'description': '\n'.join(details),
+                'url': location_url,
+                'categories': values[7],
+            }
+
+    def generate_excel(self, calendar_data, trip_data, streaming=None, engine=None, compression=None, calendar_pages=None):
+        """Main method to generate Excel file as a JSON-ready base64 payload"""
+        excel_buffer, filename = self.render_excel(
+            calendar_data, trip_data, streaming, engine=engine, compression=compression, calendar_pages=calendar_pages)
+        return self.excel_payload(excel_buffer, filename)
+
+    def excel_payload(self, excel_buffer, filename):
+        """Wrap a rendered workbook in the JSON/base64 response format"""
+        # Encode straight from the buffer's memory instead of a getvalue() copy
+        excel_view = excel_buffer.getbuffer()
+        with export_metrics.stage('base64_encode'):
+            excel_b64 = base64.b64encode(excel_view).decode('ascii')
         
         return {
             'success': True,
             'filename': filename,
             'data': excel_b64,
-            'size': len(excel_buffer.getvalue())
+            'size': excel_view.nbytes
         }
 
+def render_workbook_bytes(calendar_data, trip_data, streaming=None, engine='openpyxl', compression=None,
+                          calendar_pages='single'):
+    """Render pool job: build one trip's workbook and return its bytes and stage timings"""
+    generator = HolidayMooExcelGenerator()
+    with export_metrics.collect_stages() as stages:
+        trip_events = generator.normalize_trip_events(calendar_data, trip_data)
+        excel_buffer = generator.build_workbook(
+            calendar_data, trip_data, trip_events, streaming, engine, compression, calendar_pages)
+    return excel_buffer.getvalue(), stages
+
+def render_sheet_part(sheet, *args):
+    """Render pool job: build one sheet (or calendar page) and return it serialised, with stage timings"""
+    generator = HolidayMooExcelGenerator()
+    build = {
+        'calendar': generator.create_calendar_page,
+        'overview': generator.create_overview_sheet,
+        'events': generator.create_events_sheet,
+        'summary': generator.create_summary_sheet,
+    }[sheet]
+    wb = DirectWorkbook()
+    with export_metrics.collect_stages() as stages:
+        build(wb, *args)
+    return wb.sheet_parts(), stages
+
+def warm_render_worker():
+    """Render pool initializer: load openpyxl and the style definitions up front"""
+    HolidayMooExcelGenerator()
+    openpyxl.Workbook().save(io.BytesIO())
+
+# Workbook rendering, in worker processes when HOLIDAYMOO_RENDER_WORKERS is set
+render_pool = RenderPool.from_env(initializer=warm_render_worker)
+
+def run_export_job(report, calendar_data, trip_data, streaming=None, engine=None, compression=None, calendar_pages=None):
+    """Export job body: render one trip and hand back (bytes, filename)"""
+    generator = HolidayMooExcelGenerator(cache=workbook_cache, pool=render_pool)
+    try:
+        excel_buffer, filename = generator.render_excel(
+            calendar_data, trip_data, streaming, progress=report, engine=engine, compression=compression,
+            calendar_pages=calendar_pages)
+    except Exception:
+        export_metrics.error('export_jobs', 'job_failed')
+        raise
+    return excel_buffer.getvalue(), filename
+
+def resolve_calendar_data(data):
+    """Get calendarData from a request body
+    
+    Either the full `calendarData`, or a `calendarId` (with an optional
+    `calendarVersion` to check, or a `calendarDelta` to apply first) naming a
+    server-held snapshot. Returns None when the body has neither; raises
+    SnapshotError for unknown calendars, stale versions and bad deltas.
+    """
+    if 'calendarData' in data:
+        return data['calendarData']
+    if 'calendarId' not in data:
+        return None
+    
+    if data.get('calendarDelta'):
+        snapshot = calendar_snapshots.apply_delta(data['calendarId'], data['calendarDelta'])
+    else:
+        snapshot = calendar_snapshots.get(data['calendarId'], data.get('calendarVersion'))
+    return snapshot.calendar_data
+
+def engine_error_response(data):
+    """400 response for an unknown `engine` in a request body, else None"""
+    engine = data.get('engine')
+    if engine is None or engine in RENDER_ENGINES:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f"Unknown engine '{engine}'",
+        'engines': list(RENDER_ENGINES),
+    }), 400
+
+def compression_error_response(data):
+    """400 response for an unknown `compression` in a request body, else None"""
+    compression = data.get('compression')
+    if compression is None or compression in COMPRESSION_LEVELS:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f"Unknown compression '{compression}'",
+        'compressions': list(COMPRESSION_LEVELS),
+    }), 400
+
+def calendar_pages_error_response(data):
+    """400 response for an unknown `calendarPages` in a request body, else None"""
+    calendar_pages = data.get('calendarPages')
+    if calendar_pages is None or calendar_pages in CALENDAR_PAGINATIONS:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f"Unknown calendarPages '{calendar_pages}'",
+        'calendarPages': list(CALENDAR_PAGINATIONS),
+    }), 400
+
+def format_error_response(data):
+    """400 response for an unknown `format` in a request body, else None"""
+    export_format = data.get('format')
+    if export_format is None or export_format == 'xlsx' or export_format in EVENT_EXPORT_FORMATS:
+        return None
+    return jsonify({
+        'success': False,
+        'error': f"Unknown format '{export_format}'",
+        'formats': ['xlsx', *EVENT_EXPORT_FORMATS],
+    }), 400
+
+def store_error_response(error):
+    return jsonify({'success': False, 'error': str(error)}), error.status
+
+def store_disabled_response():
+    """404 response when no event store is configured, else None"""
+    if event_store is not None:
+        return None
+    return jsonify({'success': False, 'error': 'Event store is not enabled'}), 404
+
+def load_stored_trip(calendar_id, trip_id, trip_data=None):
+    """calendarData for one trip of a stored calendar, and the trip itself
+    
+    Only events that start within the trip dates are read from the store;
+    the export's own date filtering then runs over just those.
+    """
+    calendar_fields = event_store.calendar_fields(calendar_id)
+    if trip_data is None:
+        trips = calendar_fields.get('trips') or []
+        trip_data = next((trip for trip in trips if isinstance(trip, dict) and str(trip.get('id')) == trip_id), None)
+        if trip_data is None:
+            raise StoreError("Unknown trip", status=404)
+    
+    generator = HolidayMooExcelGenerator()
+    first_day = generator.parse_datetime(trip_data.get('startDate', '2025-01-01')).date()
+    last_day = generator.parse_datetime(trip_data.get('endDate', '2025-01-02')).date()
+    events = event_store.events_between(calendar_id, first_day.isoformat(), last_day.isoformat())
+    return dict(calendar_fields, events=events), trip_data
+
+def snapshot_error_response(error):
+    body = {'success': False, 'error': str(error)}
+    if error.current_version is not None:
+        body['currentVersion'] = error.current_version
+    return jsonify(body), error.status
+
+def partition_events_by_trip(events, trip_ids):
+    """Group events by tripId in a single pass, keeping only the requested trips"""
+    partitions = {trip_id: [] for trip_id in trip_ids}
+    for event in events:
+        bucket = partitions.get(event.get('tripId'))
+        if bucket is not None:
+            bucket.append(event)
+    return partitions
+
+def render_trip_workbook(calendar_data, trip_data, streaming=None, engine=None, compression=None, calendar_pages=None):
+    """Render one trip of a batch; returns (filename, workbook bytes, seconds)"""
+    started = time.perf_counter()
+    generator = HolidayMooExcelGenerator(cache=workbook_cache, pool=render_pool)
+    excel_buffer, filename = generator.render_excel(
+        calendar_data, trip_data, streaming, engine=engine, compression=compression, calendar_pages=calendar_pages)
+    return filename, excel_buffer.getvalue(), time.perf_counter() - started
+
+def build_trip_archive(calendar_data, trip_ids, streaming=None, engine=None, compression=None, calendar_pages=None):
+    """Render several trips concurrently into one ZIP archive
+    
+    The calendar is parsed once and its events partitioned by trip; each
+    workbook only sees its own trip's events. Returns (zip_buffer, manifest),
+    where the manifest (also stored as manifest.json) carries per-trip
+    timings, sizes and any errors.
+    """
+    started = time.perf_counter()
+    trips_by_id = {trip.get('id'): trip for trip in calendar_data.get('trips', [])}
+    found_ids = [trip_id for trip_id in dict.fromkeys(trip_ids) if trip_id in trips_by_id]
+    
+    partitions = partition_events_by_trip(calendar_data.get('events', []), found_ids)
+    partition_seconds = time.perf_counter() - started
+    
+    manifest = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'trips': [],
+        'missing_trip_ids': [trip_id for trip_id in trip_ids if trip_id not in trips_by_id],
+        'timings': {'partition_seconds': round(partition_seconds, 4)},
+    }
+    
+    zip_buffer = io.BytesIO()
+    workers = max(1, min(BATCH_MAX_WORKERS, len(found_ids)))
+    with zipfile.ZipFile(zip_buffer, 'w') as archive, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for trip_id in found_ids:
+            trip_calendar = dict(calendar_data, events=partitions[trip_id])
+            # Run each render in a copy of the request context so log lines keep the request id
+            context = contextvars.copy_context()
+            futures.append(pool.submit(
+                context.run, render_trip_workbook, trip_calendar, trips_by_id[trip_id],
+                streaming, engine, compression, calendar_pages))
+        
+        used_names = set()
+        for trip_id, future in zip(found_ids, futures):
+            entry = {'trip_id': trip_id, 'name': trips_by_id[trip_id].get('name'), 'events': len(partitions[trip_id])}
+            try:
+                filename, data, seconds = future.result()
+            except Exception as e:
+                log.exception("Batch trip export failed", extra=fields(trip_id=trip_id))
+                entry.update(status='error', error=str(e))
+                manifest['trips'].append(entry)
+                continue
+            
+            # Trips can share a name; keep archive members unique
+            if filename in used_names:
+                filename = f"{filename[:-len('.xlsx')]}_{trip_id}.xlsx"
+            used_names.add(filename)
+            
+            # Workbooks are already deflated, so store them as-is
+            archive.writestr(filename, data, compress_type=zipfile.ZIP_STORED)
+            entry.update(status='ok', filename=filename, size=len(data), render_seconds=round(seconds, 4))
+            manifest['trips'].append(entry)
+        
+        manifest['timings']['workers'] = workers
+        manifest['timings']['total_seconds'] = round(time.perf_counter() - started, 4)
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2, ensure_ascii=False),
+                         compress_type=zipfile.ZIP_DEFLATED)
+    
+    zip_buffer.seek(0)
+    return zip_buffer, manifest
+
+def export_response(calendar_data, trip_data, data):
+    """Render one trip in the format and response type the request asked for"""
+    log.info("Processing export", extra=fields(
+        trip=trip_data.get('name', 'Unknown'),
+        start_date=trip_data.get('startDate'),
+        end_date=trip_data.get('endDate'),
+        total_events=len(calendar_data.get('events', [])),
+    ))
+    
+    # Sample event for debugging
+    if trace_enabled() and calendar_data.get('events'):
+        log.debug("Export payload", extra=fields(
+            calendar_keys=list(calendar_data.keys()),
+            trip_keys=list(trip_data.keys()),
+            sample_event=calendar_data['events'][0],
+        ))
+    
+    # Event rows only: stream them out without building a workbook
+    export_format = data.get('format')
+    if export_format in EVENT_EXPORT_FORMATS:
+        chunks, filename, mimetype = HolidayMooExcelGenerator().stream_event_export(
+            calendar_data, trip_data, export_format)
+        log.info("Event export streaming", extra=fields(filename=filename, format=export_format))
+        return send_stream(chunks, filename, mimetype)
+    
+    # Generate Excel
+    generator = HolidayMooExcelGenerator(cache=workbook_cache, pool=render_pool)
+    
+    # Clients that accept xlsx get the raw file; older clients keep the JSON/base64 form
+    if wants_binary_xlsx():
+        excel_buffer, filename = generator.render_excel(
+            calendar_data, trip_data, streaming=data.get('streaming'), engine=data.get('engine'),
+            compression=data.get('compression'), calendar_pages=data.get('calendarPages'))
+        log.info("Excel generated", extra=fields(filename=filename, response='binary'))
+        with export_metrics.stage('response'):
+            return send_xlsx(excel_buffer, filename)
+    
+    result = generator.generate_excel(
+        calendar_data, trip_data, streaming=data.get('streaming'), engine=data.get('engine'),
+        compression=data.get('compression'), calendar_pages=data.get('calendarPages'))
+    
+    log.info("Excel generated", extra=fields(filename=result['filename'], size=result['size'], response='json'))
+    with export_metrics.stage('response'):
+        return jsonify(result)
+
 # Flask routes
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'Holiday Moo Local Export'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'Holiday Moo Local Export',
+        'accepts': {'encodings': request_encodings(), 'contentTypes': request_content_types()},
+    })
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(workbook_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return metrics_response()
+
+@app.route('/render-stats', methods=['GET'])
+def render_stats():
+    return jsonify({**render_pool.stats(), 'jobs': export_jobs.stats()})
+
+@app.route('/export-template', methods=['GET'])
+def download_export_template():
+    """Static sheet content as an .xlsx, to brand and serve via HOLIDAYMOO_TEMPLATE_PATH"""
+    HolidayMooExcelGenerator()
+    buffer = io.BytesIO()
+    export_template.save(buffer)
+    return send_xlsx(buffer, 'holiday-moo-template.xlsx')
+
+@app.route('/calendars', methods=['POST'])
+def create_calendar_snapshot():
+    try:
+        with export_metrics.stage('decode_json'):
+            data = decode_request_body()
+    except RequestBodyError as e:
+        return request_body_error_response(e)
+    export_metrics.observe_export(payload_bytes=request.content_length)
+    
+    if not data or not isinstance(data.get('calendarData'), dict):
+        return jsonify({'success': False, 'error': 'Missing required data'}), 400
+    
+    try:
+        snapshot = calendar_snapshots.create(data['calendarData'])
+    except SnapshotError as e:
+        return snapshot_error_response(e)
+    return jsonify({'success': True, **snapshot.summary()}), 201
+
+@app.route('/calendars/<calendar_id>', methods=['GET'])
+def get_calendar_snapshot(calendar_id):
+    try:
+        snapshot = calendar_snapshots.get(calendar_id)
+    except SnapshotError as e:
+        return snapshot_error_response(e)
+    return jsonify({'success': True, **snapshot.summary()})
+
+@app.route('/calendars/<calendar_id>', methods=['PATCH'])
+def patch_calendar_snapshot(calendar_id):
+    try:
+        with export_metrics.stage('decode_json'):
+            delta = decode_request_body()
+    except RequestBodyError as e:
+        return request_body_error_response(e)
+    export_metrics.observe_export(payload_bytes=request.content_length)
+    
+    if not isinstance(delta, dict):
+        return jsonify({'success': False, 'error': 'Missing required data'}), 400
+    
+    try:
+        snapshot = calendar_snapshots.apply_delta(calendar_id, delta)
+    except SnapshotError as e:
+        return snapshot_error_response(e)
+    return jsonify({'success': True, **snapshot.summary()})
 
 @app.route('/export-trip', methods=['POST'])
+@export_metrics.track_export('export_trip')
 def export_trip():
     try:
-        data = request.get_json()
+        try:
+            with export_metrics.stage('decode_json'):
+                # Only the trip's events are kept; the rest of calendarData is skipped
+                data = decode_trip_request(HolidayMooExcelGenerator().trip_event_filter, calendar_keys=())
+        except RequestBodyError as e:
+            return request_body_error_response(e)
+        export_metrics.observe_export(payload_bytes=request.content_length)
+        
+        try:
+            calendar_data = resolve_calendar_data(data) if data else None
+        except SnapshotError as e:
+            return snapshot_error_response(e)
         
-        if not data or 'calendarData' not in data or 'tripData' not in data:
+        if calendar_data is None or 'tripData' not in data:
             return jsonify({'success': False, 'error': 'Missing required data'}), 400
         
-        calendar_data = data['calendarData']
-        trip_data = data['tripData']
-        
-        # Debug logging
-        print(f"📊 Processing export for trip: {trip_data.get('name', 'Unknown')}")
-        print(f"📅 Trip dates: {trip_data.get('startDate')} to {trip_data.get('endDate')}")
-        print(f"📋 Total events: {len(calendar_data.get('events', []))}")
-        print(f"📄 Calendar data keys: {list(calendar_data.keys())}")
-        print(f"🎯 Trip data keys: {list(trip_data.keys())}")
-        
-        # Sample event for debugging
-        if calendar_data.get('events'):
-            sample_event = calendar_data['events'][0]
-            print(f"🔍 Sample event keys: {list(sample_event.keys())}")
-            print(f"🔍 Sample event startTime RAW: {repr(sample_event.get('startTime', 'No startTime'))}")
-            print(f"🔍 Sample event endTime RAW: {repr(sample_event.get('endTime', 'No endTime'))}")
-            
-            # Test time extraction on sample event
-            generator = HolidayMooExcelGenerator()
-            if sample_event.get('startTime'):
-                hour, minute = generator.extract_local_time(sample_event['startTime'])
-                print(f"🕐 Extracted start time: {hour:02d}:{minute:02d}")
-            
-            print(f"🔍 Sample event title: {sample_event.get('title', 'No title')}")
-            print(f"🔍 Sample event name: {sample_event.get('name', 'No name')}")
-            print(f"🔍 Sample event description: {sample_event.get('description', 'No description')}")
-            print(f"🔍 Sample event location type: {type(sample_event.get('location'))}")
-            print(f"🔍 Sample event location: {sample_event.get('location', 'No location')}")
-            print(f"🔍 Sample event cost: {sample_event.get('cost', sample_event.get('estimatedCost', 'No cost'))}")
-            print(f"🔍 Full sample event: {sample_event}")
-        
-        # Generate Excel
-        generator = HolidayMooExcelGenerator()
-        result = generator.generate_excel(calendar_data, trip_data)
-        
-        print(f"✅ Excel generated successfully: {result['filename']}")
-        return jsonify(result)
+        option_error = (engine_error_response(data) or compression_error_response(data)
+                        or calendar_pages_error_response(data) or format_error_response(data))
+        if option_error:
+            return option_error
+        
+        return export_response(calendar_data, data['tripData'], data)
+        
+    except Exception as e:
+        log.exception("Export error")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/export-trip/<trip_id>', methods=['POST'])
+@export_metrics.track_export('export_stored_trip')
+def export_stored_trip(trip_id):
+    """Export one trip of a calendar kept in the event store
+    
+    The body (all optional) takes the same options as /export-trip, the
+    stored calendar's `calendarId` (or ?calendarId=) and a `tripData` to use
+    instead of the stored trip, whose id must match the URL's.
+    """
+    disabled = store_disabled_response()
+    if disabled:
+        return disabled
+    
+    try:
+        try:
+            with export_metrics.stage('decode_json'):
+                data = decode_request_body() or {}
+        except RequestBodyError as e:
+            return request_body_error_response(e)
+        
+        calendar_id = data.get('calendarId') or request.args.get('calendarId')
+        if not calendar_id:
+            return jsonify({'success': False, 'error': 'Missing calendarId'}), 400
+        
+        option_error = (engine_error_response(data) or compression_error_response(data)
+                        or calendar_pages_error_response(data) or format_error_response(data))
+        if option_error:
+            return option_error
+        
+        if data.get('tripData') is not None and (
+                not isinstance(data['tripData'], dict) or str(data['tripData'].get('id')) != trip_id):
+            return jsonify({'success': False, 'error': 'tripData must be an object with the id of the trip in the URL'}), 400
+        
+        try:
+            with export_metrics.stage('load_events'):
+                calendar_data, trip_data = load_stored_trip(calendar_id, trip_id, data.get('tripData'))
+        except StoreError as e:
+            return store_error_response(e)
+        
+        return export_response(calendar_data, trip_data, data)
+        
+    except Exception as e:
+        log.exception("Export error")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/stored-calendars/<calendar_id>', methods=['PUT'])
+def put_stored_calendar(calendar_id):
+    """Store a whole calendar (`calendarData`) under calendar_id, replacing any previous copy"""
+    disabled = store_disabled_response()
+    if disabled:
+        return disabled
+    
+    try:
+        with export_metrics.stage('decode_json'):
+            data = decode_request_body()
+    except RequestBodyError as e:
+        return request_body_error_response(e)
+    export_metrics.observe_export(payload_bytes=request.content_length)
+    
+    if not data or not isinstance(data.get('calendarData'), dict):
+        return jsonify({'success': False, 'error': 'Missing required data'}), 400
+    
+    try:
+        summary, created = event_store.put_calendar(calendar_id, data['calendarData'])
+    except StoreError as e:
+        return store_error_response(e)
+    return jsonify({'success': True, **summary}), 201 if created else 200
+
+@app.route('/stored-calendars/<calendar_id>/events', methods=['POST'])
+def upsert_stored_events(calendar_id):
+    """Add or replace `events` by id, delete `removed` ids and update top-level `fields`"""
+    disabled = store_disabled_response()
+    if disabled:
+        return disabled
+    
+    try:
+        with export_metrics.stage('decode_json'):
+            data = decode_request_body()
+    except RequestBodyError as e:
+        return request_body_error_response(e)
+    export_metrics.observe_export(payload_bytes=request.content_length)
+    
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Missing required data'}), 400
+    
+    try:
+        summary = event_store.upsert_events(
+            calendar_id, data.get('events') or [], data.get('removed') or [], data.get('fields'))
+    except StoreError as e:
+        return store_error_response(e)
+    return jsonify({'success': True, **summary})
+
+@app.route('/stored-calendars/<calendar_id>', methods=['GET'])
+def get_stored_calendar(calendar_id):
+    disabled = store_disabled_response()
+    if disabled:
+        return disabled
+    
+    try:
+        return jsonify({'success': True, **event_store.summary(calendar_id)})
+    except StoreError as e:
+        return store_error_response(e)
+
+@app.route('/stored-calendars/<calendar_id>', methods=['DELETE'])
+def delete_stored_calendar(calendar_id):
+    disabled = store_disabled_response()
+    if disabled:
+        return disabled
+    
+    try:
+        event_store.delete_calendar(calendar_id)
+    except StoreError as e:
+        return store_error_response(e)
+    return jsonify({'success': True, 'calendarId': calendar_id})
+
+@app.route('/export-jobs', methods=['POST'])
+@export_metrics.track_export('export_jobs')
+def create_export_job():
+    try:
+        with export_metrics.stage('decode_json'):
+            data = decode_request_body()
+    except RequestBodyError as e:
+        return request_body_error_response(e)
+    export_metrics.observe_export(payload_bytes=request.content_length)
+    
+    try:
+        calendar_data = resolve_calendar_data(data) if data else None
+    except SnapshotError as e:
+        return snapshot_error_response(e)
+    
+    if calendar_data is None or 'tripData' not in data:
+        return jsonify({'success': False, 'error': 'Missing required data'}), 400
+    
+    option_error = (engine_error_response(data) or compression_error_response(data)
+                    or calendar_pages_error_response(data))
+    if option_error:
+        return option_error
+    
+    job = export_jobs.submit(
+        run_export_job, calendar_data, data['tripData'], data.get('streaming'), data.get('engine'),
+        data.get('compression'), data.get('calendarPages'))
+    if job is None:
+        response = jsonify({'success': False, 'error': 'Export queue is full, try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    response = jsonify({'success': True, **job.snapshot(export_jobs.result_ttl)})
+    response.headers['Location'] = f"/export-jobs/{job.id}"
+    return response, 202
+
+@app.route('/export-jobs/<job_id>', methods=['GET'])
+def export_job_status(job_id):
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired export job'}), 404
+    return jsonify({'success': True, **job.snapshot(export_jobs.result_ttl)})
+
+@app.route('/export-jobs/<job_id>/result', methods=['GET'])
+def export_job_result(job_id):
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired export job'}), 404
+    
+    if job.state == FAILED:
+        return jsonify({'success': False, 'error': job.error, 'state': job.state}), 500
+    if job.state != DONE:
+        return jsonify({'success': False, 'error': 'Export job has not finished', 'state': job.state}), 409
+    
+    if wants_binary_xlsx():
+        return send_xlsx(io.BytesIO(job.data), job.filename)
+    return jsonify(HolidayMooExcelGenerator().excel_payload(io.BytesIO(job.data), job.filename))
+
+@app.route('/export-trips', methods=['POST'])
+@export_metrics.track_export('export_trips')
+def export_trips():
+    try:
+        try:
+            with export_metrics.stage('decode_json'):
+                data = decode_request_body()
+        except RequestBodyError as e:
+            return request_body_error_response(e)
+        export_metrics.observe_export(payload_bytes=request.content_length)
+        
+        try:
+            calendar_data = resolve_calendar_data(data) if data else None
+        except SnapshotError as e:
+            return snapshot_error_response(e)
+        
+        if calendar_data is None or not isinstance(data.get('tripIds'), list) or not data['tripIds']:
+            return jsonify({'success': False, 'error': 'Missing required data'}), 400
+        
+        option_error = (engine_error_response(data) or compression_error_response(data)
+                        or calendar_pages_error_response(data))
+        if option_error:
+            return option_error
+        
+        trip_ids = data['tripIds']
+        
+        log.info("Processing batch export", extra=fields(
+            trips=len(trip_ids),
+            total_events=len(calendar_data.get('events', [])),
+        ))
+        
+        zip_buffer, manifest = build_trip_archive(
+            calendar_data, trip_ids, streaming=data.get('streaming'), engine=data.get('engine'),
+            compression=data.get('compression'), calendar_pages=data.get('calendarPages'))
+        
+        if not manifest['trips']:
+            return jsonify({'success': False, 'error': 'No matching trips', 'missing_trip_ids': manifest['missing_trip_ids']}), 404
+        
+        filename = f"HolidayMoo_trips_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        log.info("Batch archive generated", extra=fields(
+            filename=filename,
+            size=zip_buffer.getbuffer().nbytes,
+            **manifest['timings'],
+        ))
+        return send_zip(zip_buffer, filename)
         
     except Exception as e:
-        print(f"❌ Export error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Batch export error")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 if __name__ == '__main__':
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Process pool for workbook rendering
+
+Building a workbook is pure-Python CPU work, so request threads serialise on
+the GIL. A RenderPool runs render functions in warm worker processes instead;
+each worker imports the service module once and runs its warm-up hook, so
+openpyxl and the style definitions are loaded before the first job arrives.
+
+Environment:
+- HOLIDAYMOO_RENDER_WORKERS: worker processes (default 0 renders inline in
+  the request thread; 'auto' uses one worker per CPU)
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from exportLogging import fields, get_logger
+
+log = get_logger('render_pool')
+
+
+def _timed_call(fn, args):
+    # Runs in the worker: report which process did the work and for how long
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, os.getpid(), time.perf_counter() - started
+
+
+class RenderPool:
+    def __init__(self, workers=0, initializer=None):
+        self.workers = workers
+        self.initializer = initializer
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._worker_stats = {}
+
+        self.counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'pool_restarts': 0,
+        }
+
+    @classmethod
+    def from_env(cls, initializer=None):
+        """Build a pool from HOLIDAYMOO_RENDER_WORKERS"""
+        setting = os.environ.get('HOLIDAYMOO_RENDER_WORKERS', '0').strip().lower()
+        workers = (os.cpu_count() or 1) if setting == 'auto' else int(setting or 0)
+        return cls(workers=max(0, workers), initializer=initializer)
+
+    @property
+    def backend(self):
+        return 'process' if self.workers > 0 else 'inline'
+
+    @property
+    def uses_workers(self):
+        """Whether jobs leave this process; inline pools are better skipped by callers"""
+        return self.workers > 0
+
+    def run(self, fn, *args):
+        """Call fn(*args) on a worker and wait for the result.
+
+        fn and its arguments must be picklable (module-level functions and
+        plain JSON data). With no workers configured the call runs inline.
+        """
+        with self._lock:
+            self.counters['submitted'] += 1
+            self._inflight += 1
+
+        try:
+            if self.workers > 0:
+                result, pid, busy = self._submit(fn, args).result()
+            else:
+                result, pid, busy = _timed_call(fn, args)
+        except Exception as e:
+            with self._lock:
+                self._inflight -= 1
+                self.counters['failed'] += 1
+            if isinstance(e, BrokenProcessPool):
+                self._discard_broken_pool()
+            raise
+
+        self._completed(pid, busy)
+        return result
+
+    def run_all(self, calls):
+        """Call each fn(*args) of `calls` on the workers at once; results come back in order.
+
+        With no workers configured the calls run inline, one after another.
+        If one call fails, the calls still queued behind it are cancelled.
+        """
+        if self.workers <= 0:
+            return [self.run(fn, *args) for fn, *args in calls]
+
+        with self._lock:
+            self.counters['submitted'] += len(calls)
+            self._inflight += len(calls)
+
+        futures = [self._submit(fn, args) for fn, *args in calls]
+        results = []
+        try:
+            for future in futures:
+                result, pid, busy = future.result()
+                self._completed(pid, busy)
+                results.append(result)
+        except Exception as e:
+            for future in futures[len(results):]:
+                future.cancel()
+            with self._lock:
+                self._inflight -= len(calls) - len(results)
+                self.counters['failed'] += len(calls) - len(results)
+            if isinstance(e, BrokenProcessPool):
+                self._discard_broken_pool()
+            raise
+        return results
+
+    def stats(self):
+        """Snapshot of pool size, queue length and per-worker busy time"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['backend'] = self.backend
+            stats['workers'] = self.workers
+            stats['in_flight'] = self._inflight
+            # Jobs beyond the worker count are waiting in the executor's queue
+            stats['queued'] = max(0, self._inflight - self.workers) if self.workers > 0 else 0
+            stats['per_worker'] = {
+                str(pid): {'jobs': worker['jobs'], 'busy_seconds': round(worker['busy_seconds'], 4)}
+                for pid, worker in self._worker_stats.items()
+            }
+        return stats
+
+    def shutdown(self):
+        """Stop the worker processes; the pool restarts on the next job"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _completed(self, pid, busy):
+        with self._lock:
+            self._inflight -= 1
+            self.counters['completed'] += 1
+            worker = self._worker_stats.setdefault(pid, {'jobs': 0, 'busy_seconds': 0.0})
+            worker['jobs'] += 1
+            worker['busy_seconds'] += busy
+
+    def _submit(self, fn, args):
+        with self._lock:
+            if self._executor is None:
+                # Created lazily so importing the service in a worker never
+                # starts a nested pool. Spawned workers avoid forking a
+                # process that already has server threads running.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=self.initializer,
+                )
+                log.info("Render pool started", extra=fields(workers=self.workers))
+            executor = self._executor
+
+        return executor.submit(_timed_call, fn, args)
+
+    def _discard_broken_pool(self):
+        # A worker died and took the executor with it; the next job starts a fresh pool
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if executor is None:
+                return
+            self.counters['pool_restarts'] += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        log.warning("Render pool broken, restarting")
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Direct SpreadsheetML writer
+
+A small stand-in for the part of the openpyxl Workbook/Worksheet API the
+export sheets use: cell(), ws['A1'], merge_cells(), column and row
+dimensions, and font/fill/border/alignment/hyperlink on cells. Cells are
+plain slot objects and the package parts are written straight to the zip
+as XML text, without building openpyxl cells or an element tree.
+
+Style values are still openpyxl Font/PatternFill/Border/Alignment objects;
+each distinct one is serialised once per workbook. Strings are written
+inline, as openpyxl does, so the saved workbooks read back the same.
+
+Sheets can also be serialised on their own (SheetPart), in another process,
+and packaged later: their cell style indices are renumbered against the
+workbook's style table when it is saved.
+"""
+
+import re
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Border
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fills import DEFAULT_EMPTY_FILL, DEFAULT_GRAY_FILL
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string, range_boundaries
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.writer.theme import theme_xml
+from openpyxl.xml.functions import tostring
+
+from workbookCompression import package_archive
+
+SHEET_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# Longest string a cell can hold
+MAX_STRING_LENGTH = 32767
+
+_EDGES = ('top', 'left', 'right', 'bottom')
+
+# Style attribute of a cell element; text is escaped, so this never matches values
+_CELL_STYLE_PATTERN = re.compile(r'(<c r="[A-Z]+[0-9]+") s="([0-9]+)"')
+
+
+class DirectCell:
+    __slots__ = ('parent', 'row', 'column', '_value', 'style', 'hyperlink')
+
+    def __init__(self, parent, row, column):
+        self.parent = parent
+        self.row = row
+        self.column = column
+        self._value = None
+        self.style = None       # (font, fill, border, alignment) or None for the default
+        self.hyperlink = None   # External link target
+
+    @property
+    def coordinate(self):
+        return f"{get_column_letter(self.column)}{self.row}"
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if isinstance(value, str):
+            value = value[:MAX_STRING_LENGTH]
+            if ILLEGAL_CHARACTERS_RE.search(value):
+                raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+        elif value is not None and not isinstance(value, (int, float)):
+            raise ValueError(f"Cannot convert {value!r} to Excel")
+        self._value = value
+
+    def _style_part(self, index, default):
+        return self.style[index] or default if self.style else default
+
+    def _set_style_part(self, index, value):
+        style = list(self.style or (None, None, None, None))
+        style[index] = value
+        self.style = tuple(style)
+
+    font = property(lambda self: self._style_part(0, DEFAULT_FONT),
+                    lambda self, value: self._set_style_part(0, value))
+    fill = property(lambda self: self._style_part(1, DEFAULT_EMPTY_FILL),
+                    lambda self, value: self._set_style_part(1, value))
+    border = property(lambda self: self._style_part(2, DEFAULT_BORDER),
+                      lambda self, value: self._set_style_part(2, value))
+    alignment = property(lambda self: self._style_part(3, None),
+                         lambda self, value: self._set_style_part(3, value))
+
+
+class _Dimension:
+    __slots__ = ('width', 'height')
+
+    def __init__(self):
+        self.width = None
+        self.height = None
+
+
+class _Dimensions(dict):
+    def __missing__(self, key):
+        dimension = self[key] = _Dimension()
+        return dimension
+
+
+class DirectWorksheet:
+    def __init__(self, parent, title):
+        self.parent = parent
+        self.title = title
+        self.column_dimensions = _Dimensions()  # Column letter -> width
+        self.row_dimensions = _Dimensions()     # Row number -> height
+        self._cells = {}
+        self._merges = []
+
+    def cell(self, row, column, value=None):
+        cell = self._cells.get((row, column))
+        if cell is None:
+            cell = self._cells[(row, column)] = DirectCell(self, row, column)
+        if value is not None:
+            cell.value = value
+        return cell
+
+    def __getitem__(self, coordinate):
+        column, row = coordinate_from_string(coordinate)
+        return self.cell(row, column_index_from_string(column))
+
+    def merge_cells(self, range_string=None, start_row=None, start_column=None, end_row=None, end_column=None):
+        """Merge a range; like openpyxl, covered cells lose their values and
+        the edges take the top-left cell's border"""
+        if range_string is not None:
+            start_column, start_row, end_column, end_row = range_boundaries(range_string)
+        self._merges.append((start_row, start_column, end_row, end_column))
+
+        for row in range(start_row, end_row + 1):
+            for column in range(start_column, end_column + 1):
+                cell = self._cells.get((row, column))
+                if cell is not None and (row, column) != (start_row, start_column):
+                    cell._value = None
+
+        anchor = self._cells.get((start_row, start_column))
+        if anchor is None or not anchor.style or not anchor.style[2]:
+            return
+        edges = {
+            'top': [(start_row, column) for column in range(start_column, end_column + 1)],
+            'bottom': [(end_row, column) for column in range(start_column, end_column + 1)],
+            'left': [(row, start_column) for row in range(start_row, end_row + 1)],
+            'right': [(row, end_column) for row in range(start_row, end_row + 1)],
+        }
+        for edge in _EDGES:
+            side = getattr(anchor.border, edge)
+            if side is None or side.style is None:
+                continue
+            for row, column in edges[edge]:
+                cell = self.cell(row, column)
+                sides = {name: getattr(cell.border, name) for name in _EDGES}
+                sides[edge] = side
+                cell.border = Border(**sides)
+
+
+class SheetPart:
+    """A worksheet serialised on its own, with the cell formats its XML refers to"""
+    __slots__ = ('title', 'xml', 'links', 'styles')
+
+    def __init__(self, title, xml, links, styles):
+        self.title = title
+        self.xml = xml          # Sheet XML, not tab-selected
+        self.links = links      # (ref, target) hyperlinks
+        self.styles = styles    # Style tuple of each s="" index in xml
+
+    def renumbered(self, styles, selected):
+        """Sheet XML and hyperlinks with style indices from a workbook's table"""
+        indices = [styles.index(style) for style in self.styles]
+        xml = self.xml
+        if any(xf != local for local, xf in enumerate(indices)):
+            xml = _CELL_STYLE_PATTERN.sub(lambda match: f'{match[1]} s="{indices[int(match[2])]}"', xml)
+        if selected:
+            xml = xml.replace('<sheetView workbookViewId="0">', '<sheetView tabSelected="1" workbookViewId="0">', 1)
+        return xml, self.links
+
+
+class DirectWorkbook:
+    """Workbook written straight to SpreadsheetML; starts with no sheets"""
+
+    def __init__(self):
+        self.worksheets = []    # DirectWorksheet or SheetPart
+
+    def create_sheet(self, title, index=None):
+        ws = DirectWorksheet(self, title)
+        if index is None:
+            self.worksheets.append(ws)
+        else:
+            self.worksheets.insert(index, ws)
+        return ws
+
+    def sheet_parts(self):
+        """Serialise each sheet on its own, to be packaged by another workbook"""
+        parts = []
+        for ws in self.worksheets:
+            styles = _StyleTable()
+            sheet_xml, links = _worksheet_xml(ws, styles, selected=False)
+            parts.append(SheetPart(ws.title, sheet_xml, links, styles.styles()))
+        return parts
+
+    def add_sheet_part(self, part):
+        """Append a sheet serialised by sheet_parts(), possibly in another process"""
+        self.worksheets.append(part)
+        return part
+
+    def save(self, filename, compression='default'):
+        """Write the package to a path or binary file object at a COMPRESSION_LEVELS level"""
+        styles = _StyleTable()
+        with package_archive(filename, compression) as archive:
+            archive.writestr('docProps/app.xml', _app_xml())
+            archive.writestr('docProps/core.xml', _core_xml())
+            archive.writestr('xl/theme/theme1.xml', theme_xml)
+            for number, ws in enumerate(self.worksheets, 1):
+                if isinstance(ws, SheetPart):
+                    sheet_xml, links = ws.renumbered(styles, selected=number == 1)
+                else:
+                    sheet_xml, links = _worksheet_xml(ws, styles, selected=number == 1)
+                archive.writestr(f'xl/worksheets/sheet{number}.xml', sheet_xml)
+                if links:
+                    archive.writestr(f'xl/worksheets/_rels/sheet{number}.xml.rels', _hyperlink_rels(links))
+            archive.writestr('xl/styles.xml', styles.xml())
+            archive.writestr('_rels/.rels', _root_rels())
+            archive.writestr('xl/workbook.xml', _workbook_xml(self.worksheets))
+            archive.writestr('xl/_rels/workbook.xml.rels', _workbook_rels(len(self.worksheets)))
+            archive.writestr('[Content_Types].xml', _content_types(len(self.worksheets)))
+
+
+class _StyleTable:
+    """Distinct fonts, fills, borders and cell formats of one workbook"""
+
+    def __init__(self):
+        self.fonts = {DEFAULT_FONT: 0}
+        self.fills = {DEFAULT_EMPTY_FILL: 0, DEFAULT_GRAY_FILL: 1}
+        self.borders = {DEFAULT_BORDER: 0}
+        self.xfs = {(0, 0, 0, None): 0}
+        self._by_style = {None: 0}
+        # Named styles share one tuple across many cells, and hashing openpyxl
+        # style objects is slow, so look tuples up by identity first. The
+        # cells keep every tuple alive for as long as the table is used.
+        self._by_id = {}
+
+    def index(self, style):
+        """cellXfs index for a cell's style tuple"""
+        xf = self._by_id.get(id(style))
+        if xf is not None:
+            return xf
+        xf = self._by_style.get(style)
+        if xf is None:
+            font, fill, border, alignment = style
+            key = (
+                self._part(self.fonts, font),
+                self._part(self.fills, fill),
+                self._part(self.borders, border),
+                alignment,
+            )
+            xf = self.xfs.get(key)
+            if xf is None:
+                xf = self.xfs[key] = len(self.xfs)
+            self._by_style[style] = xf
+        self._by_id[id(style)] = xf
+        return xf
+
+    def styles(self):
+        """Style tuple of each cellXfs index, in index order"""
+        fonts, fills, borders = list(self.fonts), list(self.fills), list(self.borders)
+        return [(fonts[font_id], fills[fill_id], borders[border_id], alignment)
+                for font_id, fill_id, border_id, alignment in self.xfs]
+
+    @staticmethod
+    def _part(table, value):
+        if value is None:
+            return 0
+        index = table.get(value)
+        if index is None:
+            index = table[value] = len(table)
+        return index
+
+    def xml(self):
+        def serialise(items):
+            return ''.join(tostring(item.to_tree()).decode('utf-8') for item in items)
+
+        xfs = []
+        for font_id, fill_id, border_id, alignment in self.xfs:
+            attrs = f'numFmtId="0" fontId="{font_id}" fillId="{fill_id}" borderId="{border_id}"'
+            if alignment is None:
+                xfs.append(f'<xf {attrs} xfId="0"/>')
+            else:
+                xfs.append(f'<xf {attrs} applyAlignment="1" xfId="0">{serialise([alignment])}</xf>')
+
+        return (
+            f'{XML_DECLARATION}<styleSheet xmlns="{SHEET_MAIN_NS}">'
+            f'<fonts count="{len(self.fonts)}">{serialise(self.fonts)}</fonts>'
+            f'<fills count="{len(self.fills)}">{serialise(self.fills)}</fills>'
+            f'<borders count="{len(self.borders)}">{serialise(self.borders)}</borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '<tableStyles count="0" defaultTableStyle="TableStyleMedium9" defaultPivotStyle="PivotStyleLight16"/>'
+            '</styleSheet>'
+        )
+
+
+def _cell_xml(cell, ref, xf):
+    style = f' s="{xf}"' if xf else ''
+    value = cell._value
+    if value is None:
+        return f'<c r="{ref}"{style}/>'
+    if value is True or value is False:
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{style} t="n"><v>{value!r}</v></c>'
+    if value == '':
+        return f'<c r="{ref}"{style} t="inlineStr"/>'
+    if value.startswith('=') and len(value) > 1:
+        return f'<c r="{ref}"{style}><f>{escape(value[1:])}</f><v/></c>'
+    space = ' xml:space="preserve"' if value.strip() != value else ''
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(value)}</t></is></c>'
+
+
+def _worksheet_xml(ws, styles, selected):
+    """Sheet XML and the (ref, target) hyperlinks it uses"""
+    rows = {}
+    for (row, column), cell in ws._cells.items():
+        rows.setdefault(row, []).append((column, cell))
+    heights = {row: dimension.height for row, dimension in ws.row_dimensions.items()
+               if dimension.height is not None}
+
+    if ws._cells:
+        columns = [column for _, column in ws._cells]
+        dimension = (f"{get_column_letter(min(columns))}{min(rows)}:"
+                     f"{get_column_letter(max(columns))}{max(rows)}")
+    else:
+        dimension = 'A1:A1'
+
+    selected_attr = ' tabSelected="1"' if selected else ''
+    parts = [
+        f'{XML_DECLARATION}<worksheet xmlns="{SHEET_MAIN_NS}" xmlns:r="{REL_NS}">',
+        f'<dimension ref="{dimension}"/>',
+        f'<sheetViews><sheetView{selected_attr} workbookViewId="0">'
+        '<selection activeCell="A1" sqref="A1"/></sheetView></sheetViews>',
+        '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>',
+    ]
+
+    widths = sorted(
+        (column_index_from_string(letter), dimension.width)
+        for letter, dimension in ws.column_dimensions.items() if dimension.width is not None
+    )
+    if widths:
+        parts.append('<cols>')
+        parts.extend(f'<col min="{column}" max="{column}" width="{width!r}" customWidth="1"/>'
+                     for column, width in widths)
+        parts.append('</cols>')
+
+    links = []
+    parts.append('<sheetData>')
+    for row in sorted(rows.keys() | heights.keys()):
+        height = heights.get(row)
+        attrs = f' ht="{height!r}" customHeight="1"' if height is not None else ''
+        cells = rows.get(row)
+        if not cells:
+            parts.append(f'<row r="{row}"{attrs}/>')
+            continue
+        parts.append(f'<row r="{row}"{attrs}>')
+        for column, cell in sorted(cells, key=lambda item: item[0]):
+            ref = f"{get_column_letter(column)}{row}"
+            parts.append(_cell_xml(cell, ref, styles.index(cell.style)))
+            if cell.hyperlink:
+                links.append((ref, cell.hyperlink))
+        parts.append('</row>')
+    parts.append('</sheetData>')
+
+    if ws._merges:
+        parts.append(f'<mergeCells count="{len(ws._merges)}">')
+        parts.extend(
+            f'<mergeCell ref="{get_column_letter(c1)}{r1}:{get_column_letter(c2)}{r2}"/>'
+            for r1, c1, r2, c2 in ws._merges
+        )
+        parts.append('</mergeCells>')
+
+    if links:
+        parts.append('<hyperlinks>')
+        parts.extend(f'<hyperlink ref="{ref}" r:id="rId{i}"/>' for i, (ref, _) in enumerate(links, 1))
+        parts.append('</hyperlinks>')
+
+    parts.append('<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/>')
+    parts.append('</worksheet>')
+    return ''.join(parts), links
+
+
+def _hyperlink_rels(links):
+    relationships = ''.join(
+        f'<Relationship Id="rId{i}" Type="{REL_NS}/hyperlink" Target={quoteattr(target)} TargetMode="External"/>'
+        for i, (_, target) in enumerate(links, 1)
+    )
+    return f'{XML_DECLARATION}<Relationships xmlns="{PACKAGE_REL_NS}">{relationships}</Relationships>'
+
+
+def _workbook_xml(worksheets):
+    sheets = ''.join(
+        f'<sheet name={quoteattr(ws.title)} sheetId="{i}" r:id="rId{i}"/>'
+        for i, ws in enumerate(worksheets, 1)
+    )
+    return (
+        f'{XML_DECLARATION}<workbook xmlns="{SHEET_MAIN_NS}" xmlns:r="{REL_NS}">'
+        '<workbookPr/><bookViews><workbookView activeTab="0"/></bookViews>'
+        f'<sheets>{sheets}</sheets><calcPr calcId="124519" fullCalcOnLoad="1"/></workbook>'
+    )
+
+
+def _workbook_rels(sheet_count):
+    relationships = [
+        f'<Relationship Id="rId{i}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, sheet_count + 1)
+    ]
+    relationships.append(f'<Relationship Id="rId{sheet_count + 1}" Type="{REL_NS}/styles" Target="styles.xml"/>')
+    relationships.append(f'<Relationship Id="rId{sheet_count + 2}" Type="{REL_NS}/theme" Target="theme/theme1.xml"/>')
+    return f'{XML_DECLARATION}<Relationships xmlns="{PACKAGE_REL_NS}">{"".join(relationships)}</Relationships>'
+
+
+def _root_rels():
+    return (
+        f'{XML_DECLARATION}<Relationships xmlns="{PACKAGE_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        f'<Relationship Id="rId2" Type="{PACKAGE_REL_NS}/metadata/core-properties" Target="docProps/core.xml"/>'
+        f'<Relationship Id="rId3" Type="{REL_NS}/extended-properties" Target="docProps/app.xml"/>'
+        '</Relationships>'
+    )
+
+
+def _content_types(sheet_count):
+    overrides = [
+        ('/xl/workbook.xml', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml'),
+        ('/xl/styles.xml', 'application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml'),
+        ('/xl/theme/theme1.xml', 'application/vnd.openxmlformats-officedocument.theme+xml'),
+        ('/docProps/core.xml', 'application/vnd.openxmlformats-package.core-properties+xml'),
+        ('/docProps/app.xml', 'application/vnd.openxmlformats-officedocument.extended-properties+xml'),
+    ]
+    overrides.extend(
+        (f'/xl/worksheets/sheet{i}.xml', 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml')
+        for i in range(1, sheet_count + 1)
+    )
+    return (
+        f'{XML_DECLARATION}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        + ''.join(f'<Override PartName="{name}" ContentType="{content_type}"/>' for name, content_type in overrides)
+        + '</Types>'
+    )
+
+
+def _core_xml():
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return (
+        f'{XML_DECLARATION}<cp:coreProperties '
+        'xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        '<dc:creator>Holiday Moo</dc:creator>'
+        f'<dcterms:created xsi:type="dcterms:W3CDTF">{now}</dcterms:created>'
+        f'<dcterms:modified xsi:type="dcterms:W3CDTF">{now}</dcterms:modified>'
+        '</cp:coreProperties>'
+    )
+
+
+def _app_xml():
+    return (
+        f'{XML_DECLARATION}<Properties '
+        'xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+        '<Application>Holiday Moo</Application></Properties>'
+    )
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Regression tests for handing render pool stage timings back through exportMetrics
+
+Run from src/services with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exportMetrics import STAGE_SECONDS, ServiceMetrics  # noqa: E402
+
+
+def stage_count(service, stage):
+    series = STAGE_SECONDS._values.get(STAGE_SECONDS._key({'service': service, 'stage': stage}))
+    return series['count'] if series else 0
+
+
+class CollectStagesTest(unittest.TestCase):
+    def test_collects_only_inside_the_block(self):
+        metrics = ServiceMetrics('test_collect')
+        with metrics.stage('before'):
+            pass
+        with metrics.collect_stages() as stages:
+            with metrics.stage('calendar_sheet'):
+                with metrics.stage('save'):
+                    pass
+        with metrics.stage('after'):
+            pass
+
+        self.assertEqual([name for name, _ in stages], ['save', 'calendar_sheet'])
+        self.assertTrue(all(seconds >= 0 for _, seconds in stages))
+
+    def test_record_stages_observes_each_timing(self):
+        metrics = ServiceMetrics('test_record')
+        metrics.record_stages([('calendar_sheet', 0.5), ('save', 0.25), ('save', 0.125)])
+
+        self.assertEqual(stage_count('test_record', 'calendar_sheet'), 1)
+        self.assertEqual(stage_count('test_record', 'save'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the incremental request reader in jsonStream
+
+Run from src/services with: python -m unittest discover tests
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jsonStream import JsonStream, read_trip_request  # noqa: E402
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def every_split(body):
+    """The body as one chunk, byte by byte, and cut in two at every offset"""
+    yield [body]
+    yield chunked(body, 1)
+    for cut in range(1, len(body)):
+        yield [body[:cut], body[cut:]]
+
+
+def parse(chunks):
+    stream = JsonStream(chunks)
+    value = stream.value()
+    stream.end()
+    return value
+
+
+def keep_trip(trip_data):
+    return lambda event: event.get('tripId') == trip_data['id']
+
+
+class ChunkBoundaryTests(unittest.TestCase):
+    def assert_parses_at_every_split(self, text):
+        body = text.encode('utf-8')
+        expected = json.loads(text)
+        for chunks in every_split(body):
+            self.assertEqual(parse(chunks), expected, chunks)
+
+    def test_strings(self):
+        self.assert_parses_at_every_split('{"title": "Beach day", "": "", "note": "a b  c"}')
+
+    def test_escapes(self):
+        self.assert_parses_at_every_split(r'["quote \" backslash \\ slash \/", "\n\t\r\b\f", "é😀"]')
+
+    def test_multibyte_utf8(self):
+        self.assert_parses_at_every_split('{"🏖️": "Café – 東京 😀"}')
+
+    def test_numbers(self):
+        self.assert_parses_at_every_split('[0, -1, 1.5, -0.25e-3, 6.02E+23, 12345678901234567890, 1e5]')
+
+    def test_top_level_number(self):
+        # Nothing follows the number, so only the end of the body completes it
+        for chunks in every_split(b'-12.5e+3'):
+            self.assertEqual(parse(chunks), -12.5e+3)
+
+    def test_literals(self):
+        self.assert_parses_at_every_split('{"a": true, "b": false, "c": null, "d": [true,false,null]}')
+
+    def test_skip_matches_parse(self):
+        body = b'{"skip": {"a": [1, "x,]}", {"b": null}], "c": 2.5}, "keep": [1, 2]}'
+        for chunks in every_split(body):
+            stream = JsonStream(chunks)
+            keys = []
+            for key in stream.items():
+                keys.append(key)
+                if key == 'skip':
+                    stream.skip()
+                else:
+                    self.assertEqual(stream.value(), [1, 2])
+            stream.end()
+            self.assertEqual(keys, ['skip', 'keep'])
+
+    def test_byte_order_mark(self):
+        self.assertEqual(parse([b'\xef\xbb', b'\xbf{"a": 1}']), {'a': 1})
+
+
+class TripRequestTests(unittest.TestCase):
+    trip = {'id': 't1', 'name': 'Trip One'}
+    calendar = {
+        'title': 'Calendar',
+        'events': [{'id': 1, 'tripId': 't1'}, {'id': 2, 'tripId': 't2'}, {'id': 3, 'tripId': 't1'}],
+        'bucketList': [{'text': 'Skip me'}],
+        'checklistItems': [],
+    }
+
+    def read(self, body, size=7, calendar_keys=None):
+        return read_trip_request(chunked(json.dumps(body).encode('utf-8'), size), keep_trip, calendar_keys)
+
+    def test_trip_first_keeps_only_its_events(self):
+        data = self.read({'tripData': self.trip, 'calendarData': self.calendar, 'engine': 'direct'})
+        self.assertEqual([event['id'] for event in data['calendarData']['events']], [1, 3])
+        self.assertEqual(data['tripData'], self.trip)
+        self.assertEqual(data['engine'], 'direct')
+
+    def test_calendar_first_keeps_every_event(self):
+        data = self.read({'calendarData': self.calendar, 'tripData': self.trip})
+        self.assertEqual(data, {'calendarData': self.calendar, 'tripData': self.trip})
+
+    def test_same_result_whatever_the_other_keys_order(self):
+        expected = self.read({'engine': 'direct', 'tripData': self.trip, 'calendarData': self.calendar})
+        reordered = dict(reversed(list(self.calendar.items())))
+        data = self.read({'tripData': self.trip, 'calendarData': reordered, 'engine': 'direct'})
+        self.assertEqual(data, expected)
+
+    def test_unused_calendar_keys_are_skipped(self):
+        data = self.read({'tripData': self.trip, 'calendarData': self.calendar}, calendar_keys=('title',))
+        self.assertEqual(set(data['calendarData']), {'title', 'events'})
+
+    def test_non_object_top_level_is_returned_whole(self):
+        for value in ([self.trip, self.calendar], 'text', 42, None):
+            self.assertEqual(self.read(value), value)
+
+    def test_truncated_document(self):
+        body = json.dumps({'tripData': self.trip, 'calendarData': self.calendar}).encode('utf-8')
+        for end in range(len(body)):
+            with self.assertRaises(ValueError, msg=body[:end]):
+                read_trip_request(chunked(body[:end], 5), keep_trip)
+
+    def test_trailing_garbage(self):
+        for body in (b'{"tripData": {"id": "t1"}} x', b'{"a": 1}{"b": 2}', b'[1, 2] 3', b'{"a": 1},'):
+            with self.assertRaises(ValueError, msg=body):
+                read_trip_request(chunked(body, 3), keep_trip)
+
+    def test_trailing_whitespace(self):
+        self.assertEqual(read_trip_request([b'{"a": 1}', b' \r\n\t '], keep_trip), {'a': 1})
+
+    def test_malformed_documents(self):
+        for body in (b'', b'{"a" 1}', b'{"a": 1,}', b'{1: 2}', b'[1 2]', b'{"a": tru}', b'{"a": "\xff"}'):
+            with self.assertRaises(ValueError, msg=body):
+                read_trip_request(chunked(body, 2), keep_trip)
+
+
+if __name__ == '__main__':
+    unittest.main()
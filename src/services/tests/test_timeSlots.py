@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the timestamp fast path in timeSlots
+
+Run from src/services with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeSlots import parse_iso_local  # noqa: E402
+
+
+class ParseIsoLocalTest(unittest.TestCase):
+    def test_iso_timestamps(self):
+        self.assertEqual(parse_iso_local('2025-09-13T08:30:00'), datetime(2025, 9, 13, 8, 30))
+        self.assertEqual(parse_iso_local('2025-09-13 08:30:15.5Z'), datetime(2025, 9, 13, 8, 30, 15, 500000))
+
+    def test_other_strings_fall_back(self):
+        self.assertIsNone(parse_iso_local('Sat Sep 13 2025 08:30'))
+        self.assertIsNone(parse_iso_local('2025-02-30T08:30'))
+
+    def test_unhashable_values_return_none(self):
+        # Clients can send anything in startTime/endTime; lists and dicts
+        # must fall back like any other unparseable value instead of raising
+        for value in (['2025-09-13T08:30:00'], {'time': '2025-09-13T08:30:00'}, [], {}):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_iso_local(value))
+
+    def test_non_string_values_return_none(self):
+        for value in (None, 1694593800, 8.5):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_iso_local(value))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Regression tests for repackaging workbooks in workbookCompression
+
+Run from src/services with: python -m unittest discover tests
+"""
+
+import io
+import os
+import sys
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workbookCompression import copy_package, package_archive, worksheet_part  # noqa: E402
+
+WORKBOOK = (
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+    '<sheet name="Calendar" sheetId="1" r:id="rId1"/><sheet name="Summary &amp; Notes" sheetId="2" r:id="rId2"/>'
+    '</sheets></workbook>'
+)
+RELS = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Target="/xl/worksheets/sheet2.xml"/>'
+    '</Relationships>'
+)
+
+
+def make_package(compression):
+    buffer = io.BytesIO()
+    with package_archive(buffer, compression) as archive:
+        archive.writestr('xl/workbook.xml', WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', RELS)
+        archive.writestr('xl/worksheets/sheet1.xml', '<row>event</row>' * 2000)
+        archive.writestr('xl/worksheets/sheet2.xml', '<c>old</c>')
+    return buffer.getvalue()
+
+
+def raw_parts(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as package:
+        return {info.filename: (info.CRC, info.compress_size) for info in package.infolist()}
+
+
+class WorksheetPartTest(unittest.TestCase):
+    def test_relative_and_absolute_targets(self):
+        with zipfile.ZipFile(io.BytesIO(make_package('default'))) as package:
+            self.assertEqual(worksheet_part(package, 'Calendar'), 'xl/worksheets/sheet1.xml')
+            self.assertEqual(worksheet_part(package, 'Summary & Notes'), 'xl/worksheets/sheet2.xml')
+            self.assertIsNone(worksheet_part(package, 'Missing'))
+
+
+class CopyPackageTest(unittest.TestCase):
+    def test_replaces_only_the_named_part(self):
+        for compression in ('store', 'fast', 'max'):
+            with self.subTest(compression=compression):
+                data = make_package(compression)
+                target = io.BytesIO()
+                with zipfile.ZipFile(io.BytesIO(data)) as package:
+                    copy_package(package, target, {'xl/worksheets/sheet2.xml': b'<c>new</c>'}, compression)
+
+                with zipfile.ZipFile(io.BytesIO(target.getvalue())) as copied:
+                    self.assertIsNone(copied.testzip())
+                    self.assertEqual(copied.read('xl/worksheets/sheet2.xml'), b'<c>new</c>')
+                    self.assertEqual(copied.read('xl/worksheets/sheet1.xml'), b'<row>event</row>' * 2000)
+
+                before, after = raw_parts(data), raw_parts(target.getvalue())
+                self.assertEqual(list(before), list(after))
+                for name in ('xl/workbook.xml', 'xl/_rels/workbook.xml.rels', 'xl/worksheets/sheet1.xml'):
+                    self.assertEqual(before[name], after[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
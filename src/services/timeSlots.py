@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Timestamp parsing and time-slot lookup
+
+The calendar clients send ISO-8601 timestamps, so a single precompiled pattern
+handles nearly every event and the result is memoised: trips repeat the same
+start and end times over and over. Slot lookups go through a table indexed by
+minute of day that is built once per grid layout.
+
+Day keys (customDayHeaders) are dates in any of DAY_KEY_FORMATS.
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# YYYY-MM-DD[T ]HH:MM[:SS[.ffffff]] with an optional UTC suffix, which the
+# services ignore and treat as local wall-clock time
+ISO_LOCAL_PATTERN = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})[T ](\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?(?:Z|\+00:00)?'
+)
+
+MINUTES_PER_DAY = 24 * 60
+
+# Date-only key formats, tried after ISO-8601: JavaScript's toDateString(),
+# then a few common spellings
+DAY_KEY_FORMATS = ('%a %b %d %Y', '%Y/%m/%d', '%d %b %Y', '%b %d %Y', '%A %B %d %Y')
+ISO_DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ].*)?')
+
+
+def parse_iso_local(value):
+    """Parse an ISO-8601 timestamp as a naive local datetime.
+
+    Returns None when the value is not a string in the fast-path format (or is
+    not a valid date/time) so callers can fall back to their lenient parsers.
+    """
+    if not isinstance(value, str):
+        return None
+    return _parse_iso_local_cached(value)
+
+
+@lru_cache(maxsize=8192)
+def _parse_iso_local_cached(value):
+    match = ISO_LOCAL_PATTERN.fullmatch(value.strip())
+    if not match:
+        return None
+
+    year, month, day, hour, minute, second, fraction = match.groups()
+    try:
+        return datetime(
+            int(year), int(month), int(day), int(hour), int(minute),
+            int(second) if second else 0,
+            int(fraction.ljust(6, '0')) if fraction else 0,
+        )
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=1024)
+def parse_day_key(key):
+    """Parse a day key such as 'Sat Sep 13 2025' or '2025-09-13' to a date.
+
+    ISO keys may carry a time part, which is ignored. Returns None when the
+    key is in no recognised format.
+    """
+    if not isinstance(key, str):
+        return None
+
+    key = key.strip()
+    match = ISO_DATE_PATTERN.fullmatch(key)
+    if match:
+        try:
+            return datetime(*map(int, match.groups())).date()
+        except ValueError:
+            return None
+
+    for fmt in DAY_KEY_FORMATS:
+        try:
+            return datetime.strptime(key, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def minute_of_day(hour, minute):
+    """Index into a slot table, or None when the time is outside one day"""
+    if 0 <= hour < 24 and 0 <= minute < 60:
+        return hour * 60 + minute
+    return None
+
+
+@lru_cache(maxsize=None)
+def nearest_slot_table(slots):
+    """Minute of day -> index of the nearest half-hour slot in `slots`.
+
+    `slots` is a tuple of 'HH:MM' labels. Times round to the nearest half
+    hour; times before the first slot map to the first slot and times after
+    the last one map to the last slot.
+    """
+    positions = {slot: i for i, slot in enumerate(slots)}
+    table = []
+    for minutes in range(MINUTES_PER_DAY):
+        hour, minute = divmod(minutes, 60)
+        if minute < 15:
+            target = f"{hour:02d}:00"
+        elif minute < 45:
+            target = f"{hour:02d}:30"
+        else:
+            target = f"{(hour + 1) % 24:02d}:00"
+
+        index = positions.get(target)
+        if index is None:
+            index = next((i for i, slot in enumerate(slots) if slot >= target), len(slots) - 1)
+        table.append(index)
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def floor_slot_table(slots):
+    """Minute of day -> index of the last slot in `slots` starting at or before it.
+
+    Times before the first slot map to None.
+    """
+    table = []
+    index = None
+    next_index = 0
+    for minutes in range(MINUTES_PER_DAY):
+        label = f"{minutes // 60:02d}:{minutes % 60:02d}"
+        while next_index < len(slots) and slots[next_index] <= label:
+            index = next_index
+            next_index += 1
+        table.append(index)
+    return tuple(table)
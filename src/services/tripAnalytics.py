@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Columnar trip analytics
+
+The overview and summary tables are grouped reductions over three columns
+per event: day index within the trip, event type code and cost. The columns
+are filled in one pass over the events, each date parsed once, and every
+table is then a bincount over them: O(events + days) whatever the grouping.
+
+NumPy does the reductions when it is installed; otherwise the same columns
+are reduced in plain Python, with identical results. Costs are summed in
+event order either way, so totals match the running sums they replace to
+the last bit.
+"""
+
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:  # Optional; plain Python reductions are used without it
+    np = None
+
+
+class EventColumns:
+    """Day index, type code and cost of each event, in event order"""
+
+    def __init__(self, days, types, costs, type_names, num_days):
+        self.days = days              # Day index from the first trip day; may fall outside the trip
+        self.types = types            # Index into type_names
+        self.costs = costs            # Numeric cost, 0 when unknown
+        self.type_names = type_names  # Event types in first-seen order
+        self.num_days = num_days
+
+    @classmethod
+    def build(cls, first_day, num_days, records):
+        """Build the columns from (date, event type, cost) records
+
+        Type codes follow first appearance, so per-type tables come out in
+        the order a dict filled event by event would have.
+        """
+        first = first_day.toordinal()
+        codes = {}
+        days = []
+        types = []
+        costs = []
+        for date, event_type, cost in records:
+            days.append(date.toordinal() - first)
+            types.append(codes.setdefault(event_type, len(codes)))
+            costs.append(cost)
+
+        if np is not None:
+            days = np.array(days, dtype=np.int64)
+            types = np.array(types, dtype=np.int64)
+            costs = np.array(costs, dtype=np.float64)
+        return cls(days, types, costs, list(codes), num_days)
+
+    def __len__(self):
+        return len(self.costs)
+
+    @property
+    def total_cost(self):
+        cumulative = self.cumulative_costs()
+        return cumulative[-1] if cumulative else 0
+
+    def cumulative_costs(self):
+        """Running total of cost, event by event"""
+        if np is not None:
+            return np.cumsum(self.costs).tolist()
+        return list(accumulate(self.costs))
+
+    def type_counts(self):
+        """{event type: number of events}"""
+        return dict(zip(self.type_names, self._bincount(self.types, len(self.type_names))))
+
+    def type_costs(self):
+        """{event type: total cost}"""
+        return dict(zip(self.type_names, self._bincount(self.types, len(self.type_names), self.costs)))
+
+    def day_counts(self):
+        """Number of events on each trip day"""
+        if np is not None:
+            return self._bincount(self.days[self._in_trip()], self.num_days)
+
+        totals = [0] * self.num_days
+        for day in self.days:
+            if 0 <= day < self.num_days:
+                totals[day] += 1
+        return totals
+
+    def day_costs(self):
+        """Total cost of each trip day"""
+        if np is not None:
+            inside = self._in_trip()
+            return self._bincount(self.days[inside], self.num_days, self.costs[inside])
+
+        totals = [0] * self.num_days
+        for day, cost in zip(self.days, self.costs):
+            if 0 <= day < self.num_days:
+                totals[day] += cost
+        return totals
+
+    def day_members(self, limit=None):
+        """Positions of each trip day's events (the first `limit` of them), in event order"""
+        if np is not None:
+            order = np.argsort(self.days, kind='stable')
+            bounds = np.searchsorted(self.days[order], np.arange(self.num_days + 1))
+            return [
+                order[lo:hi if limit is None else min(hi, lo + limit)].tolist()
+                for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+            ]
+
+        members = [[] for _ in range(self.num_days)]
+        for position, day in enumerate(self.days):
+            if 0 <= day < self.num_days and (limit is None or len(members[day]) < limit):
+                members[day].append(position)
+        return members
+
+    def _in_trip(self):
+        """Mask of the events that fall on a trip day"""
+        return (self.days >= 0) & (self.days < self.num_days)
+
+    @staticmethod
+    def _bincount(keys, size, weights=None):
+        """Count (or sum `weights`) per key in range(size), accumulating in order"""
+        if np is not None:
+            return np.bincount(keys, weights=weights, minlength=size).tolist()
+
+        totals = [0] * size
+        if weights is None:
+            for key in keys:
+                totals[key] += 1
+        else:
+            for key, weight in zip(keys, weights):
+                totals[key] += weight
+        return totals
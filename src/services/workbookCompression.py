@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Zip compression level of saved workbooks
+
+An .xlsx is a zip package of XML parts, and deflating those parts is a
+large share of save time. The level is chosen per deployment (or per
+request) to trade file size against speed:
+
+- store: parts written uncompressed; fastest to save, largest download
+- fast: deflate level 1
+- default: zlib's default level 6, as openpyxl saves
+- max: deflate level 9, for archival exports
+
+A saved package can also be copied with some parts replaced, keeping the
+other parts' compressed bytes, so small edits do not pay for a full save.
+
+Environment:
+- HOLIDAYMOO_XLSX_COMPRESSION: service-wide level (default 'default')
+"""
+
+import copy
+import os
+import posixpath
+import struct
+import zipfile
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+
+from openpyxl import Workbook
+from openpyxl.writer.excel import ExcelWriter
+
+from exportLogging import fields, get_logger
+
+log = get_logger('workbook_compression')
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+PACKAGE_RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Local file header: fixed part, and the offset of its name and extra lengths
+LOCAL_HEADER_SIZE = 30
+LOCAL_HEADER_LENGTHS = struct.Struct('<HH')
+
+# level -> (zip compression method, compresslevel)
+COMPRESSION_LEVELS = {
+    'store': (zipfile.ZIP_STORED, None),
+    'fast': (zipfile.ZIP_DEFLATED, 1),
+    'default': (zipfile.ZIP_DEFLATED, None),
+    'max': (zipfile.ZIP_DEFLATED, 9),
+}
+
+DEFAULT_COMPRESSION = os.environ.get('HOLIDAYMOO_XLSX_COMPRESSION', 'default')
+if DEFAULT_COMPRESSION not in COMPRESSION_LEVELS:
+    log.warning("Unknown HOLIDAYMOO_XLSX_COMPRESSION, using 'default'", extra=fields(value=DEFAULT_COMPRESSION))
+    DEFAULT_COMPRESSION = 'default'
+
+
+def package_archive(target, compression='default'):
+    """Open a path or binary file object as a workbook package for writing"""
+    method, level = COMPRESSION_LEVELS[compression]
+    return zipfile.ZipFile(target, 'w', method, allowZip64=True, compresslevel=level)
+
+
+def worksheet_part(package, title):
+    """Name of the worksheet part holding the sheet called `title`, or None"""
+    workbook = ElementTree.fromstring(package.read('xl/workbook.xml'))
+    sheet = next((sheet for sheet in workbook.iter(f'{MAIN_NS}sheet') if sheet.get('name') == title), None)
+    if sheet is None:
+        return None
+
+    rels = ElementTree.fromstring(package.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(f'{PACKAGE_RELS_NS}Relationship'):
+        if rel.get('Id') == sheet.get(RELATIONSHIP_ID):
+            target = rel.get('Target')
+            # Targets are relative to xl/ unless absolute
+            return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    return None
+
+
+def copy_package(package, target, replace, compression='default'):
+    """Write the open package to target with the parts in `replace` swapped out
+
+    `replace` maps part names to new content, which is compressed at the
+    given level. Every other part is copied as its stored compressed bytes,
+    without being inflated or deflated again.
+    """
+    method, level = COMPRESSION_LEVELS[compression]
+    with package_archive(target, compression) as archive:
+        for info in package.infolist():
+            if info.filename in replace:
+                archive.writestr(info, replace[info.filename], compress_type=method, compresslevel=level)
+            else:
+                _copy_raw_part(package, archive, info)
+
+
+def _copy_raw_part(package, archive, info):
+    # zipfile has no public raw copy: read the member's compressed bytes past
+    # its local header, then add them the way ZipFile.writestr does
+    package.fp.seek(info.header_offset + LOCAL_HEADER_SIZE - LOCAL_HEADER_LENGTHS.size)
+    name_length, extra_length = LOCAL_HEADER_LENGTHS.unpack(package.fp.read(LOCAL_HEADER_LENGTHS.size))
+    package.fp.seek(name_length + extra_length, os.SEEK_CUR)
+    data = package.fp.read(info.compress_size)
+
+    part = copy.copy(info)
+    # Sizes and CRC are known up front, so no trailing data descriptor
+    part.flag_bits &= ~0x08
+    part.header_offset = archive.fp.tell()
+    archive.fp.write(part.FileHeader())
+    archive.fp.write(data)
+    archive.filelist.append(part)
+    archive.NameToInfo[part.filename] = part
+    archive.start_dir = archive.fp.tell()
+    archive._didModify = True
+
+
+def save_workbook(wb, target, compression=None):
+    """Save an openpyxl Workbook or a DirectWorkbook; compression=None uses the service default"""
+    compression = compression or DEFAULT_COMPRESSION
+    if not isinstance(wb, Workbook):
+        # DirectWorkbook opens its own package
+        wb.save(target, compression)
+        return
+
+    # What Workbook.save does, with the package opened at our level
+    if wb.write_only and not wb.worksheets:
+        wb.create_sheet()
+    wb.properties.modified = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+    ExcelWriter(wb, package_archive(target, compression)).save()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Write-only workbook helpers
+
+Shared by the export services to stream large tabular sheets through
+openpyxl's write-only worksheets instead of keeping every cell in memory.
+"""
+
+from copy import copy
+
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import MergedCell
+
+
+def styled_cell(ws, value, font=None, fill=None, alignment=None, border=None, hyperlink=None):
+    """Create a write-only cell with optional styling"""
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if alignment is not None:
+        cell.alignment = alignment
+    if border is not None:
+        cell.border = border
+    if hyperlink:
+        cell.hyperlink = hyperlink
+    return cell
+
+
+def append_row(ws, row_idx, cells, height=None):
+    """Append row `row_idx` to a write-only sheet, optionally with a custom height.
+
+    Row dimensions are only read while the row is being written, so the
+    entry is dropped straight after to keep memory flat for long sheets.
+    """
+    if height is None:
+        ws.append(cells)
+        return
+
+    ws.row_dimensions[row_idx].height = height
+    ws.append(cells)
+    del ws.row_dimensions[row_idx]
+
+
+def copy_worksheet_streamed(wb, source):
+    """Copy a regular worksheet into a write-only workbook.
+
+    Used for the small fixed-layout sheets so they can sit next to streamed
+    tabular sheets in the same write-only workbook.
+    """
+    ws = wb.create_sheet(source.title)
+    # The source's style ids index its own workbook's tables, so each distinct
+    # style is registered in `wb` once and its StyleArray reused after that
+    styles = {}
+
+    for key, dimension in source.column_dimensions.items():
+        if dimension.width:
+            ws.column_dimensions[key].width = dimension.width
+
+    for key, dimension in source.row_dimensions.items():
+        if dimension.height:
+            ws.row_dimensions[key].height = dimension.height
+
+    for merged_range in source.merged_cells.ranges:
+        ws.merged_cells.add(merged_range.coord)
+
+    for row in source.iter_rows(min_row=1, min_col=1):
+        cells = []
+        for cell in row:
+            if isinstance(cell, MergedCell) and not cell.has_style:
+                cells.append(None)
+                continue
+
+            out = WriteOnlyCell(ws, value=cell.value)
+            if cell.has_style:
+                key = tuple(cell._style)
+                style = styles.get(key)
+                if style is None:
+                    out.font = copy(cell.font)
+                    out.fill = copy(cell.fill)
+                    out.border = copy(cell.border)
+                    out.alignment = copy(cell.alignment)
+                    out.number_format = cell.number_format
+                    styles[key] = copy(out._style)
+                else:
+                    out._style = copy(style)
+            if getattr(cell, 'hyperlink', None) is not None:
+                out.hyperlink = cell.hyperlink.target
+            cells.append(out)
+        ws.append(cells)
+
+    return ws
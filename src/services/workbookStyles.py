@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Interned cell styles
+
+Fonts, fills, borders and alignments are built once per process. Each
+workbook gets a matching NamedStyle the first time a style is used, and cells
+then take the style by reference instead of allocating and de-duplicating
+fresh style objects one cell at a time. Cells of a DirectWorkbook share one
+style tuple per name.
+"""
+
+import threading
+import weakref
+from copy import copy
+
+from openpyxl.styles import Border, NamedStyle, PatternFill, Side
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+from spreadsheetWriter import DirectCell
+
+
+def solid_fill(color):
+    """Solid pattern fill in a single colour"""
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def box_border(style, color=None):
+    """Border with the same side on all four edges"""
+    side = Side(style=style, color=color)
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+class StyleRegistry:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._definitions = None
+        self._direct_styles = {}
+        self._workbooks = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def define_once(self, build):
+        """Build the style definitions on first use.
+
+        `build` returns {name: dict(font=..., fill=..., border=..., alignment=...)}
+        and is only called once per process.
+        """
+        if self._definitions is not None:
+            return
+        with self._lock:
+            if self._definitions is None:
+                self._definitions = build()
+
+    def apply(self, cell, name):
+        """Give a cell the named style, registering it with the workbook if needed"""
+        if type(cell) is DirectCell:
+            style = self._direct_styles.get(name)
+            if style is None:
+                definition = self._definitions[name]
+                style = self._direct_styles[name] = tuple(
+                    definition.get(part) for part in ('font', 'fill', 'border', 'alignment'))
+            cell.style = style
+            return cell
+        
+        wb = cell.parent.parent
+        arrays = self._workbooks.get(wb)
+        array = arrays.get(name) if arrays is not None else None
+        if array is None:
+            array = self._register(wb, name)
+        # Same assignment openpyxl makes for `cell.style = name`, minus the
+        # linear search through the workbook's style names
+        cell._style = copy(array)
+        return cell
+
+    def _register(self, wb, name):
+        with self._lock:
+            arrays = self._workbooks.setdefault(wb, {})
+            if name not in arrays:
+                definition = self._definitions[name]
+                style = NamedStyle(
+                    name=f"{self.prefix} {name}",
+                    font=definition.get('font') or DEFAULT_FONT,
+                    fill=definition.get('fill'),
+                    border=definition.get('border') or DEFAULT_BORDER,
+                    alignment=definition.get('alignment'),
+                    number_format='General',
+                )
+                wb.add_named_style(style)
+                arrays[name] = style.as_tuple()
+            return arrays[name]
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Holiday Moo - Template for the static parts of export workbooks
+
+Headings, labels, fixed text blocks, merged regions, column widths and row
+heights are the same on every export. They are recorded once per process,
+either from the service's own layout or from a branded .xlsx, and laid down
+on each new sheet before the trip-specific cells are filled in. Template
+styles go through a StyleRegistry, so both openpyxl and DirectWorkbook
+sheets take them by reference.
+
+A branded template replaces the built-in content of every sheet whose title
+it shares (cell values, fonts, fills, borders, alignment, merges, column
+widths and row heights; images and charts are not copied).
+
+Environment:
+- HOLIDAYMOO_TEMPLATE_PATH: branded .xlsx to take static sheet content from
+"""
+
+import os
+import threading
+from copy import copy
+
+from openpyxl.cell.cell import MergedCell
+from openpyxl.utils import get_column_letter
+
+from exportLogging import fields, get_logger
+from spreadsheetWriter import DirectWorkbook
+from workbookStyles import StyleRegistry
+
+log = get_logger('workbook_template')
+
+
+class SheetTemplate:
+    """Static content of one sheet"""
+    __slots__ = ('cells', 'merges', 'column_widths', 'row_heights')
+
+    def __init__(self, cells, merges, column_widths, row_heights):
+        self.cells = cells                  # (row, column, value, style name or None)
+        self.merges = merges                # (min_row, min_col, max_row, max_col)
+        self.column_widths = column_widths  # Column letter -> width
+        self.row_heights = row_heights      # Row number -> height
+
+    @classmethod
+    def from_direct(cls, ws, style_names):
+        """Record a DirectWorksheet; its style tuples are named in `style_names`"""
+        cells = [
+            (row, column, cell.value, _style_name(style_names, cell.style))
+            for (row, column), cell in sorted(ws._cells.items())
+        ]
+        return cls(
+            cells,
+            list(ws._merges),
+            {letter: dim.width for letter, dim in ws.column_dimensions.items() if dim.width is not None},
+            {row: dim.height for row, dim in ws.row_dimensions.items() if dim.height is not None},
+        )
+
+    @classmethod
+    def from_openpyxl(cls, ws, style_names):
+        """Record a worksheet loaded from a template file"""
+        cells = []
+        for (row, column), cell in sorted(ws._cells.items()):
+            value = None if isinstance(cell, MergedCell) else cell.value
+            style = None
+            if cell.has_style:
+                style = (copy(cell.font), copy(cell.fill), copy(cell.border), copy(cell.alignment))
+            if value is not None or style is not None:
+                cells.append((row, column, value, _style_name(style_names, style)))
+
+        merges = [(r.min_row, r.min_col, r.max_row, r.max_col) for r in ws.merged_cells.ranges]
+
+        column_widths = {}
+        for dim in ws.column_dimensions.values():
+            if dim.customWidth and dim.width:
+                for column in range(dim.min or 1, (dim.max or dim.min or 1) + 1):
+                    column_widths[get_column_letter(column)] = dim.width
+        row_heights = {row: dim.height for row, dim in ws.row_dimensions.items() if dim.height is not None}
+        return cls(cells, merges, column_widths, row_heights)
+
+    def apply(self, ws, styles):
+        """Lay the static content onto a fresh sheet"""
+        # Merge first: openpyxl replaces covered cells when merging, and
+        # styles recorded on them (merged borders) must survive
+        for min_row, min_col, max_row, max_col in self.merges:
+            ws.merge_cells(start_row=min_row, start_column=min_col, end_row=max_row, end_column=max_col)
+
+        for row, column, value, style in self.cells:
+            cell = ws.cell(row=row, column=column)
+            if value is not None:
+                cell.value = value
+            if style is not None:
+                styles.apply(cell, style)
+
+        for letter, width in self.column_widths.items():
+            ws.column_dimensions[letter].width = width
+        for row, height in self.row_heights.items():
+            ws.row_dimensions[row].height = height
+
+
+def _style_name(style_names, style):
+    if style is None:
+        return None
+    name = style_names.get(style)
+    if name is None:
+        name = style_names[style] = str(len(style_names))
+    return name
+
+
+class WorkbookTemplate:
+    def __init__(self, path=None):
+        self.path = path
+        # Changes whenever the template content can change; part of cache keys
+        self.fingerprint = None
+
+        self._sheets = None
+        self._styles = StyleRegistry('Holiday Moo template')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a template from HOLIDAYMOO_TEMPLATE_PATH"""
+        return cls(path=os.environ.get('HOLIDAYMOO_TEMPLATE_PATH') or None)
+
+    def define_once(self, build):
+        """Record the template on first use.
+
+        `build(wb)` creates the built-in static sheets on a DirectWorkbook and
+        is only called once per process. Sheets from the template file, if
+        any, then replace the built-in ones with the same title.
+        """
+        if self._sheets is not None:
+            return
+        with self._lock:
+            if self._sheets is not None:
+                return
+
+            style_names = {}
+            wb = DirectWorkbook()
+            build(wb)
+            sheets = {ws.title: SheetTemplate.from_direct(ws, style_names) for ws in wb.worksheets}
+            fingerprint = 'builtin'
+
+            if self.path:
+                branded, fingerprint = self._load_file(style_names)
+                sheets.update((title, sheet) for title, sheet in branded.items() if title in sheets)
+
+            self._styles.define_once(lambda: {
+                name: dict(zip(('font', 'fill', 'border', 'alignment'), style))
+                for style, name in style_names.items()
+            })
+            self.fingerprint = fingerprint
+            self._sheets = sheets
+
+    def apply(self, ws, title=None):
+        """Lay the template for `title` (default ws.title) onto ws, if there is one"""
+        sheet = self._sheets.get(title or ws.title)
+        if sheet is not None:
+            sheet.apply(ws, self._styles)
+        return ws
+
+    def save(self, filename):
+        """Write the template's static sheets as an .xlsx to brand and load back"""
+        wb = DirectWorkbook()
+        for title in self._sheets:
+            self.apply(wb.create_sheet(title))
+        wb.save(filename)
+
+    def _load_file(self, style_names):
+        import openpyxl
+
+        try:
+            stat = os.stat(self.path)
+            wb = openpyxl.load_workbook(self.path)
+        except Exception as e:
+            # A broken template should not take exports down with it
+            log.warning("Could not load workbook template, using the built-in layout",
+                        extra=fields(path=self.path, error=str(e)))
+            return {}, 'builtin'
+
+        sheets = {ws.title: SheetTemplate.from_openpyxl(ws, style_names) for ws in wb.worksheets}
+        log.info("Loaded workbook template", extra=fields(path=self.path, sheets=list(sheets)))
+        return sheets, f"{os.path.abspath(self.path)}:{stat.st_mtime_ns}:{stat.st_size}"